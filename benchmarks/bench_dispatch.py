@@ -0,0 +1,102 @@
+"""Benchmark the memory used to dispatch a very large run.
+
+A fresh state database is filled with ``--jobs`` PLANNED jobs.  Each job is
+then handed to a no-op handler in two ways:
+
+* ``gather``: the previous approach, one coroutine per job id from a list,
+  all passed to ``asyncio.gather`` behind a semaphore;
+* ``dispatch``: :func:`runner.dispatch` with ``--workers`` long-lived
+  workers fed lazily by :func:`db.repository.iter_job_ids`.
+
+Peak traced memory (``tracemalloc``) and wall time are reported for both.
+No nmap process is started, so the figures isolate the dispatcher itself.
+
+Usage::
+
+    python benchmarks/bench_dispatch.py --jobs 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from db import repository as db_repo  # noqa: E402
+from db import session as db_session  # noqa: E402
+from db.models import JobStatus  # noqa: E402
+from runner import dispatch  # noqa: E402
+
+
+def seed(session, jobs: int) -> int:
+    """Create one scan run with ``jobs`` PLANNED jobs and return its id."""
+
+    run = db_repo.create_scan_run(session, status=JobStatus.PENDING)
+    target = db_repo.create_target(session, address="192.0.2.1")
+    rows = [(run.id, target.id, JobStatus.PLANNED.name)] * jobs
+    session.connection().exec_driver_sql(
+        "INSERT INTO jobs (scan_run_id, target_id, status, attempt, max_attempts) VALUES (?, ?, ?, 1, 3)",
+        rows,
+    )
+    session.commit()
+    return run.id
+
+
+async def _noop(job_id: int) -> None:
+    await asyncio.sleep(0)
+
+
+async def _gather(job_ids, workers: int) -> None:
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(job_id):
+        async with semaphore:
+            await _noop(job_id)
+
+    await asyncio.gather(*[run(job_id) for job_id in job_ids])
+
+
+def measure(label: str, func) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed:>8.2f}s  peak {peak / 2**20:>9.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_session._engine = None
+        db_session.init_engine(os.path.join(tmp, "state.db"))
+        session = db_session.get_session()
+        start = time.perf_counter()
+        run_id = seed(session, args.jobs)
+        print(f"Seeded {args.jobs:,} jobs in {time.perf_counter() - start:.2f}s")
+
+        measure(
+            "gather",
+            lambda: asyncio.run(
+                _gather(list(db_repo.iter_job_ids(session, run_id, page_size=10000)), args.workers)
+            ),
+        )
+        measure(
+            "dispatch",
+            lambda: asyncio.run(dispatch(db_repo.iter_job_ids(session, run_id), args.workers, _noop)),
+        )
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
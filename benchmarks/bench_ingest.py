@@ -0,0 +1,89 @@
+"""Benchmark ``netscan ingest`` on a large synthetic target file.
+
+A file of random, partly duplicated IPv4 addresses (and a few CIDR blocks) is
+generated and ingested into a fresh state database through the CLI, once as
+plain text and once gzip-compressed.  Wall time and throughput are reported
+for each run.  A per-row ``get_target_by_address``/``create_target`` loop over
+a small sample is timed too and extrapolated, to show what the previous
+ingest path would have cost.
+
+Usage::
+
+    python benchmarks/bench_ingest.py --lines 1000000
+"""
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from db import repository as db_repo  # noqa: E402
+from db import session as db_session  # noqa: E402
+
+
+def generate_targets(path: str, lines: int, seed: int = 1) -> None:
+    """Write ``lines`` targets: mostly single addresses, 1 in 1000 a /28."""
+
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            a, b, c = rng.randrange(256), rng.randrange(256), rng.randrange(256)
+            if i % 1000 == 0:
+                f.write(f"172.{a % 16 + 16}.{b}.{c & 0xF0}/28\n")
+            else:
+                f.write(f"10.{a}.{b}.{c}\n")
+
+
+def _ingest(label: str, path: str, db_path: str) -> None:
+    cmd = [sys.executable, "-m", "src.cli.main", "--db-path", db_path, "ingest", path, "--max-expand", "0"]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:>8.2f}s  {result.stdout.strip()}")
+
+
+def _per_row(path: str, db_path: str, sample: int, total: int) -> None:
+    db_session._engine = None
+    db_session.init_engine(db_path)
+    session = db_session.get_session()
+    with open(path, "r", encoding="utf-8") as f:
+        addresses = [line.strip() for _, line in zip(range(sample), f) if "/" not in line]
+    start = time.perf_counter()
+    for address in addresses:
+        if not db_repo.get_target_by_address(session, address):
+            db_repo.create_target(session, address=address)
+    elapsed = time.perf_counter() - start
+    estimate = elapsed / len(addresses) * total
+    print(f"{'per-row (estimated)':<22} {estimate:>8.0f}s  from {len(addresses)} rows in {elapsed:.2f}s")
+    session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Target lines to generate")
+    parser.add_argument("--sample", type=int, default=2000, help="Rows for the per-row estimate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        plain = os.path.join(tmpdir, "targets.txt")
+        generate_targets(plain, args.lines)
+        compressed = plain + ".gz"
+        with open(plain, "rb") as src, gzip.open(compressed, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        print(f"Input: {args.lines} lines, {os.path.getsize(plain) / 2**20:.1f} MiB")
+
+        _ingest("ingest (text)", plain, os.path.join(tmpdir, "text.db"))
+        _ingest("ingest (gzip)", compressed, os.path.join(tmpdir, "gzip.db"))
+        _per_row(plain, os.path.join(tmpdir, "per_row.db"), args.sample, args.lines)
+
+
+if __name__ == "__main__":
+    main()
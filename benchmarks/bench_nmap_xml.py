@@ -0,0 +1,120 @@
+"""Benchmark :mod:`nmap_xml` against python-nmap's XML parser.
+
+A corpus of large synthetic Nmap XML files is generated (or existing files are
+passed on the command line) and each file is parsed with:
+
+* ``python-nmap``: ``PortScanner.analyse_nmap_xml_scan``
+* ``nmap_xml.parse``: full document into the compact model
+* ``nmap_xml.iter_hosts``: streaming straight from the file
+
+Wall time and peak traced memory are reported for each parser.
+
+Usage::
+
+    python benchmarks/bench_nmap_xml.py --files 3 --hosts 5000 --ports 20
+    python benchmarks/bench_nmap_xml.py path/to/scan1.xml path/to/scan2.xml
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import nmap_xml  # noqa: E402
+
+
+def generate_xml(path: str, hosts: int, ports: int) -> None:
+    """Write a synthetic Nmap XML document with ``hosts`` x ``ports`` entries."""
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0"?>\n')
+        f.write('<nmaprun scanner="nmap" args="nmap -oX - -sV 10.0.0.0/8" start="0" version="7.94">\n')
+        f.write('<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n')
+        for h in range(hosts):
+            addr = f"10.{(h >> 16) & 255}.{(h >> 8) & 255}.{h & 255}"
+            f.write('<host starttime="0" endtime="1"><status state="up" reason="syn-ack" reason_ttl="0"/>')
+            f.write(f'<address addr="{addr}" addrtype="ipv4"/>')
+            f.write(f'<hostnames><hostname name="h{h}.example" type="PTR"/></hostnames><ports>')
+            for p in range(ports):
+                state = "open" if p % 3 == 0 else "closed"
+                f.write(
+                    f'<port protocol="tcp" portid="{p + 1}"><state state="{state}" reason="syn-ack" reason_ttl="64"/>'
+                    f'<service name="svc{p}" product="Product" version="1.{p}" method="probed" conf="10">'
+                    f"<cpe>cpe:/a:vendor:product:1.{p}</cpe></service>"
+                    f'<script id="banner" output="banner {p}"/></port>'
+                )
+            f.write('</ports><hostscript><script id="nbstat" output="name"/></hostscript></host>\n')
+        f.write('<runstats><finished time="1" timestr="now" summary="done" elapsed="1.00" exit="success"/>')
+        f.write(f'<hosts up="{hosts}" down="0" total="{hosts}"/></runstats></nmaprun>\n')
+
+
+def _measure(label: str, files: List[str], func: Callable[[str], int]) -> None:
+    # Time and memory are measured in separate passes: tracemalloc slows
+    # allocation-heavy code down considerably and would skew the timings.
+    start = time.perf_counter()
+    hosts = sum(func(path) for path in files)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for path in files:
+        func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {elapsed:>8.2f}s {peak / 2**20:>9.1f} MiB {hosts:>9} hosts")
+
+
+def _python_nmap(path: str) -> int:
+    import nmap
+
+    with open(path, "r", encoding="utf-8") as f:
+        xml = f.read()
+    # PortScanner() requires the nmap binary; the parser does not.
+    scanner = object.__new__(nmap.PortScanner)
+    return len(scanner.analyse_nmap_xml_scan(xml)["scan"])
+
+
+def _parse(path: str) -> int:
+    with open(path, "rb") as f:
+        return len(nmap_xml.parse(f).hosts)
+
+
+def _stream(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in nmap_xml.iter_hosts(f))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("xml_files", nargs="*", help="Existing Nmap XML files to parse")
+    parser.add_argument("--files", type=int, default=3, help="Synthetic files to generate")
+    parser.add_argument("--hosts", type=int, default=5000, help="Hosts per synthetic file")
+    parser.add_argument("--ports", type=int, default=20, help="Ports per synthetic host")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = list(args.xml_files)
+        if not files:
+            for i in range(args.files):
+                path = os.path.join(tmpdir, f"corpus{i}.xml")
+                generate_xml(path, args.hosts, args.ports)
+                files.append(path)
+        size = sum(os.path.getsize(p) for p in files)
+        print(f"Corpus: {len(files)} files, {size / 2**20:.1f} MiB")
+
+        try:
+            import nmap  # noqa: F401
+        except ImportError:
+            print(f"{'python-nmap':<22} not installed, skipped")
+        else:
+            _measure("python-nmap", files, _python_nmap)
+        _measure("nmap_xml.parse", files, _parse)
+        _measure("nmap_xml.iter_hosts", files, _stream)
+
+
+if __name__ == "__main__":
+    main()
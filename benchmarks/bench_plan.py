@@ -0,0 +1,79 @@
+"""Benchmark planning the Targets and Jobs of a large scan.
+
+``--hosts`` addresses (a /15 worth by default) are planned into a fresh
+state database the way ``POST /api/scans`` does it: the addresses are
+loaded into a temporary table, missing Targets and the association to one
+Batch are each written with one ``INSERT ... SELECT``, and so is every Job.  The same is then
+repeated against the already populated database, which is what
+``netscan run`` pays when it materializes jobs for an existing batch.  A
+per-row ``get_target_by_address``/``create_target``/``create_job`` loop
+over a small sample is timed and extrapolated for comparison.
+
+Usage::
+
+    python benchmarks/bench_plan.py --hosts 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from db import repository as db_repo  # noqa: E402
+from db import session as db_session  # noqa: E402
+from db.models import JobStatus, TargetKind  # noqa: E402
+from ip_handler import plan_targets  # noqa: E402
+
+
+def plan(session, addresses, label: str) -> None:
+    start = time.perf_counter()
+    run = db_repo.create_scan_run(session, status=JobStatus.PENDING)
+    batch = db_repo.create_batches(
+        session, [dict(scan_run_id=run.id, name=f"run{run.id}_batch1", strategy="initial")], [[]]
+    )[0]
+    db_repo.add_batch_targets(session, batch.id, ((a, TargetKind.HOST) for a in addresses))
+    job_ids = db_repo.materialize_jobs(session, run.id, batch.id, status=JobStatus.PENDING)
+    session.commit()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:>8.2f}s  {len(job_ids):,} jobs")
+
+
+def per_row(session, addresses, sample: int) -> None:
+    run = db_repo.create_scan_run(session, status=JobStatus.PENDING)
+    start = time.perf_counter()
+    for address in addresses[:sample]:
+        target = db_repo.get_target_by_address(session, address)
+        if not target:
+            target = db_repo.create_target(session, address=address, kind=TargetKind.HOST)
+        db_repo.create_job(session, scan_run_id=run.id, target_id=target.id, status=JobStatus.PENDING)
+    elapsed = time.perf_counter() - start
+    estimate = elapsed / sample * len(addresses)
+    print(f"{'per-row (estimated)':<22} {estimate:>8.2f}s  from {sample:,} jobs in {elapsed:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    addresses = plan_targets(["10.0.0.0/8"], max_expand=None)[: args.hosts]
+    print(f"Expanded {len(addresses):,} addresses in {time.perf_counter() - start:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_session._engine = None
+        db_session.init_engine(os.path.join(tmp, "state.db"))
+        session = db_session.get_session()
+        plan(session, addresses, "set-based (new)")
+        plan(session, addresses, "set-based (existing)")
+        per_row(session, addresses, args.sample)
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
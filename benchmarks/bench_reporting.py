@@ -0,0 +1,129 @@
+"""Benchmark the ``netscan status`` reports on a large state database.
+
+A fresh state database is filled with ``--jobs`` finished jobs spread over
+``--runs`` scan runs and ``--targets`` targets.  Every twentieth job failed
+and has a result with an error message.  :func:`reporting.summarise_runs`,
+:func:`reporting.get_slowest_jobs` and :func:`reporting.get_failed_jobs` are
+then timed, with peak traced memory (``tracemalloc``).
+
+With ``--legacy`` the previous implementations, which load every ``Job``
+through the ORM and aggregate in Python, are timed too.  They need several
+gigabytes at a million jobs.
+
+Usage::
+
+    python benchmarks/bench_reporting.py --jobs 1000000 [--legacy]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import reporting  # noqa: E402
+from db import repository as db_repo  # noqa: E402
+from db import session as db_session  # noqa: E402
+from db.models import Job, JobStatus, ScanRun, TargetKind  # noqa: E402
+
+
+def seed(session, jobs: int, runs: int, targets: int) -> None:
+    """Create ``runs`` scan runs holding ``jobs`` finished jobs between them."""
+
+    rng = random.Random(0)
+    db_repo.bulk_insert_targets(
+        session, ((f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", TargetKind.HOST) for i in range(targets))
+    )
+    run_ids = [db_repo.create_scan_run(session, status=JobStatus.COMPLETED).id for _ in range(runs)]
+    start = datetime(2024, 1, 1)
+    connection = session.connection()
+    rows = []
+    for job_id in range(1, jobs + 1):
+        failed = job_id % 20 == 0
+        rows.append(
+            (
+                run_ids[job_id % runs],
+                job_id % targets + 1,
+                (JobStatus.FAILED if failed else JobStatus.COMPLETED).name,
+                str(start),
+                str(start + timedelta(seconds=rng.uniform(1, 900))),
+            )
+        )
+        if len(rows) == 100_000:
+            _insert(connection, rows)
+            rows = []
+    if rows:
+        _insert(connection, rows)
+    connection.exec_driver_sql(
+        "INSERT INTO results (job_id, stderr, partial, created_at) "
+        "SELECT id, 'timeout', 0, completed_at FROM jobs WHERE status = 'FAILED'"
+    )
+    session.commit()
+
+
+def _insert(connection, rows) -> None:
+    connection.exec_driver_sql(
+        "INSERT INTO jobs (scan_run_id, target_id, status, started_at, completed_at, attempt, max_attempts) "
+        "VALUES (?, ?, ?, ?, ?, 1, 3)",
+        rows,
+    )
+
+
+def legacy_reports(session) -> None:
+    """The previous per-object implementations, for comparison."""
+
+    jobs = session.query(Job).all()
+    durations = [(j, reporting._job_duration(j)) for j in jobs]
+    [j.target.address for j, d in sorted((x for x in durations if x[1] is not None), key=lambda x: x[1], reverse=True)[:5]]
+    for job in jobs:
+        error = next((r.stderr for r in job.results if r.stderr), None)
+        if job.status != "completed" or error:
+            job.target.address
+    for run in session.query(ScanRun).all():
+        sum(1 for j in run.jobs if j.status == "completed")
+
+
+def measure(label: str, func) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = f"{len(result):,} rows" if result is not None else ""
+    print(f"{label:<18} {elapsed:>8.2f}s  peak {peak / 2**20:>8.1f} MiB  {rows}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=65_536)
+    parser.add_argument("--legacy", action="store_true", help="also time the previous implementations")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_session._engine = None
+        db_session.init_engine(os.path.join(tmp, "state.db"))
+        session = db_session.get_session()
+        start = time.perf_counter()
+        seed(session, args.jobs, args.runs, args.targets)
+        print(f"Seeded {args.jobs:,} jobs in {time.perf_counter() - start:.2f}s")
+
+        measure("summarise_runs", lambda: reporting.summarise_runs(session))
+        measure("get_slowest_jobs", lambda: reporting.get_slowest_jobs(session))
+        measure("get_failed_jobs", lambda: reporting.get_failed_jobs(session))
+        if args.legacy:
+            session.expire_all()
+            measure("legacy (all three)", lambda: legacy_reports(session))
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Strategies for splitting targets into batches.
+
+``netscan split`` and ``netscan resplit`` hand each strategy a list of
+integer address keys (see :func:`ip_handler.address_key`), one per target,
+and get back lists of positions into that list, one list per batch.  Working
+on plain integers rather than Target objects or address strings keeps
+splitting a million targets to a sort and a few linear passes.
+
+Strategies are registered by name with :func:`register_strategy` and looked
+up with :func:`get_strategy`; the name is also stored as ``Batch.strategy``.
+
+* ``sequential`` (aliases ``initial`` and ``resplit``): fixed-size slices in
+  input order.  This is the historical behaviour.
+* ``subnet``: targets sorted by address and grouped by subnet (``/24`` by
+  default), so a batch holds whole subnets and nmap can scan them as one
+  host group.  Subnets larger than the chunk size are cut.
+* ``interleave``: round-robin across subnets, so consecutive targets in a
+  batch come from different subnets and no single gateway takes the load of
+  a whole batch.
+* ``balanced``: address-ordered batches whose sizes differ by at most one,
+  instead of full batches followed by a short remainder.
+* ``balanced-cost``: longest-processing-time-first bin packing on estimated
+  per-target durations (see :mod:`cost_model`), so batches have equal
+  expected runtime rather than equal host counts.
+
+Hostname targets have no key.  They are kept in input order after the
+addressed targets, and ``interleave`` treats them as one extra subnet.
+"""
+
+import heapq
+from collections import deque
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Sequence
+
+ChunkStrategy = Callable[..., List[List[int]]]
+
+STRATEGIES: Dict[str, ChunkStrategy] = {}
+
+
+def register_strategy(
+    name: str, *aliases: str, uses_costs: bool = False
+) -> Callable[[ChunkStrategy], ChunkStrategy]:
+    """Register a strategy function under ``name`` and any ``aliases``.
+
+    A strategy is called as ``strategy(keys, chunk_size, **options)`` and must
+    ignore options it does not understand.  ``uses_costs`` marks strategies
+    that want per-target cost estimates passed as ``costs=``; callers check
+    the ``uses_costs`` attribute to avoid computing them otherwise.
+    """
+
+    def decorator(func: ChunkStrategy) -> ChunkStrategy:
+        func.uses_costs = uses_costs  # type: ignore[attr-defined]
+        for key in (name, *aliases):
+            STRATEGIES[key] = func
+        return func
+
+    return decorator
+
+
+def get_strategy(name: str) -> ChunkStrategy:
+    """Return the strategy registered as ``name``.
+
+    Raises
+    ------
+    ValueError
+        If no strategy of that name exists.
+    """
+
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        known = ", ".join(sorted(STRATEGIES))
+        raise ValueError(f"Unknown strategy {name!r}; choose from: {known}") from None
+
+
+def subnet_of(key: int, prefix: int = 24) -> int:
+    """Return the subnet number of an address key.
+
+    ``prefix`` applies to IPv4; IPv6 keys use ``prefix + 96`` so both
+    versions keep the same number of host bits, as with
+    :func:`ip_handler.iter_range_specs`.
+    """
+
+    return key >> (32 - prefix)
+
+
+def _slices(order: Sequence[int], chunk_size: int) -> List[List[int]]:
+    return [list(order[i : i + chunk_size]) for i in range(0, len(order), chunk_size)]
+
+
+def _partition(keys: Sequence[Optional[int]]):
+    """Return (positions sorted by key, positions of hostnames in order)."""
+
+    addressed = [i for i, key in enumerate(keys) if key is not None]
+    addressed.sort(key=keys.__getitem__)
+    unaddressed = [i for i, key in enumerate(keys) if key is None]
+    return addressed, unaddressed
+
+
+@register_strategy("sequential", "initial", "resplit")
+def sequential(keys: Sequence[Optional[int]], chunk_size: int, **_options) -> List[List[int]]:
+    """Slice targets into ``chunk_size`` groups in their original order."""
+
+    return _slices(range(len(keys)), chunk_size)
+
+
+@register_strategy("subnet")
+def group_by_subnet(
+    keys: Sequence[Optional[int]], chunk_size: int, prefix: int = 24, **_options
+) -> List[List[int]]:
+    """Pack whole subnets into batches of at most ``chunk_size`` targets.
+
+    Subnets are never spread over two batches unless a single subnet holds
+    more than ``chunk_size`` targets.
+    """
+
+    addressed, unaddressed = _partition(keys)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for _, members in groupby(addressed, key=lambda i: subnet_of(keys[i], prefix)):
+        group = list(members)
+        if current and len(current) + len(group) > chunk_size:
+            batches.append(current)
+            current = []
+        while len(group) > chunk_size:
+            batches.append(group[:chunk_size])
+            group = group[chunk_size:]
+        current.extend(group)
+    if current:
+        batches.append(current)
+    return batches + _slices(unaddressed, chunk_size)
+
+
+@register_strategy("interleave")
+def interleave_subnets(
+    keys: Sequence[Optional[int]], chunk_size: int, prefix: int = 24, **_options
+) -> List[List[int]]:
+    """Deal targets round-robin from each subnet, then slice into batches."""
+
+    addressed, unaddressed = _partition(keys)
+    subnets = [
+        iter(list(members))
+        for _, members in groupby(addressed, key=lambda i: subnet_of(keys[i], prefix))
+    ]
+    if unaddressed:
+        subnets.append(iter(unaddressed))
+
+    queue = deque(subnets)
+    order: List[int] = []
+    while queue:
+        members = queue.popleft()
+        position = next(members, None)
+        if position is not None:
+            order.append(position)
+            queue.append(members)
+    return _slices(order, chunk_size)
+
+
+@register_strategy("balanced")
+def balanced_by_count(
+    keys: Sequence[Optional[int]], chunk_size: int, **_options
+) -> List[List[int]]:
+    """Split address-ordered targets into equally sized batches.
+
+    The number of batches is the same as for ``sequential``; only the sizes
+    are evened out so that no batch is a small remainder.
+    """
+
+    addressed, unaddressed = _partition(keys)
+    order = addressed + unaddressed
+    if not order:
+        return []
+    count = -(-len(order) // chunk_size)
+    size, extra = divmod(len(order), count)
+    batches = []
+    start = 0
+    for n in range(count):
+        end = start + size + (1 if n < extra else 0)
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+@register_strategy("balanced-cost", uses_costs=True)
+def balanced_by_cost(
+    keys: Sequence[Optional[int]],
+    chunk_size: int,
+    costs: Optional[Sequence[float]] = None,
+    **_options,
+) -> List[List[int]]:
+    """Longest-processing-time-first packing into equal-runtime batches.
+
+    Targets are taken in descending order of cost and each is put into the
+    batch with the smallest total cost that still has room for it.  The
+    number of batches matches ``sequential`` and no batch exceeds
+    ``chunk_size`` targets.  Without the size cap LPT's makespan is within
+    4/3 of optimal.  Without ``costs`` every target counts the same.
+    """
+
+    n = len(keys)
+    if not n:
+        return []
+    if costs is None:
+        costs = [1.0] * n
+    count = -(-n // chunk_size)
+    heap = [(0.0, b) for b in range(count)]
+    batches: List[List[int]] = [[] for _ in range(count)]
+    for i in sorted(range(n), key=lambda i: -costs[i]):
+        load, b = heapq.heappop(heap)
+        batches[b].append(i)
+        if len(batches[b]) < chunk_size:
+            heapq.heappush(heap, (load + costs[i], b))
+    # Keep address order within a batch so nmap still sees neighbours together
+    return [sorted(batch, key=lambda i: (keys[i] is None, keys[i] or 0)) for batch in batches]
+
+
+def split_targets(
+    keys: Sequence[Optional[int]], chunk_size: int, strategy: str = "sequential", **options
+) -> List[List[int]]:
+    """Split targets with the named strategy.
+
+    Parameters
+    ----------
+    keys:
+        One address key per target, ``None`` for hostnames.
+    chunk_size:
+        Maximum targets per batch.
+    strategy:
+        A registered strategy name.
+    options:
+        Strategy specific options, e.g. ``prefix`` for ``subnet`` and
+        ``interleave`` or ``costs`` for ``balanced-cost``.
+
+    Returns
+    -------
+    List[List[int]]
+        Positions into ``keys``, one list per batch.  Every position appears
+        exactly once.
+    """
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    return get_strategy(strategy)(keys, chunk_size, **options)
+
+
+__all__ = [
+    "STRATEGIES",
+    "register_strategy",
+    "get_strategy",
+    "subnet_of",
+    "split_targets",
+]
@@ -1,22 +1,43 @@
 from pathlib import Path
 import json
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import asyncio
+import logging
+import signal
+import time
 import typer
 
 from sqlalchemy.orm import Session
 
 from db.session import init_engine, get_session, DEFAULT_DB_PATH
 from db import repository as db_repo
-from db.models import JobStatus
+from db.models import JobStatus, TargetKind
+import observations
 import reporting
-from ip_handler import expand_targets
-from runner import run_jobs_concurrently
+from ip_handler import plan_targets, iter_range_specs, iter_chunks, iter_targets, open_target_file, address_key, is_range_spec
+from chunking import STRATEGIES, get_strategy, split_targets
+from cost_model import estimate_costs, makespan
+from difficulty import DEFAULT_MIN_TIMEOUTS, difficult_targets
+from dispatcher import DEFAULT_TIMEOUT_SEC, Dispatcher
+from runner import UNIT_STRATEGIES, SlowLane, SpeculationPolicy, run_jobs_concurrently, run_jobs_guided
+from resolver import DnsResolver, SystemResolver, resolve_targets, DEFAULT_CONCURRENCY
 
 app = typer.Typer(help="NetScan Orchestrator CLI")
 
 
+def _progress(items, label: str, start: float, every: int = 100000):
+    """Pass ``items`` through, printing a running count and rate to stderr."""
+    count = 0
+    for count, item in enumerate(items, 1):
+        if count % every == 0:
+            rate = count / max(time.perf_counter() - start, 1e-9)
+            typer.echo(f"\r{label}: {count:,} ({rate:,.0f}/s)", err=True, nl=False)
+        yield item
+    if count >= every:
+        typer.echo(f"\r{label}: {count:,}", err=True)
+
+
 @app.callback()
 def main(
     ctx: typer.Context,
@@ -35,21 +56,82 @@ def main(
 @app.command()
 def ingest(
     ctx: typer.Context,
-    input_file: Path,
+    input_file: Path = typer.Argument(..., help="Target file, optionally gzip-compressed; - reads stdin"),
     max_expand: int = typer.Option(
-        4096, "--max-expand", help="Maximum addresses allowed when expanding ranges"
+        4096,
+        "--max-expand",
+        help="Maximum addresses allowed when expanding a single range (0 disables the guard)",
+    ),
+    exclude: Optional[List[str]] = typer.Option(
+        None, "--exclude", help="Address, range or hostname to exclude (repeatable)"
+    ),
+    exclude_file: Optional[Path] = typer.Option(
+        None, "--exclude-file", help="File of addresses, ranges or hostnames to exclude", dir_okay=False
+    ),
+    range_targets: bool = typer.Option(
+        False,
+        "--range-targets",
+        help="Store ranges as CIDR range targets that nmap expands, instead of one target per address",
+    ),
+    block_prefix: int = typer.Option(
+        24,
+        "--block-prefix",
+        help="Largest CIDR block per range target (IPv4 prefix; IPv6 uses prefix + 96)",
+    ),
+    batch_size: int = typer.Option(
+        50000, "--batch-size", help="Targets inserted per transaction"
     ),
 ):
-    """Ingest targets from a file and create Target records."""
+    """Ingest targets from a file and create Target records.
+
+    Without exclusions each line is expanded and written as it is read, in
+    input order; addresses seen before are skipped by the database.  With
+    ``--exclude``/``--exclude-file`` or ``--range-targets`` the whole input is
+    first gathered into a set of merged ranges, which takes memory in
+    proportion to the number of distinct ranges and hostnames, so exclusions
+    are removed before any address is expanded.  With ``--range-targets``
+    ranges are not expanded at all: each CIDR block becomes a single range
+    Target that is passed to nmap as-is.
+
+    Input is read incrementally from the file, a gzip file or stdin (``-``)
+    and Targets are written with ``INSERT OR IGNORE`` in batches of
+    ``--batch-size``, one transaction each.
+    """
     session: Session = ctx.obj
-    with input_file.open("r", encoding="utf-8") as f:
-        targets = expand_targets(f, max_expand=max_expand)
+    excluded = list(exclude or [])
+    if exclude_file:
+        with exclude_file.open("r", encoding="utf-8") as f:
+            excluded.extend(f)
+    start = time.perf_counter()
     new_targets = 0
-    for address in targets:
-        if not db_repo.get_target_by_address(session, address):
-            db_repo.create_target(session, address=address)
-            new_targets += 1
-    typer.echo(f"Ingested {new_targets} new targets. Skipped {len(targets) - new_targets} duplicates.")
+    seen = 0
+    with open_target_file(input_file) as f:
+        lines = _progress(f, "Lines read", start)
+        if excluded or range_targets:
+            targets = plan_targets(
+                lines,
+                exclude=excluded,
+                max_expand=None if range_targets else (max_expand or None),
+                hosts_only=not range_targets,
+            )
+            specs = iter_range_specs(targets, block_prefix) if range_targets else iter(targets)
+        else:
+            specs = iter_targets(lines, max_expand or None)
+        for chunk in iter_chunks(_progress(specs, "Targets processed", start, batch_size), batch_size):
+            new_targets += db_repo.bulk_insert_targets(
+                session,
+                (
+                    (address, TargetKind.RANGE if range_targets and is_range_spec(address) else TargetKind.HOST)
+                    for address in chunk
+                ),
+            )
+            session.commit()
+            seen += len(chunk)
+    elapsed = time.perf_counter() - start
+    typer.echo(
+        f"Ingested {new_targets} new targets. Skipped {seen - new_targets} duplicates. "
+        f"({seen:,} targets in {elapsed:.1f}s, {seen / max(elapsed, 1e-9):,.0f}/s)"
+    )
 
 
 @app.command()
@@ -68,32 +150,70 @@ def plan(
     typer.echo(f"Created scan run {run.id}")
 
 
+def _strategy_help(default_label: str) -> str:
+    names = ", ".join(sorted(STRATEGIES))
+    return (
+        f"Chunking strategy, also stored as the batch label ({names}); "
+        f"'{default_label}' slices targets in their original order"
+    )
+
+
+def _split_into_batches(
+    session: Session,
+    targets,
+    chunk_size: int,
+    strategy: str,
+    subnet_prefix: int,
+    options: Optional[str] = None,
+) -> List[List[int]]:
+    """Group ``(id, address, resolved_address)`` rows into lists of target ids."""
+    keys = [address_key(resolved or address) for _, address, resolved in targets]
+    try:
+        costs = None
+        if getattr(get_strategy(strategy), "uses_costs", False):
+            costs = estimate_costs(session, [(t[0], t[1]) for t in targets], options)
+        groups = split_targets(keys, chunk_size, strategy, prefix=subnet_prefix, costs=costs)
+    except ValueError as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    if costs is not None:
+        typer.echo(f"Estimated slowest batch: {makespan(groups, costs):.0f}s")
+    return [[targets[i][0] for i in group] for group in groups]
+
+
 @app.command()
 def split(
     ctx: typer.Context,
     scan_run_id: int,
     chunk_size: int = typer.Option(10, help="Targets per batch"),
-    strategy: str = typer.Option(
-        "initial", help="Strategy label for created batches"
+    strategy: str = typer.Option("initial", help=_strategy_help("initial")),
+    subnet_prefix: int = typer.Option(
+        24, "--subnet-prefix", help="Subnet size for the subnet and interleave strategies"
     ),
 ):
     """Split all Targets into Batches for a ScanRun."""
     session: Session = ctx.obj
-    targets = db_repo.list_targets(session)
+    targets = db_repo.list_target_addresses(session)
     if not targets:
         typer.echo("No targets to batch")
         raise typer.Exit(code=1)
-    batches = []
-    for i in range(0, len(targets), chunk_size):
-        batch_targets = targets[i : i + chunk_size]
-        batch = db_repo.create_batch(
-            session,
-            scan_run_id=scan_run_id,
-            name=f"run{scan_run_id}_batch{i // chunk_size + 1}",
-            targets=batch_targets,
-            strategy=strategy,
-        )
-        batches.append(batch)
+    scan_run = db_repo.get_scan_run(session, scan_run_id)
+    groups = _split_into_batches(
+        session, targets, chunk_size, strategy, subnet_prefix, scan_run.options if scan_run else None
+    )
+    batches = db_repo.create_batches(
+        session,
+        [
+            dict(
+                scan_run_id=scan_run_id,
+                name=f"run{scan_run_id}_batch{i + 1}",
+                strategy=strategy,
+                planned_chunk_size=chunk_size,
+            )
+            for i in range(len(groups))
+        ],
+        groups,
+    )
     typer.echo(f"Created {len(batches)} batches")
 
 
@@ -102,8 +222,9 @@ def resplit(
     ctx: typer.Context,
     parent_batch_id: int,
     chunk_size: int = typer.Option(10, help="Targets per child batch"),
-    strategy: str = typer.Option(
-        "resplit", help="Strategy label for created child batches"
+    strategy: str = typer.Option("resplit", help=_strategy_help("resplit")),
+    subnet_prefix: int = typer.Option(
+        24, "--subnet-prefix", help="Subnet size for the subnet and interleave strategies"
     ),
 ):
     """Split an existing Batch into child Batches."""
@@ -112,22 +233,28 @@ def resplit(
     if not parent:
         typer.echo("Parent batch not found")
         raise typer.Exit(code=1)
-    targets = list(parent.targets)
+    targets = db_repo.list_target_addresses(session, batch_id=parent.id)
     if not targets:
         typer.echo("Parent batch has no targets")
         raise typer.Exit(code=1)
-    batches = []
-    for i in range(0, len(targets), chunk_size):
-        batch_targets = targets[i : i + chunk_size]
-        batch = db_repo.create_batch(
-            session,
-            scan_run_id=parent.scan_run_id,
-            name=f"{parent.name}_child{i // chunk_size + 1}",
-            targets=batch_targets,
-            parent_batch_id=parent.id,
-            strategy=strategy,
-        )
-        batches.append(batch)
+    scan_run = db_repo.get_scan_run(session, parent.scan_run_id)
+    groups = _split_into_batches(
+        session, targets, chunk_size, strategy, subnet_prefix, scan_run.options if scan_run else None
+    )
+    batches = db_repo.create_batches(
+        session,
+        [
+            dict(
+                scan_run_id=parent.scan_run_id,
+                name=f"{parent.name}_child{i + 1}",
+                parent_batch_id=parent.id,
+                strategy=strategy,
+                planned_chunk_size=chunk_size,
+            )
+            for i in range(len(groups))
+        ],
+        groups,
+    )
     typer.echo(f"Created {len(batches)} child batches")
 
 
@@ -137,50 +264,183 @@ def run(
     scan_run_id: int,
     timeout_sec: int = typer.Option(60, help="Timeout for each nmap job"),
     concurrency: int = typer.Option(10, help="Number of concurrent nmap jobs"),
+    resolve: bool = typer.Option(
+        True,
+        "--resolve/--no-resolve",
+        help="Resolve hostname targets up front and pass nmap the address with -n",
+    ),
+    dns_concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--dns-concurrency", help="Concurrent hostname lookups"
+    ),
+    nameserver: Optional[str] = typer.Option(
+        None,
+        "--nameserver",
+        help="Query this DNS server directly instead of using the system resolver",
+    ),
+    nameserver_port: int = typer.Option(53, "--nameserver-port", help="Port of --nameserver"),
+    schedule: str = typer.Option(
+        "per-target",
+        "--schedule",
+        help="per-target: one nmap process per target; guided: shrinking multi-target work units",
+    ),
+    min_chunk: int = typer.Option(1, "--min-chunk", help="Smallest guided work unit"),
+    max_chunk: int = typer.Option(0, "--max-chunk", help="Largest guided work unit (0 for no limit)"),
+    unit_timeout_sec: int = typer.Option(
+        0,
+        "--unit-timeout",
+        help="Timeout for each guided work unit (0: --timeout-sec per 64 targets, nmap's host group)",
+    ),
+    speculate: bool = typer.Option(
+        False, "--speculate/--no-speculate", help="Launch backup attempts for straggling jobs"
+    ),
+    speculate_after: float = typer.Option(
+        0.9, "--speculate-after", help="Fraction of jobs that must be finished before backups start"
+    ),
+    speculate_factor: float = typer.Option(
+        2.0, "--speculate-factor", help="Back up jobs running longer than this times the median"
+    ),
+    speculative_slots: int = typer.Option(
+        2, "--speculative-slots", help="Maximum backup attempts running at once"
+    ),
+    auto_bisect: bool = typer.Option(
+        False,
+        "--auto-bisect/--no-auto-bisect",
+        help="Split timed-out guided units in half and retry, down to single targets",
+    ),
+    slow_concurrency: int = typer.Option(1, "--slow-concurrency", help="Concurrent jobs in the slow lane"),
+    slow_timing: str = typer.Option("-T2", "--slow-timing", help="nmap timing template for the slow lane"),
+    slow_timeout: int = typer.Option(900, "--slow-timeout", help="Timeout for each slow lane job"),
+    quarantine_timeouts: int = typer.Option(
+        DEFAULT_MIN_TIMEOUTS,
+        "--quarantine-timeouts",
+        help="Send targets that timed out this often in earlier runs to the slow lane (0 to disable)",
+    ),
+    quarantine_p90: float = typer.Option(
+        0,
+        "--quarantine-p90",
+        help="Also send targets whose 90th percentile scan time is at least this many seconds (0 to disable)",
+    ),
 ):
-    """Execute all Batches for a ScanRun by creating and running jobs."""
+    """Execute all Batches for a ScanRun by creating and running jobs.
+
+    With ``--schedule guided`` targets are not scanned one nmap process at a
+    time: idle workers take work units of ``remaining / concurrency``
+    targets, cut from the planned batches, so units shrink towards
+    ``--min-chunk`` at the tail.  Each unit is recorded as a child batch.
+    ``--auto-bisect`` retries the unfinished targets of a timed-out unit as
+    two halves, and single targets that still time out in the slow lane.
+
+    Targets that were difficult in earlier runs (see ``--quarantine-timeouts``
+    and ``--quarantine-p90``) are scanned in the slow lane from the start.
+    """
     session: Session = ctx.obj
     scan_run = db_repo.get_scan_run(session, scan_run_id)
     if not scan_run:
         typer.echo(f"ScanRun {scan_run_id} not found")
         raise typer.Exit(code=1)
 
-    batches = db_repo.list_batches_for_run(session, scan_run_id)
+    # Work units are an execution record; their parents hold the targets
+    batches = [b for b in db_repo.list_batches_for_run(session, scan_run_id) if b.strategy not in UNIT_STRATEGIES]
     if not batches:
         typer.echo("No batches to run for this scan run")
         raise typer.Exit(code=1)
 
-    # Create all job records first
-    job_ids = []
-    for batch in batches:
-        for target in batch.targets:
-            job = db_repo.create_job(
+    if schedule not in ("per-target", "guided"):
+        typer.echo(f"Unknown schedule {schedule!r}; choose from: per-target, guided")
+        raise typer.Exit(code=1)
+    if auto_bisect and schedule != "guided":
+        typer.echo("--auto-bisect requires --schedule guided")
+        raise typer.Exit(code=1)
+
+    quarantined = set()
+    if quarantine_timeouts or quarantine_p90:
+        difficult = difficult_targets(
+            session, min_timeouts=quarantine_timeouts or None, min_p90=quarantine_p90 or None
+        )
+        quarantined = {d.target_id for d in difficult}
+
+    # Create all job records first, one INSERT ... SELECT per batch.  Only the
+    # id range of each batch is kept; the runner reads the ids back as needed.
+    pools = [
+        (
+            batch.id,
+            db_repo.materialize_jobs(
                 session,
-                scan_run_id=scan_run_id,
-                target_id=target.id,
+                scan_run_id,
+                batch.id,
                 status=JobStatus.PLANNED,
                 timeout_sec=timeout_sec,
                 nmap_options=scan_run.options,
-            )
-            job_ids.append(job.id)
-
-    if not job_ids:
+            ),
+        )
+        for batch in batches
+    ]
+    session.commit()
+    pools = [(batch_id, job_ids) for batch_id, job_ids in pools if job_ids]
+    job_count = sum(len(job_ids) for _, job_ids in pools)
+    if not job_count:
         typer.echo("No jobs were created to run.")
         raise typer.Exit()
+    first_job_id = pools[0][1].start
+    slow_job_ids = db_repo.list_job_ids_for_targets(session, scan_run_id, quarantined, after=first_job_id - 1)
 
-    typer.echo(f"Created {len(job_ids)} jobs. Starting runner...")
+    typer.echo(f"Created {job_count} jobs.")
+    if slow_job_ids:
+        typer.echo(f"Routing {len(slow_job_ids)} difficult targets to the slow lane.")
 
-    # Run the jobs concurrently
-    asyncio.run(
-        run_jobs_concurrently(
-            scan_run_id=scan_run_id,
-            job_ids=job_ids,
-            db_session=session,
-            concurrency=concurrency,
-            timeout_sec=timeout_sec,
+    if resolve:
+        resolver = DnsResolver(nameserver, nameserver_port) if nameserver else SystemResolver()
+        targets = db_repo.iter_hostname_targets_for_scan_run(session, scan_run_id)
+        resolved = asyncio.run(
+            resolve_targets(session, targets, resolver=resolver, concurrency=dns_concurrency)
+        )
+        if resolved:
+            typer.echo(f"Resolved {len(resolved)} hostnames.")
+
+    speculation = (
+        SpeculationPolicy(
+            multiplier=speculate_factor, min_progress=speculate_after, slots=speculative_slots
         )
+        if speculate
+        else None
     )
 
+    slow_lane = SlowLane(slow_concurrency, slow_timing, slow_timeout)
+
+    typer.echo("Starting runner...")
+
+    # Run the jobs concurrently
+    if schedule == "guided":
+        asyncio.run(
+            run_jobs_guided(
+                scan_run_id=scan_run_id,
+                pools=pools,
+                db_session=session,
+                concurrency=concurrency,
+                timeout_sec=timeout_sec,
+                min_chunk=min_chunk,
+                max_chunk=max_chunk or None,
+                unit_timeout_sec=unit_timeout_sec or None,
+                speculation=speculation,
+                auto_bisect=auto_bisect,
+                slow_lane=slow_lane,
+                slow_job_ids=slow_job_ids,
+            )
+        )
+    else:
+        asyncio.run(
+            run_jobs_concurrently(
+                scan_run_id=scan_run_id,
+                job_ids=db_repo.iter_job_ids(session, scan_run_id, JobStatus.PLANNED, after=first_job_id - 1),
+                db_session=session,
+                concurrency=concurrency,
+                timeout_sec=timeout_sec,
+                speculation=speculation,
+                slow_lane=slow_lane,
+                slow_job_ids=slow_job_ids,
+            )
+        )
+
     db_repo.update_scan_run(session, scan_run_id, status=JobStatus.COMPLETED, completed_at=datetime.utcnow())
     typer.echo(f"Scan run {scan_run_id} finished.")
 
@@ -194,11 +454,21 @@ def status(
     csv_out: Optional[Path] = typer.Option(
         None, "--csv-out", help="Write run summary to CSV file", dir_okay=False
     ),
+    check_stats: bool = typer.Option(
+        False, "--check-stats", help="Recount the per-run job counters and repair any that drifted"
+    ),
 ):
     """Display a summary of scan runs, jobs and failures."""
 
     session: Session = ctx.obj
 
+    if check_stats:
+        repaired = db_repo.check_scan_run_stats(session)
+        if repaired:
+            typer.echo(f"Repaired counters of scan runs: {', '.join(map(str, repaired))}")
+        else:
+            typer.echo("Scan run counters are consistent.")
+
     run_summary = reporting.summarise_runs(session)
     slowest_jobs = reporting.get_slowest_jobs(session)
     failed_jobs = reporting.get_failed_jobs(session)
@@ -245,5 +515,129 @@ def status(
         typer.echo("No failed jobs")
 
 
+@app.command()
+def query(
+    ctx: typer.Context,
+    port: Optional[int] = typer.Option(None, "--port", help="Port number"),
+    state: Optional[str] = typer.Option(None, "--state", help="Port state, e.g. open or filtered"),
+    proto: Optional[str] = typer.Option(None, "--proto", help="tcp, udp or sctp"),
+    service: Optional[str] = typer.Option(None, "--service", help="Service name, e.g. ssh"),
+    product: Optional[str] = typer.Option(None, "--product", help="Service product, e.g. OpenSSH"),
+    version: Optional[str] = typer.Option(None, "--version", help="Product version prefix, e.g. 7."),
+    run: Optional[str] = typer.Option(None, "--run", help="Scan run id or 'latest'; all runs by default"),
+    limit: Optional[int] = typer.Option(None, "--limit", min=1, help="Maximum number of rows"),
+    json_out: Optional[Path] = typer.Option(
+        None, "--json-out", help="Write matching rows to JSON file", dir_okay=False
+    ),
+    backfill: bool = typer.Option(
+        False, "--backfill", help="First record observations for results stored before they existed"
+    ),
+):
+    """Find observed ports across runs, e.g. --port 22 --state open --run latest."""
+
+    session: Session = ctx.obj
+
+    if backfill:
+        filled = observations.backfill_observations(session)
+        typer.echo(f"Recorded observations for {filled} jobs.")
+
+    scan_run_id = None
+    if run == "latest":
+        scan_run_id = db_repo.get_latest_observed_scan_run_id(session)
+        if scan_run_id is None:
+            typer.echo("No observations recorded yet.")
+            raise typer.Exit()
+    elif run is not None:
+        try:
+            scan_run_id = int(run)
+        except ValueError:
+            typer.echo(f"Invalid --run {run!r}: expected a scan run id or 'latest'.")
+            raise typer.Exit(code=1)
+
+    rows = db_repo.query_port_observations(
+        session,
+        port=port,
+        state=state,
+        proto=proto,
+        scan_run_id=scan_run_id,
+        service=service,
+        product=product,
+        version=version,
+        limit=limit,
+    )
+    if json_out:
+        reporting.export_json(
+            [
+                {
+                    "scan_run_id": row.scan_run_id,
+                    "address": row.address,
+                    "proto": row.proto,
+                    "port": row.port,
+                    "state": row.state,
+                    "service": row.service,
+                    "product": row.product,
+                    "version": row.version,
+                }
+                for row in rows
+            ],
+            str(json_out),
+        )
+
+    if not rows:
+        typer.echo("No matching observations")
+        return
+    typer.echo(f"{'Run':<5} {'Address':<39} {'Port':<10} {'State':<13} {'Service':<12} {'Product / Version'}")
+    for row in rows:
+        product_version = " ".join(part for part in (row.product, row.version) if part)
+        typer.echo(
+            f"{row.scan_run_id:<5} {row.address:<39} {f'{row.port}/{row.proto}':<10} {row.state:<13} "
+            f"{row.service or '':<12} {product_version}"
+        )
+
+
+
+@app.command()
+def dispatcher(
+    ctx: typer.Context,
+    max_scans: int = typer.Option(2, "--max-scans", min=1, help="Scan runs executed at the same time"),
+    concurrency: int = typer.Option(0, "--concurrency", help="Concurrent nmap jobs per scan run (0 for one per CPU)"),
+    timeout_sec: int = typer.Option(DEFAULT_TIMEOUT_SEC, "--timeout-sec", help="Timeout for each nmap job"),
+    poll_interval: float = typer.Option(1.0, "--poll-interval", help="Seconds between checks for queued scan runs"),
+    once: bool = typer.Option(False, "--once", help="Exit as soon as no scan run is queued or running"),
+):
+    """Execute the scan runs the Web API queues when NETSCAN_DISPATCHER is set.
+
+    Progress is written to the database, where every API worker reads it for
+    its WebSocket and event-stream clients.  SIGINT or SIGTERM stops taking
+    new runs and exits once the running ones have finished; a second signal
+    exits at once, and the next dispatcher started on this host marks the
+    runs left unfinished as failed.
+    """
+    session: Session = ctx.obj
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    runner = Dispatcher(
+        session.get_bind(),
+        max_scans=max_scans,
+        concurrency=concurrency or None,
+        timeout_sec=timeout_sec,
+        poll_interval=poll_interval,
+    )
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+
+        def stop(signum):
+            typer.echo("Finishing the running scan runs; signal again to exit now.", err=True)
+            loop.remove_signal_handler(signum)
+            runner.stop()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop, signum)
+        await runner.serve(once=once)
+
+    typer.echo(f"Dispatcher {runner.owner} waiting for scan runs.")
+    asyncio.run(serve())
+
+
 if __name__ == "__main__":
     app()
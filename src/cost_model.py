@@ -0,0 +1,137 @@
+"""Expected scan duration per target, for cost-balanced batching.
+
+Equal host counts do not mean equal runtimes: one filtered host behind a
+slow firewall can take longer than the rest of its batch together.  The
+estimate for a target combines two sources:
+
+* an *option prior* (:func:`option_prior`): seconds per host implied by the
+  nmap options alone, e.g. ``-sV`` or ``-p-`` multiply the base cost and a
+  UDP scan multiplies it a lot more;
+* the target's *history*: every finished Job with ``started_at`` and
+  ``completed_at`` gives an observed duration.  Each observation is divided
+  by the prior of the options it ran with, which turns it into a
+  dimensionless difficulty factor that is comparable across option sets.
+
+The factors are averaged together with one pseudo-observation of ``1.0`` (the
+prior itself), so a single unusual run moves the estimate only half-way and
+targets without history get the plain prior.  The estimate is
+``difficulty * option_prior(current options)``; range targets are
+additionally scaled by their number of addresses.
+"""
+
+import shlex
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import repository as db_repo
+from ip_handler import AddressRange
+
+BASE_SECONDS = 5.0
+
+# Multipliers relative to a default top-1000 TCP scan of one host
+OPTION_FACTORS: Dict[str, float] = {
+    "-sV": 3.0,
+    "-sC": 2.0,
+    "-O": 1.5,
+    "-A": 6.0,
+    "-sU": 10.0,
+    "-p-": 8.0,
+    "--script": 2.0,
+    "-Pn": 1.5,
+    "-F": 0.3,
+    "-sn": 0.2,
+    "-T0": 20.0,
+    "-T1": 8.0,
+    "-T2": 3.0,
+    "-T3": 1.5,
+    "-T5": 0.7,
+}
+
+
+@lru_cache(maxsize=1024)
+def option_prior(options: Optional[str]) -> float:
+    """Return the expected seconds per host for an nmap option string.
+
+    Results are cached per options string: history rows repeat a handful of
+    option sets many times.
+    """
+
+    cost = BASE_SECONDS
+    tokens = shlex.split(options or "")
+    for i, token in enumerate(tokens):
+        if token in OPTION_FACTORS:
+            cost *= OPTION_FACTORS[token]
+        elif token.startswith("--script"):
+            cost *= OPTION_FACTORS["--script"]
+        elif token == "-p" and i + 1 < len(tokens):
+            cost *= _port_factor(tokens[i + 1])
+        elif token.startswith("-p") and token[2:3].isdigit():
+            cost *= _port_factor(token[2:])
+    return cost
+
+
+def _port_factor(spec: str) -> float:
+    """Scale by the number of ports in a ``-p`` list relative to 1000.
+
+    Host discovery and setup do not shrink with the port list, so the factor
+    never drops below 0.1.
+    """
+
+    count = 0
+    for part in spec.split(","):
+        part = part.split(":", 1)[-1]  # T:, U: prefixes
+        if "-" in part:
+            first, _, last = part.partition("-")
+            try:
+                count += int(last or 65535) - int(first or 1) + 1
+            except ValueError:
+                return 1.0
+        elif part:
+            count += 1
+    return max(count / 1000, 0.1) if count else 1.0
+
+
+def _target_size(address: str) -> int:
+    if "/" not in address:
+        return 1
+    try:
+        return AddressRange.from_network(address).size
+    except ValueError:
+        return 1
+
+
+def estimate_costs(
+    session: Session,
+    targets: Sequence[Tuple[int, str]],
+    options: Optional[str] = None,
+) -> List[float]:
+    """Estimate the scan duration in seconds of each ``(id, address)`` target.
+
+    See the module docstring for the model.  History is read from all
+    finished Jobs of the targets, across every scan run, summed per target
+    and option set in SQL.
+    """
+
+    prior = option_prior(options)
+    sums: Dict[int, float] = {}
+    counts: Dict[int, int] = {}
+    for target_id, job_options, jobs, seconds in db_repo.sum_job_durations(session, (t for t, _ in targets)):
+        sums[target_id] = sums.get(target_id, 0.0) + seconds / option_prior(job_options)
+        counts[target_id] = counts.get(target_id, 0) + jobs
+
+    costs = []
+    for target_id, address in targets:
+        difficulty = (sums.get(target_id, 0.0) + 1.0) / (counts.get(target_id, 0) + 1)
+        costs.append(difficulty * prior * _target_size(address))
+    return costs
+
+
+def makespan(groups: Iterable[Sequence[int]], costs: Sequence[float]) -> float:
+    """Expected duration of the slowest group, i.e. the run's critical path."""
+
+    return max((sum(costs[i] for i in group) for group in groups), default=0.0)
+
+
+__all__ = ["OPTION_FACTORS", "option_prior", "estimate_costs", "makespan"]
@@ -1,16 +1,36 @@
 """Database utilities for NetScanOrchestrator."""
 
 from .session import get_session, init_engine
-from .models import Base, Target, ScanRun, Batch, Job, Result, JobStatus
+from .models import (
+    Base,
+    Target,
+    TargetKind,
+    ScanRun,
+    Batch,
+    Job,
+    Result,
+    JobStatus,
+    DnsCacheEntry,
+    HostObservation,
+    PortObservation,
+    ScanRunStats,
+    ScanEvent,
+)
 
 __all__ = [
     "get_session",
     "init_engine",
     "Base",
     "Target",
+    "TargetKind",
     "ScanRun",
     "Batch",
     "Job",
     "Result",
     "JobStatus",
+    "DnsCacheEntry",
+    "HostObservation",
+    "PortObservation",
+    "ScanRunStats",
+    "ScanEvent",
 ]
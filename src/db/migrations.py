@@ -0,0 +1,222 @@
+"""Schema migrations for existing state databases.
+
+``Base.metadata.create_all`` creates missing tables but never alters a table
+that already exists, so databases created by an older release would lack
+newer columns and indexes.  Each entry of :data:`MIGRATIONS` upgrades the
+schema by one version and the version reached is stored in SQLite's
+``PRAGMA user_version``.  :func:`migrate` runs the pending entries after
+``create_all``.
+
+Migrations only add things and check before adding, so they are safe on a
+fresh database where ``create_all`` already built the current schema and can
+simply be re-run if one is interrupted.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from .models import JobStatus
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def _columns(connection: Connection, table: str) -> List[str]:
+    return [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+
+def _add_column(connection: Connection, table: str, name: str, ddl: str) -> None:
+    """Add a column unless ``table`` already has it."""
+    if name not in _columns(connection, table):
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+
+def _add_columns(connection: Connection) -> None:
+    _add_column(connection, "targets", "kind", "VARCHAR(5) NOT NULL DEFAULT 'HOST'")
+    _add_column(connection, "targets", "resolved_address", "VARCHAR")
+    _add_column(connection, "targets", "resolved_at", "DATETIME")
+    _add_column(connection, "results", "partial", "BOOLEAN NOT NULL DEFAULT 0")
+    _add_column(connection, "scan_runs", "request_json", "TEXT")
+    _add_column(connection, "scan_runs", "target_count", "INTEGER")
+
+
+def _add_claims(connection: Connection) -> None:
+    _add_column(connection, "scan_runs", "claimed_by", "VARCHAR")
+    # Runs submitted before there was a queue were executed by the API
+    # process; keep the dispatcher from picking them up
+    connection.exec_driver_sql(
+        "UPDATE scan_runs SET claimed_by = 'api' WHERE claimed_by IS NULL AND request_json IS NOT NULL"
+    )
+
+
+def _add_job_timeouts(connection: Connection) -> None:
+    _add_column(connection, "jobs", "timeouts", "INTEGER NOT NULL DEFAULT 0")
+    # Timeouts whose reason was since overwritten are lost
+    connection.exec_driver_sql("UPDATE jobs SET timeouts = 1 WHERE reason = 'timeout' AND timeouts = 0")
+
+
+# Keep in step with the Index declarations in models.py
+INDEXES = {
+    "ix_jobs_scan_run_status": "jobs (scan_run_id, status)",
+    "ix_jobs_scan_run_id": "jobs (scan_run_id)",
+    "ix_jobs_status": "jobs (status)",
+    "ix_jobs_target_id": "jobs (target_id)",
+    "ix_jobs_elapsed": "jobs (julianday(completed_at) - julianday(started_at) DESC)",
+    "ix_results_job_id": "results (job_id)",
+    "ix_batches_scan_run_id": "batches (scan_run_id)",
+    "ix_batch_target_association_target_id": "batch_target_association (target_id)",
+    "ix_host_observations_job_id": "host_observations (job_id)",
+    "ix_host_observations_address": "host_observations (address)",
+    "ix_host_observations_run_state": "host_observations (scan_run_id, state)",
+    "ix_port_observations_address": "port_observations (address)",
+    "ix_port_observations_port_state_run": "port_observations (port, state, scan_run_id)",
+    "ix_port_observations_product_version": "port_observations (product, version)",
+    "ix_port_observations_job_state_port": "port_observations (job_id, state, port)",
+    "ix_scan_events_run_seq": "scan_events (scan_run_id, seq)",
+    "ix_scan_events_run_key_seq": "scan_events (scan_run_id, key, seq)",
+}
+
+
+def _add_indexes(connection: Connection) -> None:
+    for name, definition in INDEXES.items():
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+# Counter columns of scan_run_stats: one per JobStatus (as stored, by name)
+# and the host states counted from host_observations
+JOB_COUNTERS = {status.value: status.name for status in JobStatus}
+HOST_COUNTERS = {"hosts_up": "up", "hosts_down": "down"}
+STATS_COLUMNS = (*JOB_COUNTERS, *HOST_COUNTERS)
+
+
+def _stats_triggers() -> Dict[str, str]:
+    """Return ``{name: definition}`` of the triggers maintaining scan_run_stats.
+
+    Every run gets its counter row when it is inserted.  Each counter then
+    has its own triggers guarded by ``WHEN``, so a firing is a single-column
+    update by primary key, which keeps bulk job inserts cheap.
+    """
+
+    def bump(column: str, sign: str, run: str) -> str:
+        return f"UPDATE scan_run_stats SET {column} = {column} {sign} 1 WHERE scan_run_id = {run}.scan_run_id;"
+
+    moved = "(OLD.status IS NOT NEW.status OR OLD.scan_run_id IS NOT NEW.scan_run_id)"
+    triggers = {
+        "scan_run_stats_run_insert": f"""AFTER INSERT ON scan_runs BEGIN
+            INSERT OR IGNORE INTO scan_run_stats (scan_run_id, {', '.join(STATS_COLUMNS)})
+            VALUES (NEW.id, {', '.join('0' for _ in STATS_COLUMNS)});
+        END""",
+        "scan_run_stats_run_delete": """AFTER DELETE ON scan_runs BEGIN
+            DELETE FROM scan_run_stats WHERE scan_run_id = OLD.id;
+        END""",
+    }
+    for column, value in JOB_COUNTERS.items():
+        triggers[f"scan_run_stats_{column}_insert"] = (
+            f"AFTER INSERT ON jobs WHEN NEW.status = '{value}' BEGIN {bump(column, '+', 'NEW')} END"
+        )
+        triggers[f"scan_run_stats_{column}_delete"] = (
+            f"AFTER DELETE ON jobs WHEN OLD.status = '{value}' BEGIN {bump(column, '-', 'OLD')} END"
+        )
+        triggers[f"scan_run_stats_{column}_leave"] = (
+            f"AFTER UPDATE OF status, scan_run_id ON jobs WHEN OLD.status = '{value}' AND {moved} "
+            f"BEGIN {bump(column, '-', 'OLD')} END"
+        )
+        triggers[f"scan_run_stats_{column}_enter"] = (
+            f"AFTER UPDATE OF status, scan_run_id ON jobs WHEN NEW.status = '{value}' AND {moved} "
+            f"BEGIN {bump(column, '+', 'NEW')} END"
+        )
+    for column, value in HOST_COUNTERS.items():
+        triggers[f"scan_run_stats_{column}_insert"] = (
+            f"AFTER INSERT ON host_observations WHEN NEW.state = '{value}' BEGIN {bump(column, '+', 'NEW')} END"
+        )
+        triggers[f"scan_run_stats_{column}_delete"] = (
+            f"AFTER DELETE ON host_observations WHEN OLD.state = '{value}' BEGIN {bump(column, '-', 'OLD')} END"
+        )
+    return triggers
+
+
+def recount_sql(where: str = "") -> str:
+    """Return a SELECT of ``(scan_run_id, *STATS_COLUMNS)`` counted from scratch.
+
+    Every count is an index lookup; ``where`` filters ``scan_runs r``.
+    """
+    counts = [
+        f"(SELECT count(*) FROM jobs WHERE scan_run_id = r.id AND status = '{value}')"
+        for value in JOB_COUNTERS.values()
+    ] + [
+        f"(SELECT count(*) FROM host_observations WHERE scan_run_id = r.id AND state = '{value}')"
+        for value in HOST_COUNTERS.values()
+    ]
+    return f"SELECT r.id, {', '.join(counts)} FROM scan_runs r {where} ORDER BY r.id"
+
+
+def rebuild_scan_run_stats(connection: Connection) -> None:
+    """Replace every run's counters with a fresh count."""
+    connection.exec_driver_sql("DELETE FROM scan_run_stats")
+    connection.exec_driver_sql(
+        f"INSERT INTO scan_run_stats (scan_run_id, {', '.join(STATS_COLUMNS)}) {recount_sql()}"
+    )
+
+
+def _add_stats_triggers(connection: Connection) -> None:
+    for name, body in _stats_triggers().items():
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        connection.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    rebuild_scan_run_stats(connection)
+
+
+def _drop_superseded_observations(connection: Connection) -> None:
+    # Jobs rerun after a timeout recorded their hosts once per attempt;
+    # keep the latest and recount
+    connection.exec_driver_sql(
+        "DELETE FROM host_observations WHERE id NOT IN "
+        "(SELECT max(id) FROM host_observations GROUP BY job_id, address)"
+    )
+    connection.exec_driver_sql(
+        "DELETE FROM port_observations WHERE id NOT IN "
+        "(SELECT max(id) FROM port_observations GROUP BY job_id, address, proto, port)"
+    )
+    rebuild_scan_run_stats(connection)
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "target kind, name resolution, partial results, API scan requests", _add_columns),
+    (2, "indexes for status polls, reports and result lookups", _add_indexes),
+    (3, "per-run counters maintained by triggers", _add_stats_triggers),
+    (4, "indexes for paged and filtered host results", _add_indexes),
+    (5, "scan run claims for the dispatcher", _add_claims),
+    (6, "per-job timeout counts", _add_job_timeouts),
+    (7, "observations superseded by a rerun of their job", _drop_superseded_observations),
+]
+
+
+def schema_version(connection: Connection) -> int:
+    """Return the schema version recorded in the database."""
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine: Engine) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    with engine.connect() as connection:
+        version = schema_version(connection)
+    for number, _description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            apply(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {number}")
+        version = number
+    return version
+
+
+__all__ = [
+    "MIGRATIONS",
+    "INDEXES",
+    "STATS_COLUMNS",
+    "migrate",
+    "rebuild_scan_run_stats",
+    "recount_sql",
+    "schema_version",
+]
@@ -13,6 +13,9 @@ from sqlalchemy import (
     ForeignKey,
     Table,
     Enum,
+    Boolean,
+    Index,
+    func,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -23,7 +26,7 @@ batch_target_association = Table(
     "batch_target_association",
     Base.metadata,
     Column("batch_id", ForeignKey("batches.id"), primary_key=True),
-    Column("target_id", ForeignKey("targets.id"), primary_key=True),
+    Column("target_id", ForeignKey("targets.id"), primary_key=True, index=True),
 )
 
 
@@ -38,13 +41,26 @@ class JobStatus(str, PyEnum):
     PAUSED = "paused"
 
 
+class TargetKind(str, PyEnum):
+    """Whether a target is a single host or a range handed to nmap as-is."""
+
+    HOST = "host"
+    RANGE = "range"
+
+
 class Target(Base):
-    """Represents a host or IP address that can be scanned."""
+    """Represents a host, IP address or CIDR block that can be scanned.
+
+    ``RANGE`` targets store a CIDR specification in ``address``.  They are
+    never expanded into per-address rows: nmap sweeps the block and per-host
+    data exists only for the hosts it reports.
+    """
 
     __tablename__ = "targets"
 
     id = Column(Integer, primary_key=True)
     address = Column(String, unique=True, nullable=False)
+    kind = Column(Enum(TargetKind), default=TargetKind.HOST, nullable=False)
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -52,6 +68,10 @@ class Target(Base):
     tags = Column(String, nullable=True)  # Comma-separated tags
     per_target_options = Column(String, nullable=True)  # e.g. specific nmap flags
 
+    # Name resolution for hostname targets; nmap is given this address with -n
+    resolved_address = Column(String, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+
     # Relationships
     batches = relationship(
         "Batch",
@@ -61,7 +81,7 @@ class Target(Base):
     jobs = relationship("Job", back_populates="target")
 
     def __repr__(self) -> str:  # pragma: no cover - simple repr
-        return f"<Target id={self.id} address={self.address}>"
+        return f"<Target id={self.id} address={self.address} kind={self.kind}>"
 
 
 class ScanRun(Base):
@@ -76,19 +96,57 @@ class ScanRun(Base):
     options = Column(String, nullable=True)  # e.g. nmap command line options
     notes = Column(Text, nullable=True)
 
+    # Raw POST /api/scans body, expanded by the planning stage after the 202
+    request_json = Column(Text, nullable=True)
+    # Number of targets the planning stage is writing, once expansion is done
+    target_count = Column(Integer, nullable=True)
+    # "host:pid" of the process executing an API-submitted run; NULL while
+    # the run waits in the queue for ``netscan dispatcher``
+    claimed_by = Column(String, nullable=True)
+
     jobs = relationship("Job", back_populates="scan_run")
 
     def __repr__(self) -> str:  # pragma: no cover
         return f"<ScanRun id={self.id} status={self.status.value}>"
 
 
+class ScanRunStats(Base):
+    """Per-run job and host counters, kept current by triggers.
+
+    The triggers created by :mod:`db.migrations` adjust the counters in the
+    same transaction as every insert, status change or delete of a Job and
+    every host observation, whichever code path writes them, so progress
+    is read from one row instead of counting the run's jobs.
+    """
+
+    __tablename__ = "scan_run_stats"
+
+    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), primary_key=True)
+    # One counter per JobStatus, named after its value
+    pending = Column(Integer, default=0, nullable=False)
+    planned = Column(Integer, default=0, nullable=False)
+    running = Column(Integer, default=0, nullable=False)
+    completed = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    paused = Column(Integer, default=0, nullable=False)
+    hosts_up = Column(Integer, default=0, nullable=False)
+    hosts_down = Column(Integer, default=0, nullable=False)
+
+    @property
+    def total(self) -> int:
+        return sum(getattr(self, status.value) for status in JobStatus)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<ScanRunStats run={self.scan_run_id} total={self.total} completed={self.completed}>"
+
+
 class Batch(Base):
     """A collection of targets that can be scanned together."""
 
     __tablename__ = "batches"
 
     id = Column(Integer, primary_key=True)
-    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False)
+    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False, index=True)
     name = Column(String, unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     parent_batch_id = Column(Integer, ForeignKey("batches.id"), nullable=True)
@@ -130,8 +188,8 @@ class Job(Base):
 
     id = Column(Integer, primary_key=True)
     scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False)
-    target_id = Column(Integer, ForeignKey("targets.id"), nullable=False)
-    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False)
+    target_id = Column(Integer, ForeignKey("targets.id"), nullable=False, index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
@@ -143,11 +201,24 @@ class Job(Base):
     attempt = Column(Integer, default=1, nullable=False)
     max_attempts = Column(Integer, default=3, nullable=False)
     reason = Column(String, nullable=True)  # e.g. "timeout", "killed", "error"
+    # Times the Job's attempts timed out; kept when a retry or bisect later
+    # replaces ``reason``
+    timeouts = Column(Integer, default=0, nullable=False)
 
     scan_run = relationship("ScanRun", back_populates="jobs")
     target = relationship("Target", back_populates="jobs")
     results = relationship("Result", back_populates="job")
 
+    __table_args__ = (
+        # Per-run status counts are answered from the index alone
+        Index("ix_jobs_scan_run_status", scan_run_id, status),
+        # Lookups by scan_run_id; the implicit rowid column also serves
+        # keyset pages over a run's Jobs (scan_run_id = ? AND id > ?)
+        Index("ix_jobs_scan_run_id", scan_run_id),
+        # Slowest jobs first; the expression must match the reporting query
+        Index("ix_jobs_elapsed", (func.julianday(completed_at) - func.julianday(started_at)).desc()),
+    )
+
     def __repr__(self) -> str:  # pragma: no cover
         return f"<Job id={self.id} target_id={self.target_id} status={self.status.value}>"
 
@@ -158,13 +229,106 @@ class Result(Base):
     __tablename__ = "results"
 
     id = Column(Integer, primary_key=True)
-    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False, index=True)
     stdout = Column(Text, nullable=True)
     stderr = Column(Text, nullable=True)
     summary_json = Column(Text, nullable=True)
+    # True when nmap was killed before finishing; only complete hosts are kept
+    partial = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     job = relationship("Job", back_populates="results")
 
     def __repr__(self) -> str:  # pragma: no cover
         return f"<Result id={self.id} job_id={self.job_id}>"
+
+
+class DnsCacheEntry(Base):
+    """Cached hostname resolution, valid until ``expires_at`` (record TTL)."""
+
+    __tablename__ = "dns_cache"
+
+    id = Column(Integer, primary_key=True)
+    hostname = Column(String, unique=True, nullable=False)
+    addresses = Column(String, nullable=False)  # Comma-separated, preferred first
+    resolved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<DnsCacheEntry hostname={self.hostname} addresses={self.addresses}>"
+
+
+class HostObservation(Base):
+    """A host as nmap reported it in one Job, normalised out of ``Result.summary_json``."""
+
+    __tablename__ = "host_observations"
+
+    id = Column(Integer, primary_key=True)
+    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False, index=True)
+    address = Column(String, nullable=False, index=True)
+    state = Column(String, nullable=False)  # "up", "down" or "unknown"
+    reason = Column(String, nullable=True)
+    observed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_host_observations_run_state", scan_run_id, state),)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<HostObservation address={self.address} state={self.state} run={self.scan_run_id}>"
+
+
+class PortObservation(Base):
+    """One port of an observed host; run and address are repeated for index-only queries."""
+
+    __tablename__ = "port_observations"
+
+    id = Column(Integer, primary_key=True)
+    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False)
+    job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False)
+    address = Column(String, nullable=False, index=True)
+    proto = Column(String, nullable=False)  # "tcp", "udp", "sctp"
+    port = Column(Integer, nullable=False)
+    state = Column(String, nullable=False)  # e.g. "open", "closed", "filtered"
+    service = Column(String, nullable=True)
+    product = Column(String, nullable=True)
+    version = Column(String, nullable=True)
+
+    __table_args__ = (
+        # netscan query --port N --state S [--run R]
+        Index("ix_port_observations_port_state_run", port, state, scan_run_id),
+        # netscan query --product P [--version V]
+        Index("ix_port_observations_product_version", product, version),
+        # Open-port filters of GET /api/scans/{id}/hosts
+        Index("ix_port_observations_job_state_port", job_id, state, port),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<PortObservation address={self.address} {self.proto}/{self.port} state={self.state}>"
+
+
+class ScanEvent(Base):
+    """One update message of a ScanRun, as sent to API clients.
+
+    ``seq`` increases by one per message of a run.  ``key`` names what the
+    message is about (``chunk:<job id>`` or the message type); once a run
+    has ended only the latest message of each key is kept.
+    """
+
+    __tablename__ = "scan_events"
+
+    id = Column(Integer, primary_key=True)
+    scan_run_id = Column(Integer, ForeignKey("scan_runs.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    key = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    payload_json = Column(Text, nullable=False)
+
+    __table_args__ = (
+        # Replays: scan_run_id = ? AND seq > ?
+        Index("ix_scan_events_run_seq", scan_run_id, seq),
+        # Compaction keeps the highest seq of each key
+        Index("ix_scan_events_run_key_seq", scan_run_id, key, seq),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<ScanEvent run={self.scan_run_id} seq={self.seq} key={self.key}>"
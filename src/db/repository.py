@@ -1,12 +1,30 @@
 """Convenience CRUD helpers for database models."""
 
 from __future__ import annotations
-from typing import Iterable, List, Optional, Type, TypeVar, Any
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar, Any
+from sqlalchemy import func, insert, or_, update
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
-from .models import Target, ScanRun, Batch, Job, Result
-
-ModelType = TypeVar("ModelType", Target, ScanRun, Batch, Job, Result)
+from .models import (
+    Target,
+    TargetKind,
+    ScanRun,
+    Batch,
+    Job,
+    JobStatus,
+    Result,
+    DnsCacheEntry,
+    HostObservation,
+    PortObservation,
+    ScanRunStats,
+    ScanEvent,
+    batch_target_association,
+)
+from .migrations import STATS_COLUMNS, recount_sql
+
+ModelType = TypeVar("ModelType", Target, ScanRun, Batch, Job, Result, DnsCacheEntry)
 
 
 def _create(session: Session, model: Type[ModelType], **kwargs: Any) -> ModelType:
@@ -62,6 +80,100 @@ def list_targets(session: Session) -> List[Target]:
     return _list(session, Target)
 
 
+def _total_changes(session: Session) -> int:
+    return session.connection().exec_driver_sql("SELECT total_changes()").scalar()
+
+
+def bulk_insert_targets(session: Session, rows: Iterable[Tuple[str, TargetKind]]) -> int:
+    """Insert ``(address, kind)`` rows, skipping addresses that already exist.
+
+    Uses ``INSERT OR IGNORE`` against the unique ``address`` index in a single
+    executemany, instead of a lookup and a commit per row.  Values are run
+    through the column types once per batch rather than once per row.
+    Returns the number of rows actually inserted.  The caller commits.
+    """
+    table = Target.__table__
+    dialect = session.get_bind().dialect
+    kind_processor = table.c.kind.type.dialect_impl(dialect).bind_processor(dialect)
+    date_processor = table.c.created_at.type.dialect_impl(dialect).bind_processor(dialect)
+    kinds = {kind: kind_processor(kind) if kind_processor else kind.name for kind in TargetKind}
+    created_at = datetime.utcnow()
+    created_at = date_processor(created_at) if date_processor else created_at
+
+    params = [(address, kinds[kind], created_at) for address, kind in rows]
+    if not params:
+        return 0
+    before = _total_changes(session)
+    session.connection().exec_driver_sql(
+        "INSERT OR IGNORE INTO targets (address, kind, created_at) VALUES (?, ?, ?)", params
+    )
+    return _total_changes(session) - before
+
+
+def list_target_addresses(
+    session: Session, batch_id: Optional[int] = None
+) -> List[Tuple[int, str, Optional[str]]]:
+    """Return ``(id, address, resolved_address)`` for all Targets, by id.
+
+    With ``batch_id`` only the Batch's targets are returned.  Plain tuples
+    avoid loading ORM objects when planning very large runs.
+    """
+    query = session.query(Target.id, Target.address, Target.resolved_address)
+    if batch_id is not None:
+        query = query.join(
+            batch_target_association, batch_target_association.c.target_id == Target.id
+        ).filter(batch_target_association.c.batch_id == batch_id)
+    return [tuple(row) for row in query.order_by(Target.id)]
+
+
+def list_targets_for_scan_run(session: Session, scan_run_id: int) -> List[Target]:
+    """Return the distinct Targets that have Jobs in the given ScanRun."""
+    return (
+        session.query(Target)
+        .join(Job, Job.target_id == Target.id)
+        .filter(Job.scan_run_id == scan_run_id)
+        .distinct()
+        .all()
+    )
+
+
+def iter_hostname_targets_for_scan_run(
+    session: Session, scan_run_id: int, page_size: int = 1000
+) -> Iterator[Tuple[int, str]]:
+    """Yield ``(id, address)`` of the HOST Targets of a ScanRun that may be hostnames.
+
+    RANGE targets and IP literals (only digits and dots, or containing a
+    colon) are filtered out in SQL and rows are streamed, so a run of a
+    million addresses loads only its few hostnames.
+    """
+    query = (
+        session.query(Target.id, Target.address)
+        .join(Job, Job.target_id == Target.id)
+        .filter(
+            Job.scan_run_id == scan_run_id,
+            Target.kind == TargetKind.HOST,
+            Target.address.op("GLOB")("*[^0-9.]*"),
+            ~Target.address.contains(":"),
+        )
+        .distinct()
+        .execution_options(yield_per=page_size)
+    )
+    for target_id, address in query:
+        yield target_id, address
+
+
+def update_target_resolutions(
+    session: Session, resolutions: Iterable[Tuple[int, Optional[str], Optional[datetime]]]
+) -> None:
+    """Write ``(id, resolved_address, resolved_at)`` by Target id; the caller commits."""
+    rows = [
+        {"id": target_id, "resolved_address": address, "resolved_at": resolved_at}
+        for target_id, address, resolved_at in resolutions
+    ]
+    if rows:
+        session.execute(update(Target), rows)
+
+
 def update_target(session: Session, target_id: int, **kwargs: Any) -> Optional[Target]:
     return _update(session, Target, target_id, **kwargs)
 
@@ -92,12 +204,123 @@ def delete_scan_run(session: Session, run_id: int) -> bool:
     return _delete(session, ScanRun, run_id)
 
 
+def list_queued_scan_run_ids(session: Session, limit: int) -> List[int]:
+    """Return the ids of API-submitted ScanRuns nobody has claimed, oldest first."""
+    rows = (
+        session.query(ScanRun.id)
+        .filter(
+            ScanRun.claimed_by.is_(None),
+            ScanRun.request_json.isnot(None),
+            ScanRun.status == JobStatus.PLANNED,
+        )
+        .order_by(ScanRun.id)
+        .limit(limit)
+    )
+    return [run_id for (run_id,) in rows]
+
+
+def claim_scan_run(session: Session, run_id: int, owner: str) -> bool:
+    """Record ``owner`` as the executor of an unclaimed ScanRun.
+
+    A single conditional UPDATE, so of several dispatchers only one wins.
+    Commits and returns whether the claim succeeded.
+    """
+    claimed = (
+        session.query(ScanRun)
+        .filter(ScanRun.id == run_id, ScanRun.claimed_by.is_(None))
+        .update({ScanRun.claimed_by: owner}, synchronize_session=False)
+    )
+    session.commit()
+    return claimed == 1
+
+
+def list_unfinished_claimed_scan_runs(session: Session) -> List[ScanRun]:
+    """Return the claimed ScanRuns that are neither completed nor failed."""
+    return (
+        session.query(ScanRun)
+        .filter(
+            ScanRun.claimed_by.isnot(None),
+            ScanRun.status.notin_([JobStatus.COMPLETED, JobStatus.FAILED]),
+        )
+        .order_by(ScanRun.id)
+        .all()
+    )
+
+
 # Batch CRUD ---------------------------------------------------------------
 
 def create_batch(session: Session, **kwargs: Any) -> Batch:
     return _create(session, Batch, **kwargs)
 
 
+def create_batches(
+    session: Session, batches: Sequence[Dict[str, Any]], target_ids: Sequence[Sequence[int]]
+) -> List[Batch]:
+    """Create many Batches and their target associations in one transaction.
+
+    ``batches[i]`` holds the column values of a Batch and ``target_ids[i]``
+    the ids of its targets.  Association rows are written with a single
+    executemany rather than through the ``Batch.targets`` collection.
+    """
+    created = [Batch(**kwargs) for kwargs in batches]
+    session.add_all(created)
+    session.flush()
+    rows = [(batch.id, target_id) for batch, ids in zip(created, target_ids) for target_id in ids]
+    if rows:
+        session.connection().exec_driver_sql(
+            "INSERT INTO batch_target_association (batch_id, target_id) VALUES (?, ?)", rows
+        )
+    session.commit()
+    return created
+
+
+def add_batch_targets(
+    session: Session, batch_id: int, rows: Iterable[Tuple[str, TargetKind]]
+) -> Tuple[int, int]:
+    """Create missing Targets for ``(address, kind)`` rows and add all to a Batch.
+
+    The rows go into a temporary table with one executemany; missing
+    Targets and the association are then each written with a single
+    ``INSERT ... SELECT``, so there is no lookup per address and no limit on
+    the number of addresses.  Duplicates are ignored and the association
+    keeps the order of first appearance.  Returns ``(new targets, targets
+    added to the batch)``.  The caller commits.
+    """
+    connection = session.connection()
+    dialect = session.get_bind().dialect
+    table = Target.__table__
+    kind_processor = table.c.kind.type.dialect_impl(dialect).bind_processor(dialect)
+    date_processor = table.c.created_at.type.dialect_impl(dialect).bind_processor(dialect)
+    kinds = {kind: kind_processor(kind) if kind_processor else kind.name for kind in TargetKind}
+    created_at = datetime.utcnow()
+    created_at = date_processor(created_at) if date_processor else created_at
+
+    connection.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS plan_targets (address TEXT PRIMARY KEY, kind TEXT)"
+    )
+    connection.exec_driver_sql("DELETE FROM plan_targets")
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO plan_targets (address, kind) VALUES (?, ?)",
+        [(address, kinds[kind]) for address, kind in rows],
+    )
+    before = _total_changes(session)
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO targets (address, kind, created_at) "
+        "SELECT address, kind, ? FROM plan_targets ORDER BY rowid",
+        (created_at,),
+    )
+    created = _total_changes(session) - before
+    before = _total_changes(session)
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO batch_target_association (batch_id, target_id) "
+        "SELECT ?, t.id FROM plan_targets p JOIN targets t ON t.address = p.address ORDER BY p.rowid",
+        (batch_id,),
+    )
+    added = _total_changes(session) - before
+    connection.exec_driver_sql("DELETE FROM plan_targets")
+    return created, added
+
+
 def get_batch(session: Session, batch_id: int) -> Optional[Batch]:
     return _get(session, Batch, batch_id)
 
@@ -146,6 +369,261 @@ def list_jobs_for_scan_run(session: Session, scan_run_id: int) -> List[Job]:
     """Return all Jobs for a given ScanRun."""
     return session.query(Job).filter(Job.scan_run_id == scan_run_id).all()
 
+
+def materialize_jobs(
+    session: Session,
+    scan_run_id: int,
+    batch_id: int,
+    status: JobStatus = JobStatus.PLANNED,
+    timeout_sec: Optional[int] = None,
+    nmap_options: Optional[str] = None,
+) -> range:
+    """Create one Job per target of a Batch with a single ``INSERT ... SELECT``.
+
+    Jobs follow the order in which targets were added to the Batch.  Returns
+    the ids of the new Jobs, which are consecutive, as a ``range``.  The
+    caller commits.
+    """
+    table = Job.__table__
+    dialect = session.get_bind().dialect
+    status_processor = table.c.status.type.dialect_impl(dialect).bind_processor(dialect)
+    cursor = session.connection().exec_driver_sql(
+        "INSERT INTO jobs (scan_run_id, target_id, status, timeout_sec, nmap_options, attempt, max_attempts, timeouts) "
+        "SELECT ?, target_id, ?, ?, ?, ?, ?, ? FROM batch_target_association WHERE batch_id = ? ORDER BY rowid",
+        (
+            scan_run_id,
+            status_processor(status) if status_processor else status.name,
+            timeout_sec,
+            nmap_options,
+            table.c.attempt.default.arg,
+            table.c.max_attempts.default.arg,
+            table.c.timeouts.default.arg,
+            batch_id,
+        ),
+    )
+    # rowcount, unlike total_changes(), leaves out the scan_run_stats triggers
+    count = cursor.rowcount
+    if not count:
+        return range(0)
+    last = cursor.lastrowid
+    return range(last - count + 1, last + 1)
+
+
+def list_job_ids_for_targets(
+    session: Session, scan_run_id: int, target_ids: Iterable[int], after: int = 0
+) -> List[int]:
+    """Return the ids above ``after`` of a ScanRun's Jobs for the given targets."""
+    target_ids = list(target_ids)
+    job_ids: List[int] = []
+    # Keep each IN list well below SQLite's bound parameter limit
+    # The "+ 0" keeps SQLite on ix_jobs_target_id: the targets are few while
+    # ix_jobs_scan_run_id would walk every Job of the run
+    for i in range(0, len(target_ids), 500):
+        job_ids.extend(
+            job_id
+            for job_id, in session.query(Job.id).filter(
+                Job.scan_run_id + 0 == scan_run_id, Job.id > after, Job.target_id.in_(target_ids[i : i + 500])
+            )
+        )
+    return sorted(job_ids)
+
+
+def iter_job_ids(
+    session: Session,
+    scan_run_id: int,
+    status: Optional[JobStatus] = JobStatus.PLANNED,
+    after: int = 0,
+    page_size: int = 1000,
+) -> Iterator[int]:
+    """Yield the ids above ``after`` of a ScanRun's Jobs in ``status``, in order.
+
+    Ids are fetched ``page_size`` at a time, each page starting after the
+    last id seen, so no query stays open while the caller commits and Jobs
+    that leave ``status`` in the meantime are not revisited.
+    """
+    last = after
+    while True:
+        query = session.query(Job.id).filter(Job.scan_run_id == scan_run_id, Job.id > last)
+        if status is not None:
+            query = query.filter(Job.status == status)
+        page = [job_id for job_id, in query.order_by(Job.id).limit(page_size)]
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+
+def iter_job_summaries(
+    session: Session,
+    scan_run_id: int,
+    after: int = 0,
+    host_state: Optional[str] = None,
+    with_open_ports: bool = False,
+    open_port: Optional[int] = None,
+    page_size: int = 1000,
+) -> Iterator[Tuple[int, str, TargetKind, JobStatus, Optional[str]]]:
+    """Yield ``(job_id, address, kind, status, summary_json)`` of a ScanRun's Jobs.
+
+    Jobs come in id order from ``after`` onwards, ``page_size`` per query
+    like :func:`iter_job_ids`, with the summary of their latest Result.  The
+    filters narrow the Jobs through their host and port observations (open
+    TCP ports only), so Jobs whose results predate the observation tables
+    only match when no filter is given.
+    """
+    latest_summary = (
+        session.query(Result.summary_json)
+        .filter(Result.job_id == Job.id)
+        .order_by(Result.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = (
+        session.query(Job.id, Target.address, Target.kind, Job.status, latest_summary)
+        .join(Target, Target.id == Job.target_id)
+        .filter(Job.scan_run_id == scan_run_id)
+    )
+    if host_state is not None:
+        query = query.filter(
+            session.query(HostObservation.id)
+            .filter(HostObservation.job_id == Job.id, HostObservation.state == host_state)
+            .exists()
+        )
+    if with_open_ports or open_port is not None:
+        ports = session.query(PortObservation.id).filter(
+            PortObservation.job_id == Job.id, PortObservation.state == "open", PortObservation.proto == "tcp"
+        )
+        if open_port is not None:
+            ports = ports.filter(PortObservation.port == open_port)
+        query = query.filter(ports.exists())
+    last = after
+    while True:
+        page = query.filter(Job.id > last).order_by(Job.id).limit(page_size).all()
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1][0]
+
+
+def count_jobs_for_scan_run(
+    session: Session, scan_run_id: int, status: Optional[JobStatus] = None
+) -> int:
+    """Return the number of a ScanRun's Jobs, optionally only those in ``status``."""
+    query = session.query(func.count(Job.id)).filter(Job.scan_run_id == scan_run_id)
+    if status is not None:
+        query = query.filter(Job.status == status)
+    return query.scalar()
+
+
+def get_scan_run_stats(session: Session, scan_run_id: int) -> Optional[ScanRunStats]:
+    """Return a ScanRun's trigger-maintained counters, if it has any Jobs or hosts."""
+    return session.get(ScanRunStats, scan_run_id)
+
+
+def check_scan_run_stats(session: Session, repair: bool = True) -> List[int]:
+    """Recount every ScanRun's counters and return the ids whose rows were wrong.
+
+    With ``repair`` the wrong or missing rows are replaced by the recount and
+    committed.  Runs without Jobs or hosts have all-zero counters and are
+    treated the same as runs without a row.
+    """
+    columns = ["scan_run_id", *STATS_COLUMNS]
+    connection = session.connection()
+    stored = {
+        row[0]: tuple(row)
+        for row in connection.exec_driver_sql(f"SELECT {', '.join(columns)} FROM scan_run_stats")
+    }
+    zeros = (0,) * len(STATS_COLUMNS)
+    wrong = []
+    for row in connection.exec_driver_sql(recount_sql()):
+        row = tuple(row)
+        if stored.pop(row[0], (row[0], *zeros)) != row:
+            wrong.append(row)
+    # Counters left over from runs that no longer exist
+    wrong_ids = [row[0] for row in wrong] + sorted(stored)
+    if repair and wrong_ids:
+        connection.exec_driver_sql(
+            f"DELETE FROM scan_run_stats WHERE scan_run_id IN ({', '.join('?' * len(wrong_ids))})", tuple(wrong_ids)
+        )
+        if wrong:
+            connection.exec_driver_sql(
+                f"INSERT INTO scan_run_stats ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", wrong
+            )
+        session.commit()
+    return sorted(wrong_ids)
+
+
+def count_batch_targets_for_scan_run(session: Session, scan_run_id: int) -> int:
+    """Return the number of Target memberships across a ScanRun's Batches."""
+    return (
+        session.query(func.count())
+        .select_from(batch_target_association)
+        .join(Batch, Batch.id == batch_target_association.c.batch_id)
+        .filter(Batch.scan_run_id == scan_run_id)
+        .scalar()
+    )
+
+
+def sum_job_durations(
+    session: Session, target_ids: Iterable[int]
+) -> List[Tuple[int, Optional[str], int, float]]:
+    """Return ``(target_id, nmap options, jobs, seconds)`` for the given targets.
+
+    Finished Jobs are grouped by target and options, the Job's own or,
+    failing that, its ScanRun's; ``seconds`` is their total duration.  The
+    aggregation runs in SQL so only one row per group is loaded.
+    """
+    target_ids = list(target_ids)
+    options = func.coalesce(Job.nmap_options, ScanRun.options)
+    seconds = func.max((func.julianday(Job.completed_at) - func.julianday(Job.started_at)) * 86400.0, 0.0)
+    rows: List[Tuple[int, Optional[str], int, float]] = []
+    # Keep each IN list well below SQLite's bound parameter limit
+    for i in range(0, len(target_ids), 500):
+        rows.extend(
+            session.query(Job.target_id, options, func.count(), func.sum(seconds))
+            .join(ScanRun, ScanRun.id == Job.scan_run_id)
+            .filter(
+                Job.target_id.in_(target_ids[i : i + 500]),
+                Job.started_at.isnot(None),
+                Job.completed_at.isnot(None),
+            )
+            .group_by(Job.target_id, options)
+            .all()
+        )
+    return rows
+
+
+def list_target_job_history(
+    session: Session, min_timeouts: Optional[int] = None, min_seconds: Optional[float] = None
+) -> List[Tuple[int, str, int, float]]:
+    """Return ``(target_id, address, timeouts, seconds)`` for finished Jobs.
+
+    ``timeouts`` is ``Job.timeouts``, which counts every timed-out attempt
+    even if a retry or bisect has since replaced the Job's ``reason``.
+    With ``min_timeouts`` or ``min_seconds``, only targets with at least that
+    many timed-out Jobs, or with a Job that took that long, are included;
+    the filter runs in SQL so targets with an unremarkable history are never
+    loaded.  Rows are ordered by target.
+    """
+    seconds = (func.julianday(Job.completed_at) - func.julianday(Job.started_at)) * 86400.0
+    finished = (Job.started_at.isnot(None), Job.completed_at.isnot(None))
+    conditions = []
+    if min_timeouts is not None:
+        conditions.append(func.sum(Job.timeouts) >= min_timeouts)
+    if min_seconds is not None:
+        conditions.append(func.max(seconds) >= min_seconds)
+    query = (
+        session.query(Job.target_id, Target.address, Job.timeouts, seconds)
+        .join(Target, Target.id == Job.target_id)
+        .filter(*finished)
+    )
+    if conditions:
+        candidates = session.query(Job.target_id).filter(*finished).group_by(Job.target_id)
+        query = query.filter(Job.target_id.in_(candidates.having(or_(*conditions)).scalar_subquery()))
+    rows = query.order_by(Job.target_id).all()
+    return [(target_id, address, timeouts, max(duration, 0.0)) for target_id, address, timeouts, duration in rows]
+
+
 def update_job(session: Session, job_id: int, **kwargs: Any) -> Optional[Job]:
     return _update(session, Job, job_id, **kwargs)
 
@@ -164,6 +642,11 @@ def get_result(session: Session, result_id: int) -> Optional[Result]:
     return _get(session, Result, result_id)
 
 
+def get_latest_result_for_job(session: Session, job_id: int) -> Optional[Result]:
+    """Return the most recent Result recorded for a Job, if any."""
+    return session.query(Result).filter(Result.job_id == job_id).order_by(Result.id.desc()).first()
+
+
 def list_results(session: Session) -> List[Result]:
     return _list(session, Result)
 
@@ -174,3 +657,170 @@ def update_result(session: Session, result_id: int, **kwargs: Any) -> Optional[R
 
 def delete_result(session: Session, result_id: int) -> bool:
     return _delete(session, Result, result_id)
+
+
+# DNS cache -----------------------------------------------------------------
+
+def get_dns_cache_entries(session: Session, hostnames: Iterable[str]) -> List[DnsCacheEntry]:
+    """Return cache entries for ``hostnames`` (expired ones included)."""
+    names = list(hostnames)
+    if not names:
+        return []
+    return session.query(DnsCacheEntry).filter(DnsCacheEntry.hostname.in_(names)).all()
+
+
+def upsert_dns_cache_entry(session: Session, hostname: str, **kwargs: Any) -> DnsCacheEntry:
+    """Create or refresh the cache entry for ``hostname`` without committing."""
+    entry = session.query(DnsCacheEntry).filter(DnsCacheEntry.hostname == hostname).first()
+    if entry is None:
+        entry = DnsCacheEntry(hostname=hostname, **kwargs)
+        session.add(entry)
+    else:
+        for key, value in kwargs.items():
+            setattr(entry, key, value)
+    return entry
+
+
+# Observations ---------------------------------------------------------------
+
+def add_observations(
+    session: Session, hosts: Sequence[Dict[str, Any]], ports: Sequence[Dict[str, Any]]
+) -> None:
+    """Insert host and port observation rows with one executemany each and commit."""
+    if hosts:
+        session.execute(insert(HostObservation.__table__), list(hosts))
+    if ports:
+        session.execute(insert(PortObservation.__table__), list(ports))
+    session.commit()
+
+
+def delete_observations_for_job(session: Session, job_id: int) -> None:
+    """Delete a Job's host and port observations; the caller commits."""
+    session.query(HostObservation).filter(HostObservation.job_id == job_id).delete(synchronize_session=False)
+    session.query(PortObservation).filter(PortObservation.job_id == job_id).delete(synchronize_session=False)
+
+
+def get_latest_observed_scan_run_id(session: Session) -> Optional[int]:
+    """Return the newest ScanRun that has host observations, if any."""
+    return session.query(func.max(HostObservation.scan_run_id)).scalar()
+
+
+def query_port_observations(
+    session: Session,
+    port: Optional[int] = None,
+    state: Optional[str] = None,
+    proto: Optional[str] = None,
+    scan_run_id: Optional[int] = None,
+    service: Optional[str] = None,
+    product: Optional[str] = None,
+    version: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[PortObservation]:
+    """Return port observations matching every given filter.
+
+    ``version`` matches as a prefix (``"7."`` finds every 7.x release)
+    through a range condition, so like the other filters it is answered from
+    ``ix_port_observations_product_version`` rather than a table scan.
+    Rows are ordered by run and then in the order they were observed.
+    """
+    query = session.query(PortObservation)
+    for column, value in (
+        (PortObservation.port, port),
+        (PortObservation.state, state),
+        (PortObservation.proto, proto),
+        (PortObservation.scan_run_id, scan_run_id),
+        (PortObservation.service, service),
+        (PortObservation.product, product),
+    ):
+        if value is not None:
+            query = query.filter(column == value)
+    if version:
+        query = query.filter(PortObservation.version >= version, PortObservation.version < version + "\uffff")
+    query = query.order_by(PortObservation.scan_run_id, PortObservation.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def iter_unobserved_results(session: Session, page_size: int = 1000) -> Iterator[Result]:
+    """Yield Results with a summary whose Job has no host observations yet."""
+    last = 0
+    while True:
+        page = (
+            session.query(Result)
+            .filter(
+                Result.id > last,
+                Result.summary_json.isnot(None),
+                ~session.query(HostObservation.id).filter(HostObservation.job_id == Result.job_id).exists(),
+            )
+            .order_by(Result.id)
+            .limit(page_size)
+            .all()
+        )
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1].id
+
+
+# Scan events ----------------------------------------------------------------
+
+def scan_event_key(message: Dict[str, Any]) -> str:
+    """What an update message is about; compaction keeps the latest per key."""
+    if message["type"] == "CHUNK_UPDATE":
+        return f"chunk:{message['payload']['chunk_id']}"
+    return message["type"]
+
+
+def add_scan_events(session: Session, scan_run_id: int, messages: Sequence[Dict[str, Any]]) -> None:
+    """Append update messages (``type``, ``payload`` and ``seq``) to a ScanRun's events.
+
+    Writes them with one executemany and commits.
+    """
+    rows = [
+        {
+            "scan_run_id": scan_run_id,
+            "seq": message["seq"],
+            "key": scan_event_key(message),
+            "type": message["type"],
+            "payload_json": json.dumps(message["payload"]),
+        }
+        for message in messages
+    ]
+    if rows:
+        session.execute(insert(ScanEvent.__table__), rows)
+    session.commit()
+
+
+def list_scan_events(
+    session: Session, scan_run_id: int, since: int = 0, limit: Optional[int] = None
+) -> List[ScanEvent]:
+    """Return a ScanRun's events with ``seq`` above ``since``, oldest first."""
+    query = (
+        session.query(ScanEvent)
+        .filter(ScanEvent.scan_run_id == scan_run_id, ScanEvent.seq > since)
+        .order_by(ScanEvent.seq)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def get_last_scan_event_seq(session: Session, scan_run_id: int) -> int:
+    """Return the highest event ``seq`` of a ScanRun, 0 if it has none."""
+    return session.query(func.max(ScanEvent.seq)).filter(ScanEvent.scan_run_id == scan_run_id).scalar() or 0
+
+
+def compact_scan_events(session: Session, scan_run_id: int) -> int:
+    """Delete every event of a ScanRun superseded by a later one with its key.
+
+    Commits and returns the number of events deleted.
+    """
+    cursor = session.connection().exec_driver_sql(
+        "DELETE FROM scan_events WHERE scan_run_id = ? AND seq < ("
+        "SELECT max(seq) FROM scan_events AS later "
+        "WHERE later.scan_run_id = scan_events.scan_run_id AND later.key = scan_events.key)",
+        (scan_run_id,),
+    )
+    session.commit()
+    return cursor.rowcount
@@ -8,6 +8,7 @@ from typing import Optional
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session, Session
 
+from .migrations import migrate
 from .models import Base
 
 DEFAULT_DB_PATH = os.path.join(".netscan_orchestrator", "state.db")
@@ -17,7 +18,7 @@ _SessionFactory = None  # type: ignore
 
 
 def init_engine(db_path: Optional[str] = None):
-    """Initialise the SQLAlchemy engine and create tables if required."""
+    """Initialise the SQLAlchemy engine, create tables and apply migrations."""
     global _engine, _SessionFactory
     if _engine is not None:
         return _engine
@@ -28,8 +29,9 @@ def init_engine(db_path: Optional[str] = None):
     _engine = create_engine(url, connect_args={"check_same_thread": False})
     _SessionFactory = scoped_session(sessionmaker(bind=_engine))
 
-    # Create tables on first use
+    # Create tables on first use, then bring older databases up to date
     Base.metadata.create_all(_engine)
+    migrate(_engine)
     return _engine
 
 
@@ -39,3 +41,15 @@ def get_session(db_path: Optional[str] = None) -> Session:
         init_engine(db_path)
     assert _SessionFactory is not None  # for type checkers
     return _SessionFactory()
+
+
+def new_session() -> Session:
+    """Return a session of its own rather than the thread's shared one.
+
+    For short units of work that run beside a scan, which may be using the
+    thread's session from :func:`get_session`; closing that would detach
+    the scan's objects.
+    """
+    if _engine is None:
+        init_engine()
+    return Session(_engine)
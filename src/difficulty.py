@@ -0,0 +1,89 @@
+"""Per-target difficulty across scan runs.
+
+Some targets are slow every time: a filtered host behind a rate limiting
+firewall times out night after night and holds a concurrency slot for the
+whole timeout.  Difficulty is derived from the Job history of each target,
+across every scan run:
+
+* ``timeouts``: the number of timed-out Job attempts (``Job.timeouts``),
+  including those of Jobs that were later retried or bisected;
+* ``p50``, ``p90`` and ``max_seconds``: percentiles of the durations of all
+  finished Jobs, timed out ones included (their duration is a lower bound).
+
+A target is *difficult* once it has timed out ``min_timeouts`` times or its
+90th percentile duration reaches ``min_p90`` seconds; either criterion can
+be switched off with ``None``.  ``netscan run`` and
+the API route the Jobs of difficult targets to the runner's slow lane (see
+:class:`runner.SlowLane`), and ``GET /api/targets/difficult`` lists them.
+"""
+
+from itertools import groupby
+from typing import List, NamedTuple, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from db import repository as db_repo
+
+DEFAULT_MIN_TIMEOUTS = 2
+
+
+class TargetDifficulty(NamedTuple):
+    target_id: int
+    address: str
+    jobs: int
+    timeouts: int
+    p50: float
+    p90: float
+    max_seconds: float
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile ``q`` (0-100) of ``values``; 0.0 when empty."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def difficult_targets(
+    session: Session,
+    min_timeouts: Optional[int] = DEFAULT_MIN_TIMEOUTS,
+    min_p90: Optional[float] = None,
+) -> List[TargetDifficulty]:
+    """Return the difficult targets, most timeouts first.
+
+    With neither criterion every target with a finished Job is returned.
+    """
+
+    history = db_repo.list_target_job_history(session, min_timeouts, min_p90)
+    found = []
+    for (target_id, address), rows in groupby(history, key=lambda row: (row[0], row[1])):
+        rows = list(rows)
+        durations = [seconds for _, _, _, seconds in rows]
+        entry = TargetDifficulty(
+            target_id=target_id,
+            address=address,
+            jobs=len(rows),
+            timeouts=sum(timeouts for _, _, timeouts, _ in rows),
+            p50=percentile(durations, 50),
+            p90=percentile(durations, 90),
+            max_seconds=max(durations),
+        )
+        if min_timeouts is None and min_p90 is None:
+            found.append(entry)
+        elif (min_timeouts is not None and entry.timeouts >= min_timeouts) or (
+            min_p90 is not None and entry.p90 >= min_p90
+        ):
+            found.append(entry)
+    found.sort(key=lambda d: (-d.timeouts, -d.p90, d.target_id))
+    return found
+
+
+__all__ = [
+    "DEFAULT_MIN_TIMEOUTS",
+    "TargetDifficulty",
+    "percentile",
+    "difficult_targets",
+]
@@ -0,0 +1,332 @@
+"""Plan and execute scan runs submitted through the Web API.
+
+``POST /api/scans`` stores each request as a ScanRun in the PLANNED state.
+By default the API process then runs :func:`run_submitted_scan` on its own
+event loop.  With ``NETSCAN_DISPATCHER`` set the API only queues the run, and
+``netscan dispatcher`` (:class:`Dispatcher`) claims it, plans and executes it
+and appends every update message to the run's ``scan_events``.  API workers
+follow those events to serve WebSocket and SSE clients, so any number of API
+processes and dispatchers share nothing but the state database.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from db import repository as db_repo
+from db.models import JobStatus, TargetKind
+from difficulty import difficult_targets
+from ip_handler import TargetRanges, is_range_spec, iter_chunks, iter_range_specs, plan_targets
+from resolver import resolve_targets
+from runner import SlowLane, run_jobs_concurrently
+
+logger = logging.getLogger(__name__)
+
+# Most addresses a submitted request may cover, so that e.g. 0.0.0.0/0 or
+# an IPv6 /64 is refused instead of planned
+MAX_TARGETS = int(os.environ.get("NETSCAN_MAX_TARGETS", 2**20))
+# Targets written per planning step; each step is committed so status reads
+# can report progress while a large request is being planned
+PLAN_CHUNK_SIZE = 4096
+# Timeout of each nmap job of a submitted run; the slow lane gets three times as long
+DEFAULT_TIMEOUT_SEC = 600
+# Update messages written to scan_events at a time
+SAVE_EVERY = 256
+# Seconds between the dispatcher's writes of the messages still waiting
+FLUSH_INTERVAL = 0.2
+
+Execute = Callable[[int, range, Any], Awaitable[None]]
+
+
+def owner_id() -> str:
+    """Identify this process in ``ScanRun.claimed_by``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, but someone else's
+        pass
+    return True
+
+
+def check_target_count(targets: TargetRanges) -> None:
+    """Raise ``ValueError`` if ``targets`` cover more than ``MAX_TARGETS`` addresses."""
+    if targets.size > MAX_TARGETS:
+        raise ValueError(f"targets cover {targets.size} addresses, more than the limit of {MAX_TARGETS}")
+
+
+def plan_scan_run(session: Session, scan_run_id: int) -> range:
+    """Expand a ScanRun's stored request and write its targets and jobs.
+
+    All targets go into one batch, ``PLAN_CHUNK_SIZE`` at a time, and the
+    jobs are then materialized with a single statement.  Returns the range
+    of job ids.
+    """
+    scan_run = db_repo.get_scan_run(session, scan_run_id)
+    request = json.loads(scan_run.request_json)
+    range_targets = request.get("range_targets", False)
+    targets = plan_targets(request["targets"], exclude=request.get("exclude") or [], hosts_only=not range_targets)
+    check_target_count(targets)
+    if range_targets:
+        specs = list(iter_range_specs(targets))
+        scan_run.target_count = len(specs)
+    else:
+        specs = targets
+        scan_run.target_count = targets.size
+    batch = db_repo.create_batches(
+        session, [dict(scan_run_id=scan_run_id, name=f"run{scan_run_id}_batch1", strategy="initial")], [[]]
+    )[0]
+    for chunk in iter_chunks(specs, PLAN_CHUNK_SIZE):
+        db_repo.add_batch_targets(
+            session,
+            batch.id,
+            ((spec, TargetKind.RANGE if is_range_spec(spec) else TargetKind.HOST) for spec in chunk),
+        )
+        session.commit()
+    job_ids = db_repo.materialize_jobs(
+        session, scan_run_id, batch.id, status=JobStatus.PENDING, nmap_options=scan_run.options
+    )
+    scan_run.status = JobStatus.PENDING
+    session.commit()
+    return job_ids
+
+
+async def execute_scan_run(
+    session: Session,
+    scan_run_id: int,
+    job_ids: range,
+    update_queue: Any,
+    concurrency: Optional[int] = None,
+    timeout_sec: int = DEFAULT_TIMEOUT_SEC,
+) -> None:
+    """Resolve a planned run's hostnames and run its jobs.
+
+    Targets that keep timing out get their own small pool.  ``concurrency``
+    defaults to the number of CPUs.
+    """
+    await resolve_targets(session, db_repo.iter_hostname_targets_for_scan_run(session, scan_run_id))
+    quarantined = {d.target_id for d in difficult_targets(session)}
+    slow_job_ids = db_repo.list_job_ids_for_targets(session, scan_run_id, quarantined)
+    await run_jobs_concurrently(
+        scan_run_id=scan_run_id,
+        job_ids=job_ids,
+        db_session=session,
+        concurrency=concurrency or os.cpu_count() or 4,
+        timeout_sec=timeout_sec,
+        update_queue=update_queue,
+        slow_lane=SlowLane(timeout_sec=timeout_sec * 3),
+        slow_job_ids=slow_job_ids,
+    )
+
+
+async def fail_scan_run(session: Session, scan_run_id: int, notes: str, update_queue: Any) -> None:
+    """Mark a ScanRun failed and send SCAN_COMPLETE to its clients."""
+    db_repo.update_scan_run(
+        session, scan_run_id, status=JobStatus.FAILED, completed_at=datetime.utcnow(), notes=notes
+    )
+    payload = {"scan_id": str(scan_run_id), "status": "FAILED", "final_results_url": f"/api/scans/{scan_run_id}"}
+    await update_queue.put({"type": "SCAN_COMPLETE", "payload": payload})
+    await update_queue.put(None)
+
+
+async def run_submitted_scan(
+    scan_run_id: int, update_queue: Any, session_factory: Callable[[], Session], execute: Execute
+) -> None:
+    """Plan a submitted ScanRun off the event loop, then ``execute`` its jobs.
+
+    Planning runs in a worker thread with a session of its own.  If it
+    fails, the run is marked failed and its clients are told so.
+    """
+
+    def plan() -> range:
+        session = session_factory()
+        try:
+            return plan_scan_run(session, scan_run_id)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    try:
+        job_ids = await asyncio.to_thread(plan)
+    except Exception as e:
+        session = session_factory()
+        try:
+            await fail_scan_run(session, scan_run_id, f"Planning failed: {e}", update_queue)
+        finally:
+            session.close()
+        return
+    await execute(scan_run_id, job_ids, update_queue)
+
+
+class EventLog:
+    """The update queue of a run executed by the dispatcher.
+
+    Numbers each message with a ``seq`` as the API's ScanChannel does and
+    appends it to the run's ``scan_events``, where API workers read it.
+    Messages are written ``SAVE_EVERY`` at a time and whenever :meth:`flush`
+    is called.  ``None`` writes what is left and compacts the run's events.
+    """
+
+    def __init__(self, scan_run_id: int, session_factory: Callable[[], Session]):
+        self.scan_run_id = scan_run_id
+        self.session_factory = session_factory
+        self.closed = False
+        self._unsaved: List[Dict[str, Any]] = []
+        with session_factory() as session:
+            self.seq = db_repo.get_last_scan_event_seq(session, scan_run_id)
+
+    def put_nowait(self, message: Optional[Dict[str, Any]]) -> None:
+        if self.closed:
+            return
+        if message is None:
+            self.closed = True
+            self.flush()
+            with self.session_factory() as session:
+                db_repo.compact_scan_events(session, self.scan_run_id)
+            return
+        self.seq += 1
+        self._unsaved.append(dict(message, seq=self.seq))
+        if len(self._unsaved) >= SAVE_EVERY:
+            self.flush()
+
+    async def put(self, message: Optional[Dict[str, Any]]) -> None:
+        self.put_nowait(message)
+
+    def flush(self) -> None:
+        """Write the messages not yet in ``scan_events``."""
+        if self._unsaved:
+            with self.session_factory() as session:
+                db_repo.add_scan_events(session, self.scan_run_id, self._unsaved)
+        self._unsaved = []
+
+
+class Dispatcher:
+    """Claims queued ScanRuns and executes up to ``max_scans`` of them at a time.
+
+    Runs are claimed with a conditional UPDATE of ``ScanRun.claimed_by``, so
+    several dispatchers can serve the same database.  Each run gets its own
+    sessions on ``engine``.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_scans: int = 2,
+        concurrency: Optional[int] = None,
+        timeout_sec: int = DEFAULT_TIMEOUT_SEC,
+        poll_interval: float = 1.0,
+    ):
+        self.engine = engine
+        self.max_scans = max_scans
+        self.concurrency = concurrency
+        self.timeout_sec = timeout_sec
+        self.poll_interval = poll_interval
+        self.owner = owner_id()
+        self.running: Dict[int, EventLog] = {}
+        self._stopping = False
+
+    def _session(self) -> Session:
+        return Session(self.engine)
+
+    def stop(self) -> None:
+        """Claim no more runs; :meth:`serve` returns once the running ones finish."""
+        self._stopping = True
+
+    async def serve(self, once: bool = False) -> None:
+        """Execute queued runs until :meth:`stop` is called.
+
+        With ``once`` it returns as soon as nothing is running or queued.
+        """
+        await self.recover()
+        loop = asyncio.get_running_loop()
+        next_poll = 0.0
+        while True:
+            if not self._stopping and (loop.time() >= next_poll or (once and not self.running)):
+                self.claim()
+                next_poll = loop.time() + self.poll_interval
+            for log in self.running.values():
+                log.flush()
+            if not self.running and (once or self._stopping):
+                return
+            await asyncio.sleep(FLUSH_INTERVAL)
+
+    def claim(self) -> List[int]:
+        """Claim queued runs while below ``max_scans`` and start executing them."""
+        free = self.max_scans - len(self.running)
+        if free <= 0:
+            return []
+        with self._session() as session:
+            claimed = [
+                run_id
+                for run_id in db_repo.list_queued_scan_run_ids(session, free)
+                if db_repo.claim_scan_run(session, run_id, self.owner)
+            ]
+        for run_id in claimed:
+            logger.info(f"Starting scan run {run_id}")
+            log = EventLog(run_id, self._session)
+            self.running[run_id] = log
+            asyncio.ensure_future(self._run(run_id, log))
+        return claimed
+
+    async def _run(self, scan_run_id: int, log: EventLog) -> None:
+        try:
+            await run_submitted_scan(scan_run_id, log, self._session, self._execute)
+        except Exception as e:
+            logger.exception(f"Scan run {scan_run_id} failed")
+            with self._session() as session:
+                await fail_scan_run(session, scan_run_id, f"Execution failed: {e}", log)
+        finally:
+            log.flush()
+            del self.running[scan_run_id]
+            logger.info(f"Scan run {scan_run_id} finished")
+
+    async def _execute(self, scan_run_id: int, job_ids: range, log: EventLog) -> None:
+        with self._session() as session:
+            await execute_scan_run(session, scan_run_id, job_ids, log, self.concurrency, self.timeout_sec)
+
+    async def recover(self) -> List[int]:
+        """Fail the unfinished runs of processes on this host that have exited.
+
+        Such runs were claimed by a dispatcher (or an API process executing
+        scans itself) that was killed; their clients get a SCAN_COMPLETE.
+        Returns the ids of the runs failed.
+        """
+        host = socket.gethostname()
+        failed = []
+        with self._session() as session:
+            for scan_run in db_repo.list_unfinished_claimed_scan_runs(session):
+                owner_host, _, pid = scan_run.claimed_by.rpartition(":")
+                if owner_host != host or not pid.isdigit() or _alive(int(pid)):
+                    continue
+                logger.warning(f"Scan run {scan_run.id} was abandoned by {scan_run.claimed_by}")
+                notes = f"Abandoned: {scan_run.claimed_by} exited before the run finished"
+                await fail_scan_run(session, scan_run.id, notes, EventLog(scan_run.id, self._session))
+                failed.append(scan_run.id)
+        return failed
+
+
+__all__ = [
+    "Dispatcher",
+    "EventLog",
+    "check_target_count",
+    "execute_scan_run",
+    "fail_scan_run",
+    "owner_id",
+    "plan_scan_run",
+    "run_submitted_scan",
+]
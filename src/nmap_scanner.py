@@ -1,12 +1,24 @@
-import nmap
 import logging
+import shlex
+import subprocess
+import xml.etree.ElementTree as ET
 from typing import List, Dict, Any # Added typing
 
+import nmap_xml
+
+NMAP_NOT_FOUND_DETAILS = "Nmap command not found. Please ensure Nmap is installed and in your system's PATH."
+
+
 def run_nmap_scan(targets: List[str], options: str = "-T4 -F") -> Dict[str, Any]: # Ensure typing
     """
     Runs an Nmap scan on the given targets with the specified options.
     Includes input_targets in the returned dictionary.
 
+    Nmap is executed directly with ``-oX -`` and its XML output is parsed with
+    :mod:`nmap_xml`.  The returned dictionary keeps the layout produced by
+    python-nmap (``nmap``/``scan``/``stats`` keys) so that
+    :mod:`results_handler` can consume it unchanged.
+
     Args:
         targets: A list of IP addresses or network ranges.
         options: Nmap command-line options.
@@ -22,98 +34,73 @@ def run_nmap_scan(targets: List[str], options: str = "-T4 -F") -> Dict[str, Any]
     # Build the command string up-front so it is available even if execution fails
     command = f"nmap -oX - {options} {target_string}"
     result_dict["command"] = command
+    argv = ["nmap", "-oX", "-", *shlex.split(options), *targets]
 
     try:
-        nm = nmap.PortScanner()
-    except nmap.PortScannerError as e:
-        error_msg = f"Nmap initialization failed for targets '{target_string}': {str(e)}"
-        logging.error(error_msg)
+        logging.debug(f"Attempting to run Nmap command: {command}")
+        proc = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except FileNotFoundError as e:
+        logging.error(f"Nmap initialization failed for targets '{target_string}': {str(e)}")
         result_dict["error"] = "Nmap execution failed."
-        if "nmap program was not found" in str(e).lower():
-            result_dict["details"] = "Nmap command not found. Please ensure Nmap is installed and in your system's PATH."
-        else:
-            result_dict["details"] = str(e)
+        result_dict["details"] = NMAP_NOT_FOUND_DETAILS
+        return result_dict
+    except Exception as e:
+        # Catch any other unexpected errors while launching the scan.
+        error_msg = f"An unexpected error occurred during Nmap scan for targets '{target_string}': {str(e)}"
+        logging.error(error_msg)
+        result_dict["error"] = "Unexpected error during scan."
+        result_dict["details"] = str(e)
         return result_dict
 
-    try:
-        # Construct the command string for logging, mimicking python-nmap's behavior.
-        # python-nmap adds '-oX -' to parse the output.
-        logging.debug(f"Attempting to run Nmap command: {command}")
-
-        # The scan method of python-nmap executes nmap and parses XML output.
-        scan_output = nm.scan(hosts=target_string, arguments=options)
-        executed_cmd = nm.command_line()
-        result_dict["command_line"] = executed_cmd
-        logging.debug(f"Nmap command finished successfully. Full command executed: '{executed_cmd}'")
-
-        try:
-            result_dict["nmap_output"] = nm.get_nmap_last_output()
-        except Exception:
-            pass
-
-        # Merge the raw scan_output into our result_dict.
-        # scan_output structure is typically {'nmap': {...}, 'scan': {host1:..., host2:...}}
-        result_dict.update(scan_output)
-
-        # Post-scan checks, modifying result_dict directly.
-        # nm.all_hosts() gives a list of hosts that were scanned and had data.
-        # result_dict.get('scan') is the dictionary of results per host.
-        if not result_dict.get('scan'):
-            # This means no hosts were found in the 'scan' part of the output.
-            # Could be all down, or other Nmap issues not raising PortScannerError.
-            current_scan_stats = nm.scanstats() # Get stats from the PortScanner object
-            result_dict["stats"] = current_scan_stats # Always include stats if available
-
-            if current_scan_stats.get('uphosts', '0') == '0' and \
-               current_scan_stats.get('totalhosts', '0') != '0': # Check if scan ran and all were down
-                result_dict["status"] = "completed"
-                result_dict["message"] = f"All {current_scan_stats.get('totalhosts','')} specified target(s) are down or did not respond."
-                # result_dict["hosts_scanned"] = nm.all_hosts() # This would be empty
-            else:
-                # If 'scan' is empty but not because all hosts are down (e.g. bad options, other nmap issue)
-                # and no specific error message has been set yet by an exception.
-                if "error" not in result_dict:
-                    result_dict["error"] = "Scan completed but produced no host data."
-                    result_dict["details"] = (
-                        "Targets might be invalid, filtered, Nmap options prevented data collection, "
-                        "or Nmap encountered an issue not raised as a PortScannerError. "
-                        f"Nmap command line: {nm.command_line()}"
-                    )
+    xml_output = proc.stdout.decode(errors="ignore")
+    stderr = proc.stderr.decode(errors="ignore").strip()
+    result_dict["nmap_output"] = xml_output
 
-    except nmap.PortScannerError as e:
-        # This exception is raised if Nmap encounters an error during execution
-        error_msg = f"Nmap scan error for targets '{target_string}': {str(e)}"
-        logging.error(error_msg)
+    try:
+        parsed = nmap_xml.parse(xml_output)
+    except ET.ParseError:
+        # Nmap did not produce a usable XML document; treat it as an execution error.
+        error_text = stderr or xml_output
+        logging.error(f"Nmap scan error for targets '{target_string}': {error_text}")
         result_dict["error"] = "Nmap execution failed."
-        if "nmap program was not found" in str(e).lower():
-            result_dict["details"] = "Nmap command not found. Please ensure Nmap is installed and in your system's PATH."
-        elif "Error compiling our pcap filter" in str(e):
+        if "Error compiling our pcap filter" in error_text:
             result_dict["details"] = (
-                f"Nmap pcap filter compilation error: {str(e)}. "
+                f"Nmap pcap filter compilation error: {error_text}. "
                 "This may be due to Nmap lacking necessary permissions (e.g., root or CAP_NET_RAW) "
                 "for the chosen scan type, or a conflict with other packet filtering software. "
                 "Try using a TCP Connect Scan (-sT) or ensure Nmap has appropriate privileges."
             )
         else:
-            result_dict["details"] = str(e)
-        if nm.scanstats():
-            result_dict["stats"] = nm.scanstats()
-        try:
-            result_dict["nmap_output"] = nm.get_nmap_last_output()
-        except Exception:
-            pass
+            result_dict["details"] = error_text
+        return result_dict
 
-    except Exception as e:
-        # Catch any other unexpected errors during the scan process.
-        error_msg = f"An unexpected error occurred during Nmap scan for targets '{target_string}': {str(e)}"
-        logging.error(error_msg)
-        result_dict["error"] = "Unexpected error during scan."
-        result_dict["details"] = str(e)
-        if nm.scanstats(): # Try to get stats
-            result_dict["stats"] = nm.scanstats()
-        try:
-            result_dict["nmap_output"] = nm.get_nmap_last_output()
-        except Exception:
-            pass
+    scan_output = parsed.to_python_nmap()
+    if stderr:
+        scan_output["nmap"]["scaninfo"]["error" if proc.returncode else "warning"] = stderr
+    result_dict["command_line"] = parsed.args
+    logging.debug(f"Nmap command finished. Full command executed: '{parsed.args}'")
+
+    # Merge the parsed output into our result_dict.
+    # scan_output structure is {'nmap': {...}, 'scan': {host1:..., host2:...}}
+    result_dict.update(scan_output)
+    result_dict["stats"] = parsed.scanstats()
+
+    # Post-scan checks, modifying result_dict directly.
+    if not result_dict.get('scan'):
+        # This means no hosts were found in the 'scan' part of the output.
+        # Could be all down, or other Nmap issues.
+        current_scan_stats = result_dict["stats"]
+        if current_scan_stats.get('uphosts', '0') == '0' and \
+           current_scan_stats.get('totalhosts', '0') != '0': # Check if scan ran and all were down
+            result_dict["status"] = "completed"
+            result_dict["message"] = f"All {current_scan_stats.get('totalhosts','')} specified target(s) are down or did not respond."
+        else:
+            # If 'scan' is empty but not because all hosts are down (e.g. bad options, other nmap issue).
+            result_dict["error"] = "Scan completed but produced no host data."
+            result_dict["details"] = (
+                "Targets might be invalid, filtered, Nmap options prevented data collection, "
+                "or Nmap encountered an issue while scanning. "
+                f"Nmap command line: {parsed.args}"
+            )
 
     return result_dict
@@ -0,0 +1,596 @@
+"""Fast, full-fidelity parser for Nmap XML output.
+
+This module is the single parser shared by :mod:`runner` and
+:mod:`nmap_scanner`.  It keeps everything Nmap reports about a host (all
+addresses, hostnames, every protocol's ports, service and CPE details, NSE
+port and host script output, OS matches and uptime) as well as the scan level
+``<scaninfo>`` and ``<runstats>`` blocks.
+
+Parsed data is held in a compact model: the leaf records are
+:class:`~typing.NamedTuple` instances and :class:`Host`/:class:`ScanResult`
+use ``__slots__``.  Two entry points are provided:
+
+* :func:`parse` parses a complete document into a :class:`ScanResult`.
+* :func:`iter_hosts` streams :class:`Host` objects as soon as their
+  ``</host>`` tag is seen.  Each host element is discarded once converted, so
+  memory stays flat regardless of the size of the document.
+
+:func:`parse_partial` is the tolerant variant of :func:`parse` for the output
+of an Nmap process that was killed part way through: it keeps every complete
+host instead of raising.
+
+Both accept a ``str``, ``bytes``, a binary or text file object, or an iterable
+of ``str``/``bytes`` chunks.  :meth:`Host.to_dict` and
+:meth:`ScanResult.to_python_nmap` produce the dictionary layout used by
+python-nmap so that existing consumers keep working unchanged.
+"""
+
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+XMLSource = Union[str, bytes, Iterable[Union[str, bytes]], Any]
+
+#: Size of the blocks read from file objects when streaming.
+READ_CHUNK_SIZE = 64 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Result model
+# ---------------------------------------------------------------------------
+
+class Address(NamedTuple):
+    addr: str
+    addrtype: str
+    vendor: Optional[str] = None
+
+
+class Hostname(NamedTuple):
+    name: str
+    type: str
+
+
+class Script(NamedTuple):
+    id: str
+    output: str
+
+
+class Service(NamedTuple):
+    name: str
+    product: str = ""
+    version: str = ""
+    extrainfo: str = ""
+    ostype: str = ""
+    method: str = ""
+    conf: str = ""
+    tunnel: str = ""
+    cpe: Tuple[str, ...] = ()
+
+
+class Port(NamedTuple):
+    protocol: str
+    portid: int
+    state: str
+    reason: str = ""
+    reason_ttl: str = ""
+    service: Optional[Service] = None
+    scripts: Tuple[Script, ...] = ()
+
+
+class ExtraPorts(NamedTuple):
+    state: str
+    count: int
+
+
+class OsClass(NamedTuple):
+    type: str
+    vendor: str
+    osfamily: str
+    osgen: str
+    accuracy: str
+    cpe: Tuple[str, ...] = ()
+
+
+class OsMatch(NamedTuple):
+    name: str
+    accuracy: str
+    line: str
+    classes: Tuple[OsClass, ...] = ()
+
+
+class PortUsed(NamedTuple):
+    state: str
+    proto: str
+    portid: str
+
+
+class ScanInfo(NamedTuple):
+    type: str
+    protocol: str
+    numservices: str
+    services: str
+
+
+class RunStats(NamedTuple):
+    finished_time: str
+    timestr: str
+    elapsed: str
+    summary: str
+    exit: str
+    hosts_up: int
+    hosts_down: int
+    hosts_total: int
+
+
+class Host:
+    """All information Nmap reported for a single host."""
+
+    __slots__ = (
+        "addresses",
+        "hostnames",
+        "state",
+        "reason",
+        "ports",
+        "extraports",
+        "host_scripts",
+        "os_matches",
+        "ports_used",
+        "fingerprint",
+        "uptime",
+        "starttime",
+        "endtime",
+    )
+
+    def __init__(self) -> None:
+        self.addresses: Tuple[Address, ...] = ()
+        self.hostnames: Tuple[Hostname, ...] = ()
+        self.state = "unknown"
+        self.reason = "N/A"
+        self.ports: Tuple[Port, ...] = ()
+        self.extraports: Tuple[ExtraPorts, ...] = ()
+        self.host_scripts: Tuple[Script, ...] = ()
+        self.os_matches: Tuple[OsMatch, ...] = ()
+        self.ports_used: Tuple[PortUsed, ...] = ()
+        self.fingerprint: Optional[str] = None
+        self.uptime: Optional[Tuple[str, str]] = None
+        self.starttime: Optional[str] = None
+        self.endtime: Optional[str] = None
+
+    @property
+    def address(self) -> Optional[str]:
+        """Primary address: the first IPv4, else IPv6, else any address."""
+
+        fallback = None
+        for addr in self.addresses:
+            if addr.addrtype == "ipv4":
+                return addr.addr
+            if addr.addrtype == "ipv6" and fallback is None:
+                fallback = addr.addr
+        if fallback is None and self.addresses:
+            fallback = self.addresses[0].addr
+        return fallback
+
+    def open_ports(self, protocol: Optional[str] = None) -> List[Port]:
+        """Return ports in the ``open`` state, optionally for one protocol."""
+
+        return [
+            p
+            for p in self.ports
+            if p.state == "open" and (protocol is None or p.protocol == protocol)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the host in python-nmap's ``scan[host]`` dictionary layout."""
+
+        host: Dict[str, Any] = {
+            "hostnames": [{"name": h.name, "type": h.type} for h in self.hostnames]
+            or [{"name": "", "type": ""}],
+            "addresses": {a.addrtype: a.addr for a in self.addresses},
+            "vendor": {a.addr: a.vendor for a in self.addresses if a.vendor},
+            "status": {"state": self.state, "reason": self.reason},
+        }
+        if self.uptime is not None:
+            host["uptime"] = {"seconds": self.uptime[0], "lastboot": self.uptime[1]}
+
+        for port in self.ports:
+            svc = port.service or _EMPTY_SERVICE
+            entry: Dict[str, Any] = {
+                "state": port.state,
+                "reason": port.reason,
+                "name": svc.name,
+                "product": svc.product,
+                "version": svc.version,
+                "extrainfo": svc.extrainfo,
+                "conf": svc.conf,
+                "cpe": svc.cpe[-1] if svc.cpe else "",
+            }
+            if port.scripts:
+                entry["script"] = {s.id: s.output for s in port.scripts}
+            host.setdefault(port.protocol, {})[port.portid] = entry
+
+        if self.host_scripts:
+            host["hostscript"] = [{"id": s.id, "output": s.output} for s in self.host_scripts]
+        if self.ports_used:
+            host["portused"] = [p._asdict() for p in self.ports_used]
+        if self.os_matches:
+            host["osmatch"] = [
+                {
+                    "name": m.name,
+                    "accuracy": m.accuracy,
+                    "line": m.line,
+                    "osclass": [
+                        {
+                            "type": c.type,
+                            "vendor": c.vendor,
+                            "osfamily": c.osfamily,
+                            "osgen": c.osgen,
+                            "accuracy": c.accuracy,
+                            "cpe": list(c.cpe),
+                        }
+                        for c in m.classes
+                    ],
+                }
+                for m in self.os_matches
+            ]
+        if self.fingerprint is not None:
+            host["fingerprint"] = self.fingerprint
+        return host
+
+    def __repr__(self) -> str:  # pragma: no cover - simple repr
+        return f"<Host address={self.address} state={self.state} ports={len(self.ports)}>"
+
+
+class ScanResult:
+    """A fully parsed Nmap XML document."""
+
+    __slots__ = ("args", "scanner", "version", "start", "scaninfo", "hosts", "runstats", "truncated")
+
+    def __init__(self) -> None:
+        self.args = ""
+        self.scanner = ""
+        self.version = ""
+        self.start = ""
+        self.scaninfo: List[ScanInfo] = []
+        self.hosts: List[Host] = []
+        self.runstats: Optional[RunStats] = None
+        # Set by parse_partial when the document ended early or was malformed
+        self.truncated = False
+
+    def to_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return ``{address: host_dict}`` for every host in the document."""
+
+        return {h.address: h.to_dict() for h in self.hosts if h.address}
+
+    def scanstats(self) -> Dict[str, str]:
+        """Return run statistics in python-nmap's ``scanstats()`` layout."""
+
+        rs = self.runstats
+        if rs is None:
+            return {}
+        return {
+            "timestr": rs.timestr,
+            "elapsed": rs.elapsed,
+            "uphosts": str(rs.hosts_up),
+            "downhosts": str(rs.hosts_down),
+            "totalhosts": str(rs.hosts_total),
+        }
+
+    def to_python_nmap(self) -> Dict[str, Any]:
+        """Return the document in python-nmap's ``PortScanner.scan()`` layout."""
+
+        scaninfo: Dict[str, Any] = {
+            si.protocol: {"method": si.type, "services": si.services}
+            for si in self.scaninfo
+        }
+        return {
+            "nmap": {
+                "command_line": self.args,
+                "scaninfo": scaninfo,
+                "scanstats": self.scanstats(),
+            },
+            "scan": self.to_summary(),
+        }
+
+
+_EMPTY_SERVICE = Service(name="")
+
+
+# ---------------------------------------------------------------------------
+# Element converters
+# ---------------------------------------------------------------------------
+
+# The converters below walk each element's children once instead of using
+# find()/iterfind(): ElementPath lookups dominate the cost of large documents.
+
+def _cpes(elem: ET.Element) -> Tuple[str, ...]:
+    return tuple(c.text or "" for c in elem if c.tag == "cpe")
+
+
+def _scripts(elem: ET.Element) -> Tuple[Script, ...]:
+    return tuple(Script(s.get("id", ""), s.get("output", "")) for s in elem if s.tag == "script")
+
+
+def _port(elem: ET.Element) -> Port:
+    state = reason = reason_ttl = ""
+    service = None
+    scripts: List[Script] = []
+    for child in elem:
+        tag = child.tag
+        get = child.get
+        if tag == "state":
+            state, reason, reason_ttl = get("state", ""), get("reason", ""), get("reason_ttl", "")
+        elif tag == "service":
+            service = Service(
+                get("name", ""),
+                get("product", ""),
+                get("version", ""),
+                get("extrainfo", ""),
+                get("ostype", ""),
+                get("method", ""),
+                get("conf", ""),
+                get("tunnel", ""),
+                _cpes(child) if len(child) else (),
+            )
+        elif tag == "script":
+            scripts.append(Script(get("id", ""), get("output", "")))
+
+    return Port(
+        elem.get("protocol", ""),
+        int(elem.get("portid", "0")),
+        state,
+        reason,
+        reason_ttl,
+        service,
+        tuple(scripts),
+    )
+
+
+def _os(host: Host, elem: ET.Element) -> None:
+    ports_used: List[PortUsed] = []
+    matches: List[OsMatch] = []
+    for child in elem:
+        tag = child.tag
+        if tag == "portused":
+            ports_used.append(
+                PortUsed(child.get("state", ""), child.get("proto", ""), child.get("portid", ""))
+            )
+        elif tag == "osmatch":
+            classes = tuple(
+                OsClass(
+                    c.get("type", ""),
+                    c.get("vendor", ""),
+                    c.get("osfamily", ""),
+                    c.get("osgen", ""),
+                    c.get("accuracy", ""),
+                    _cpes(c),
+                )
+                for c in child
+                if c.tag == "osclass"
+            )
+            matches.append(
+                OsMatch(child.get("name", ""), child.get("accuracy", ""), child.get("line", ""), classes)
+            )
+        elif tag == "osfingerprint":
+            host.fingerprint = child.get("fingerprint")
+    host.ports_used = tuple(ports_used)
+    host.os_matches = tuple(matches)
+
+
+def _host(elem: ET.Element) -> Host:
+    host = Host()
+    host.starttime = elem.get("starttime")
+    host.endtime = elem.get("endtime")
+
+    addresses: List[Address] = []
+    for child in elem:
+        tag = child.tag
+        if tag == "address":
+            addresses.append(Address(child.get("addr", ""), child.get("addrtype", ""), child.get("vendor")))
+        elif tag == "status":
+            host.state = child.get("state", "unknown")
+            host.reason = child.get("reason", "N/A")
+        elif tag == "hostnames":
+            host.hostnames = tuple(
+                Hostname(h.get("name", ""), h.get("type", "")) for h in child if h.tag == "hostname"
+            )
+        elif tag == "ports":
+            ports: List[Port] = []
+            extraports: List[ExtraPorts] = []
+            for p in child:
+                if p.tag == "port":
+                    ports.append(_port(p))
+                elif p.tag == "extraports":
+                    extraports.append(ExtraPorts(p.get("state", ""), int(p.get("count", "0"))))
+            host.ports = tuple(ports)
+            host.extraports = tuple(extraports)
+        elif tag == "hostscript":
+            host.host_scripts = _scripts(child)
+        elif tag == "os":
+            _os(host, child)
+        elif tag == "uptime":
+            host.uptime = (child.get("seconds", ""), child.get("lastboot", ""))
+    host.addresses = tuple(addresses)
+    return host
+
+
+def _runstats(elem: ET.Element) -> RunStats:
+    finished = elem.find("finished")
+    hosts = elem.find("hosts")
+    fget = finished.get if finished is not None else (lambda k, d="": d)
+    hget = hosts.get if hosts is not None else (lambda k, d="0": d)
+    return RunStats(
+        fget("time", ""),
+        fget("timestr", ""),
+        fget("elapsed", ""),
+        fget("summary", ""),
+        fget("exit", ""),
+        int(hget("up", "0")),
+        int(hget("down", "0")),
+        int(hget("total", "0")),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Streaming core
+# ---------------------------------------------------------------------------
+
+def _chunks(source: XMLSource) -> Iterator[Union[str, bytes]]:
+    """Yield raw chunks of at most :data:`READ_CHUNK_SIZE` from ``source``.
+
+    In-memory documents are sliced too: expat is markedly faster when fed
+    moderate blocks than when handed a single large buffer.
+    """
+
+    if isinstance(source, (str, bytes, bytearray)):
+        for i in range(0, len(source), READ_CHUNK_SIZE):
+            yield source[i : i + READ_CHUNK_SIZE]
+        return
+    read = getattr(source, "read", None)
+    if read is not None:
+        while True:
+            block = read(READ_CHUNK_SIZE)
+            if not block:
+                return
+            yield block
+    else:
+        yield from source
+
+
+def _stream(
+    source: XMLSource, result: Optional[ScanResult] = None, tolerant: bool = False
+) -> Iterator[Host]:
+    """Feed ``source`` through a pull parser and yield completed hosts.
+
+    Every direct child of ``<nmaprun>`` is detached from the tree once it has
+    been converted, so memory never grows beyond a single host.  When
+    ``result`` is given, the scan level attributes, ``<scaninfo>`` and
+    ``<runstats>`` are recorded on it as they are seen.  On a parse error the
+    hosts completed before it are yielded first; with ``tolerant`` the error
+    then ends the stream (marking ``result`` as truncated) instead of being
+    raised.
+    """
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[ET.Element] = []
+    hosts: List[Host] = []
+
+    def drain() -> None:
+        for event, elem in parser.read_events():
+            if event == "start":
+                if result is not None and not stack and elem.tag == "nmaprun":
+                    result.args = elem.get("args", "")
+                    result.scanner = elem.get("scanner", "")
+                    result.version = elem.get("version", "")
+                    result.start = elem.get("start", "")
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            # Anything deeper than a direct child of <nmaprun> is consumed
+            # when its enclosing element is converted.
+            if len(stack) != 1:
+                continue
+            tag = elem.tag
+            if tag == "host":
+                hosts.append(_host(elem))
+            elif result is not None and tag == "scaninfo":
+                result.scaninfo.append(
+                    ScanInfo(
+                        elem.get("type", ""),
+                        elem.get("protocol", ""),
+                        elem.get("numservices", ""),
+                        elem.get("services", ""),
+                    )
+                )
+            elif result is not None and tag == "runstats":
+                result.runstats = _runstats(elem)
+            stack[0].remove(elem)
+
+    try:
+        for chunk in _chunks(source):
+            parser.feed(chunk)
+            drain()
+            yield from hosts
+            hosts.clear()
+        parser.close()
+        drain()
+    except ET.ParseError:
+        # drain() stops at the error; hosts completed earlier in the chunk survive
+        yield from hosts
+        if not tolerant:
+            raise
+        if result is not None:
+            result.truncated = True
+        return
+    yield from hosts
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def iter_hosts(source: XMLSource) -> Iterator[Host]:
+    """Yield :class:`Host` objects from ``source`` as they are parsed.
+
+    Raises :class:`xml.etree.ElementTree.ParseError` if the document is
+    malformed; hosts preceding the error have already been yielded.
+    """
+
+    return _stream(source)
+
+
+def parse(source: XMLSource) -> ScanResult:
+    """Parse a complete Nmap XML document into a :class:`ScanResult`.
+
+    Raises :class:`xml.etree.ElementTree.ParseError` if the document is
+    malformed.
+    """
+
+    result = ScanResult()
+    result.hosts.extend(_stream(source, result))
+    return result
+
+
+def parse_partial(source: XMLSource) -> ScanResult:
+    """Parse as much of a possibly incomplete Nmap XML document as possible.
+
+    Nmap writes each ``<host>`` element once the host is finished, so the
+    output of a killed or timed-out process is a valid document that stops
+    early.  Every complete host is kept; ``truncated`` is set on the result
+    if the document did not end cleanly.  Never raises ``ParseError``.
+    """
+
+    result = ScanResult()
+    result.hosts.extend(_stream(source, result, tolerant=True))
+    return result
+
+
+__all__ = [
+    "Address",
+    "Hostname",
+    "Script",
+    "Service",
+    "Port",
+    "ExtraPorts",
+    "OsClass",
+    "OsMatch",
+    "PortUsed",
+    "ScanInfo",
+    "RunStats",
+    "Host",
+    "ScanResult",
+    "iter_hosts",
+    "parse",
+    "parse_partial",
+]
@@ -0,0 +1,118 @@
+"""Normalised host and port observations.
+
+Per-host results are stored as a ``{address: host_dict}`` summary in
+``Result.summary_json``, which can only be searched by decoding every row.
+The runner therefore also writes each reported host to ``host_observations``
+and each of its ports to ``port_observations`` (see :mod:`db.models`), so
+questions such as "which hosts had 3389 open in the last run" or "where is
+OpenSSH 7.x running" are answered from indexes by
+:func:`db.repository.query_port_observations` and ``netscan query``.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import repository as db_repo
+
+# Protocol keys of a host_dict, see nmap_xml.Host.to_dict
+PROTOCOLS = ("tcp", "udp", "sctp", "ip")
+
+
+def observation_rows(
+    scan_run_id: int,
+    job_id: int,
+    summary: Optional[Mapping[str, Any]],
+    observed_at: Optional[datetime] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Return the host and port rows for one Job's summary.
+
+    Port numbers may be strings when the summary went through JSON.
+    """
+
+    observed_at = observed_at or datetime.utcnow()
+    hosts: List[Dict[str, Any]] = []
+    ports: List[Dict[str, Any]] = []
+    for address, host in (summary or {}).items():
+        if not isinstance(host, dict):
+            continue
+        status = host.get("status") or {}
+        hosts.append(
+            {
+                "scan_run_id": scan_run_id,
+                "job_id": job_id,
+                "address": address,
+                "state": status.get("state") or "unknown",
+                "reason": status.get("reason"),
+                "observed_at": observed_at,
+            }
+        )
+        for proto in PROTOCOLS:
+            for port, entry in (host.get(proto) or {}).items():
+                ports.append(
+                    {
+                        "scan_run_id": scan_run_id,
+                        "job_id": job_id,
+                        "address": address,
+                        "proto": proto,
+                        "port": int(port),
+                        "state": entry.get("state") or "unknown",
+                        "service": entry.get("name") or None,
+                        "product": entry.get("product") or None,
+                        "version": entry.get("version") or None,
+                    }
+                )
+    return hosts, ports
+
+
+def record_observations(
+    session: Session,
+    scan_run_id: int,
+    job_id: int,
+    summary: Optional[Mapping[str, Any]],
+    replace: bool = False,
+) -> int:
+    """Write the observations of one Job's summary and return the host count.
+
+    With ``replace`` the observations of the Job's earlier attempts, e.g. the
+    partial hosts of a range that timed out before a retry or bisect, are
+    deleted first so that no host is counted twice in ``scan_run_stats``.
+    """
+
+    hosts, ports = observation_rows(scan_run_id, job_id, summary)
+    if replace:
+        db_repo.delete_observations_for_job(session, job_id)
+    if hosts or replace:
+        db_repo.add_observations(session, hosts, ports)
+    return len(hosts)
+
+
+def backfill_observations(session: Session) -> int:
+    """Record observations for stored results that predate the tables.
+
+    Only Jobs without any observation are considered, so running this again
+    is cheap and does not duplicate rows.  Returns the number of Jobs filled.
+    """
+
+    filled = set()
+    for result in db_repo.iter_unobserved_results(session):
+        if result.job_id in filled:
+            continue
+        try:
+            summary = json.loads(result.summary_json)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(summary, dict):
+            continue
+        hosts, ports = observation_rows(result.job.scan_run_id, result.job_id, summary, result.created_at)
+        if hosts:
+            db_repo.add_observations(session, hosts, ports)
+            filled.add(result.job_id)
+    return len(filled)
+
+
+__all__ = ["PROTOCOLS", "observation_rows", "record_observations", "backfill_observations"]
@@ -14,9 +14,10 @@ from typing import Any, Dict, List, Optional
 import csv
 import json
 
+from sqlalchemy import func, select, union
 from sqlalchemy.orm import Session
 
-from db.models import ScanRun, Batch, Job
+from db.models import ScanRun, ScanRunStats, Batch, Job, JobStatus, Result, Target
 
 
 # ---------------------------------------------------------------------------
@@ -36,67 +37,93 @@ def _job_duration(job: Job) -> Optional[float]:
 # ---------------------------------------------------------------------------
 
 def get_slowest_jobs(session: Session, limit: int = 5) -> List[Dict[str, Any]]:
-    """Return the ``limit`` slowest jobs sorted by duration."""
-
-    jobs = session.query(Job).all()
-    jobs_with_durations = [j for j in jobs if _job_duration(j) is not None]
-    jobs_with_durations.sort(key=lambda j: _job_duration(j), reverse=True)
-
-    rows: List[Dict[str, Any]] = []
-    for job in jobs_with_durations[:limit]:
-        rows.append(
-            {
-                "job_id": job.id,
-                "scan_run_id": job.scan_run_id,
-                "target": job.target.address if job.target else None,
-                "duration": _job_duration(job),
-                "status": job.status,
-            }
-        )
-    return rows
+    """Return the ``limit`` slowest jobs sorted by duration.
+
+    Sorting and limiting happen in SQL on ``ix_jobs_elapsed``; only the
+    returned rows are loaded and their durations computed exactly.
+    """
+
+    elapsed = func.julianday(Job.completed_at) - func.julianday(Job.started_at)
+    query = (
+        session.query(Job.id, Job.scan_run_id, Target.address, Job.status, Job.started_at, Job.completed_at)
+        .outerjoin(Target, Target.id == Job.target_id)
+        .filter(elapsed.isnot(None))
+        .order_by(elapsed.desc(), Job.id)
+        .limit(limit)
+    )
+    return [
+        {
+            "job_id": job_id,
+            "scan_run_id": scan_run_id,
+            "target": address,
+            "duration": (completed_at - started_at).total_seconds(),
+            "status": status,
+        }
+        for job_id, scan_run_id, address, status, started_at, completed_at in query
+    ]
 
 
 def get_failed_jobs(session: Session) -> List[Dict[str, Any]]:
-    """Return jobs that are not completed successfully along with errors."""
-
-    jobs = session.query(Job).all()
-    failed: List[Dict[str, Any]] = []
-    for job in jobs:
-        # A job is failed if its status is not 'completed' or if any associated
-        # result contains an error message.  We inspect ``results`` relationship
-        # in Python to avoid complex SQL for this educational project.
-        error: Optional[str] = None
-        for res in job.results:
-            if res.stderr:
-                error = res.stderr
-                break
-        if job.status != "completed" or error:
-            failed.append(
-                {
-                    "job_id": job.id,
-                    "scan_run_id": job.scan_run_id,
-                    "target": job.target.address if job.target else None,
-                    "status": job.status,
-                    "error": error,
-                }
-            )
-    return failed
+    """Return jobs that are not completed successfully along with errors.
+
+    A job is failed if its status is not ``completed`` or if any of its
+    results has an error message; the first such message is reported.
+    Candidates are collected from the status index and the results with an
+    error, so completed jobs without errors are never visited.
+    """
+
+    error = (
+        select(Result.stderr)
+        .where(Result.job_id == Job.id, Result.stderr.isnot(None), Result.stderr != "")
+        .order_by(Result.id)
+        .limit(1)
+        .correlate(Job)
+        .scalar_subquery()
+    )
+    candidates = union(
+        select(Job.id).where(Job.status.in_([s for s in JobStatus if s != JobStatus.COMPLETED])),
+        select(Result.job_id).where(Result.stderr.isnot(None), Result.stderr != ""),
+    )
+    query = (
+        session.query(Job.id, Job.scan_run_id, Target.address, Job.status, error)
+        .outerjoin(Target, Target.id == Job.target_id)
+        .filter(Job.id.in_(candidates))
+        .order_by(Job.id)
+    )
+    return [
+        {
+            "job_id": job_id,
+            "scan_run_id": scan_run_id,
+            "target": address,
+            "status": status,
+            "error": message,
+        }
+        for job_id, scan_run_id, address, status, message in query
+    ]
 
 
 def summarise_runs(session: Session) -> List[Dict[str, Any]]:
-    """Return a summary per :class:`~src.db.models.ScanRun`."""
+    """Return a summary per :class:`~src.db.models.ScanRun`.
+
+    Job counts are read from the trigger-maintained ``scan_run_stats`` row of
+    each run, so the cost does not depend on the number of jobs.
+    """
 
     rows: List[Dict[str, Any]] = []
-    for run in session.query(ScanRun).all():
-        total_jobs = len(run.jobs)
-        completed = sum(1 for j in run.jobs if j.status == "completed")
-        failed = total_jobs - completed
+    query = (
+        session.query(ScanRun.id, ScanRunStats)
+        .outerjoin(ScanRunStats, ScanRunStats.scan_run_id == ScanRun.id)
+        .order_by(ScanRun.id)
+    )
+    for run_id, stats in query:
+        total_jobs = stats.total if stats else 0
+        completed = stats.completed if stats else 0
         rows.append(
             {
-                "scan_run_id": run.id,
+                "scan_run_id": run_id,
                 "total_jobs": total_jobs,
                 "completed_jobs": completed,
-                "failed_jobs": failed,
+                "failed_jobs": total_jobs - completed,
             }
         )
     return rows
@@ -0,0 +1,301 @@
+"""Concurrent hostname resolution with a TTL-respecting cache.
+
+Hostname targets are resolved once, before jobs run, instead of leaving every
+nmap process to perform its own blocking lookup.  :func:`resolve_targets`
+looks names up concurrently with bounded parallelism, stores the answers in
+the ``dns_cache`` table until their TTL expires and records the chosen
+address on each :class:`~db.models.Target`.  The runner then hands nmap the
+address together with ``-n``.
+
+Two resolvers are provided:
+
+* :class:`SystemResolver` uses the operating system's resolver through
+  :meth:`asyncio.loop.getaddrinfo`.  It cannot see record TTLs, so answers
+  are cached for ``default_ttl`` seconds.
+* :class:`DnsResolver` sends plain DNS queries over UDP to a given name
+  server and honours the TTLs in the answer.  Pointing it at a local stub
+  server makes resolution fully testable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import socket
+import struct
+from datetime import datetime, timedelta
+from ipaddress import ip_address
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import repository as db_repo
+
+DEFAULT_TTL = 300
+DEFAULT_CONCURRENCY = 32
+
+
+class ResolvedName(NamedTuple):
+    """Addresses for one hostname, preferred address first."""
+
+    hostname: str
+    addresses: Tuple[str, ...]
+    ttl: int
+
+
+class ResolutionError(Exception):
+    """Raised by resolvers when a name cannot be resolved."""
+
+
+def is_hostname(address: str) -> bool:
+    """Return ``True`` if ``address`` is not an IP literal or CIDR block."""
+
+    if "/" in address:
+        return False
+    try:
+        ip_address(address)
+    except ValueError:
+        return True
+    return False
+
+
+def _prefer_ipv4(addresses: Iterable[str]) -> Tuple[str, ...]:
+    unique = list(dict.fromkeys(addresses))
+    return tuple(sorted(unique, key=lambda a: ip_address(a).version))
+
+
+class SystemResolver:
+    """Resolve names with the system resolver via ``getaddrinfo``."""
+
+    def __init__(self, default_ttl: int = DEFAULT_TTL) -> None:
+        self.default_ttl = default_ttl
+
+    async def resolve(self, hostname: str) -> ResolvedName:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError) as e:  # socket.gaierror, malformed names
+            raise ResolutionError(f"{hostname}: {e}") from e
+        addresses = _prefer_ipv4(info[4][0] for info in infos)
+        if not addresses:
+            raise ResolutionError(f"{hostname}: no addresses")
+        return ResolvedName(hostname, addresses, self.default_ttl)
+
+
+# ---------------------------------------------------------------------------
+# Minimal DNS client
+# ---------------------------------------------------------------------------
+
+QTYPE_A = 1
+QTYPE_AAAA = 28
+
+
+def build_query(query_id: int, hostname: str, qtype: int) -> bytes:
+    """Encode a recursive DNS query for ``hostname``.
+
+    Raises :class:`ResolutionError` if ``hostname`` is not a valid name,
+    e.g. has an empty label or one longer than 63 bytes.
+    """
+
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    try:
+        encoded = hostname.rstrip(".").encode("idna")
+    except UnicodeError as e:
+        raise ResolutionError(f"{hostname}: invalid name ({e})") from e
+    labels = b"".join(bytes([len(part)]) + part for part in encoded.split(b"."))
+    return header + labels + b"\x00" + struct.pack("!HH", qtype, 1)
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:  # compression pointer
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+
+def parse_response(data: bytes, query_id: int) -> Tuple[int, List[Tuple[int, str, int]]]:
+    """Return ``(rcode, [(type, address, ttl), ...])`` for A/AAAA answers."""
+
+    rid, flags, qdcount, ancount, _, _ = struct.unpack("!HHHHHH", data[:12])
+    if rid != query_id:
+        raise ResolutionError("mismatched DNS response id")
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    answers: List[Tuple[int, str, int]] = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack("!HHIH", data[offset : offset + 10])
+        offset += 10
+        rdata = data[offset : offset + rdlength]
+        offset += rdlength
+        if rtype == QTYPE_A and rdlength == 4:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET, rdata), ttl))
+        elif rtype == QTYPE_AAAA and rdlength == 16:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET6, rdata), ttl))
+    return flags & 0x000F, answers
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future: "asyncio.Future[bytes]") -> None:
+        self.future = future
+
+    def datagram_received(self, data: bytes, addr) -> None:  # type: ignore[override]
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class DnsResolver:
+    """Resolve names by querying ``nameserver`` directly over UDP.
+
+    A records are tried first and AAAA records only if there are none.  The
+    cache TTL is the smallest TTL among the returned records.
+    """
+
+    def __init__(
+        self,
+        nameserver: str,
+        port: int = 53,
+        timeout: float = 2.0,
+        retries: int = 2,
+    ) -> None:
+        self.nameserver = nameserver
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+
+    async def _query(self, hostname: str, qtype: int) -> List[Tuple[int, str, int]]:
+        loop = asyncio.get_running_loop()
+        last_error: Optional[Exception] = None
+        for _ in range(self.retries + 1):
+            query_id = random.randint(0, 0xFFFF)
+            query = build_query(query_id, hostname, qtype)
+            future: "asyncio.Future[bytes]" = loop.create_future()
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _QueryProtocol(future), remote_addr=(self.nameserver, self.port)
+            )
+            try:
+                transport.sendto(query)
+                data = await asyncio.wait_for(future, self.timeout)
+                rcode, answers = parse_response(data, query_id)
+            except (asyncio.TimeoutError, OSError, ResolutionError) as e:
+                last_error = e
+                continue
+            finally:
+                transport.close()
+            if rcode == 3:  # NXDOMAIN
+                raise ResolutionError(f"{hostname}: NXDOMAIN")
+            return answers
+        raise ResolutionError(f"{hostname}: no response from {self.nameserver} ({last_error})")
+
+    async def resolve(self, hostname: str) -> ResolvedName:
+        answers = await self._query(hostname, QTYPE_A)
+        if not answers:
+            answers = await self._query(hostname, QTYPE_AAAA)
+        if not answers:
+            raise ResolutionError(f"{hostname}: no addresses")
+        return ResolvedName(
+            hostname,
+            _prefer_ipv4(addr for _, addr, _ in answers),
+            min(ttl for _, _, ttl in answers),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Resolution stage
+# ---------------------------------------------------------------------------
+
+async def resolve_names(
+    hostnames: Sequence[str], resolver, concurrency: int = DEFAULT_CONCURRENCY
+) -> Dict[str, ResolvedName]:
+    """Resolve ``hostnames`` concurrently, at most ``concurrency`` at a time.
+
+    Names that fail to resolve, including malformed ones, are left out of
+    the result.
+    """
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: Dict[str, ResolvedName] = {}
+
+    async def resolve_one(name: str) -> None:
+        async with semaphore:
+            try:
+                results[name] = await resolver.resolve(name)
+            except (ResolutionError, ValueError):  # UnicodeError for malformed names
+                pass
+
+    await asyncio.gather(*(resolve_one(name) for name in dict.fromkeys(hostnames)))
+    return results
+
+
+async def resolve_targets(
+    session: Session,
+    targets: Iterable[Tuple[int, str]],
+    resolver=None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    now: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Resolve the ``(id, address)`` HOST ``targets`` and record each address by id.
+
+    ``targets`` is typically
+    :func:`db.repository.iter_hostname_targets_for_scan_run`; IP literals
+    among them are skipped.  Fresh ``dns_cache`` entries are used as-is; only missing or expired names
+    are looked up.  Returns ``{hostname: address}`` for every name that has
+    an address.  Unresolvable names keep no ``resolved_address`` so nmap
+    falls back to resolving them itself.
+    """
+
+    now = now or datetime.utcnow()
+    resolver = resolver or SystemResolver()
+    by_name: Dict[str, List[int]] = {}
+    for target_id, address in targets:
+        if is_hostname(address):
+            by_name.setdefault(address, []).append(target_id)
+    if not by_name:
+        return {}
+
+    addresses: Dict[str, str] = {}
+    for entry in db_repo.get_dns_cache_entries(session, by_name):
+        if entry.expires_at > now and entry.addresses:
+            addresses[entry.hostname] = entry.addresses.split(",")[0]
+
+    stale = [name for name in by_name if name not in addresses]
+    resolved = await resolve_names(stale, resolver, concurrency)
+    for name, answer in resolved.items():
+        db_repo.upsert_dns_cache_entry(
+            session,
+            name,
+            addresses=",".join(answer.addresses),
+            resolved_at=now,
+            expires_at=now + timedelta(seconds=answer.ttl),
+        )
+        addresses[name] = answer.addresses[0]
+
+    db_repo.update_target_resolutions(
+        session,
+        (
+            (target_id, addresses.get(name), now if name in addresses else None)
+            for name, target_ids in by_name.items()
+            for target_id in target_ids
+        ),
+    )
+    session.commit()
+    return addresses
+
+
+__all__ = [
+    "ResolvedName",
+    "ResolutionError",
+    "SystemResolver",
+    "DnsResolver",
+    "is_hostname",
+    "resolve_names",
+    "resolve_targets",
+]
@@ -1,16 +1,24 @@
 import asyncio
 import json
+from contextlib import asynccontextmanager
 import os
 import tempfile
+import time
+from collections import deque
 from datetime import datetime
+from ipaddress import ip_address, ip_network
+from math import ceil
+from statistics import median
 from subprocess import PIPE
-from typing import List, Optional, Any, Dict
+from typing import Any, Awaitable, Callable, Collection, Dict, Iterable, List, NamedTuple, Optional, Sequence, Sized, Tuple
+import xml.etree.ElementTree as ET
 
-import nmap
 from sqlalchemy.orm import Session
 
 from db import repository as db_repo
-from db.models import Job, JobStatus
+from db.models import Job, JobStatus, TargetKind
+import nmap_xml
+import observations
 
 
 def _create_ws_message(msg_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -18,55 +26,25 @@ def _create_ws_message(msg_type: str, payload: Dict[str, Any]) -> Dict[str, Any]
     return {"type": msg_type, "payload": payload}
 
 
-import xml.etree.ElementTree as ET
-
 def _parse_nmap_xml_from_string(xml_string: str) -> Dict[str, Any]:
-    """
-    Parses nmap XML output from a string into a dictionary manually.
-    This is a workaround for issues with the python-nmap library's parsing.
+    """Parse nmap XML output into a ``{address: host_dict}`` summary.
+
+    Returns an empty dict if the XML is missing or malformed.
     """
     if not xml_string:
         return {}
 
     try:
-        root = ET.fromstring(xml_string)
-        scan_results = {}
-        for host in root.findall('host'):
-            host_ip = host.find('address').get('addr')
-            if not host_ip:
-                continue
+        return nmap_xml.parse(xml_string).to_summary()
+    except ET.ParseError:
+        return {}
 
-            status_elem = host.find('status')
-            host_status = {
-                'state': status_elem.get('state', 'unknown'),
-                'reason': status_elem.get('reason', 'N/A'),
-            }
 
-            tcp_ports = {}
-            ports_elem = host.find('ports')
-            if ports_elem:
-                for port in ports_elem.findall('port'):
-                    if port.get('protocol') == 'tcp':
-                        port_id = port.get('portid')
-                        state_elem = port.find('state')
-                        if port_id and state_elem is not None and state_elem.get('state') == 'open':
-                            service_elem = port.find('service')
-                            tcp_ports[port_id] = {
-                                'state': state_elem.get('state'),
-                                'reason': state_elem.get('reason'),
-                                'name': service_elem.get('name', '') if service_elem is not None else '',
-                                'product': service_elem.get('product', '') if service_elem is not None else '',
-                                'version': service_elem.get('version', '') if service_elem is not None else '',
-                            }
-
-            scan_results[host_ip] = {
-                'status': host_status,
-                'tcp': tcp_ports,
-            }
-        return scan_results
-    except ET.ParseError:
-        # Return an empty dict if XML is malformed
+def _parse_partial_nmap_xml(xml_string: str) -> Dict[str, Any]:
+    """Summarise the complete ``<host>`` elements of truncated nmap output."""
+    if not xml_string:
         return {}
+    return nmap_xml.parse_partial(xml_string).to_summary()
 
 
 async def _send_chunk_update(
@@ -80,8 +58,16 @@ async def _send_chunk_update(
 
     # Create a minimal result payload from the summary if available
     minimal_result = {}
-    if summary and job.target:
-        host_data = summary.get(job.target.address, {})
+    if summary and job.target and job.target.kind == TargetKind.RANGE:
+        hosts_up = sum(1 for h in summary.values() if h.get("status", {}).get("state") == "up")
+        minimal_result = {
+            "address": job.target.address,
+            "status": "up" if hosts_up else "down",
+            "hosts_up": hosts_up,
+            "hosts_reported": len(summary),
+        }
+    elif summary and job.target:
+        host_data = summary.get(job.target.address) or summary.get(job.target.resolved_address, {})
         if host_data:
              minimal_result = {
                 "address": job.target.address,
@@ -97,101 +83,495 @@ async def _send_chunk_update(
     await queue.put(_create_ws_message("CHUNK_UPDATE", payload))
 
 
-async def execute_job(
-    job_id: int,
+def _nmap_target(job: Job) -> str:
+    """The argument nmap gets for a job's target."""
+    if job.target.resolved_address and job.target.kind != TargetKind.RANGE:
+        # Resolved ahead of time by resolver.resolve_targets; skip nmap's own DNS
+        return job.target.resolved_address
+    return job.target.address
+
+
+def _job_summary(job: Job, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Select the hosts of a multi-target nmap summary that belong to ``job``."""
+    target = job.target
+    if target.kind == TargetKind.RANGE:
+        try:
+            network = ip_network(target.address, strict=False)
+        except ValueError:
+            return {}
+        selected = {}
+        for address, host in summary.items():
+            try:
+                if ip_address(address) in network:
+                    selected[address] = host
+            except ValueError:
+                continue
+        return selected
+    for key in (target.address, target.resolved_address):
+        if key and key in summary:
+            return {key: summary[key]}
+    name = target.address.lower()
+    return {
+        a: h
+        for a, h in summary.items()
+        if any(hn.get("name", "").lower() == name for hn in h.get("hostnames", []))
+    }
+
+
+class _Unit:
+    """One nmap invocation for a set of jobs and the attempts racing for it."""
+
+    def __init__(self, job_ids: List[int], command: List[str], options: str, attempt: int = 1):
+        self.job_ids = job_ids
+        self.command = command
+        self.options = options
+        # Attempt number of the first invocation; backups count on from it
+        self.attempt = attempt
+        self.started = time.monotonic()
+        self.procs: List[asyncio.subprocess.Process] = []
+        self.result: "asyncio.Future[Tuple[int, Optional[int], bytes, bytes]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.backup_launched = False
+        self.outputs: Dict[int, bytearray] = {}
+
+    def add_attempt(self, proc: asyncio.subprocess.Process, attempt: int) -> None:
+        self.procs.append(proc)
+        asyncio.ensure_future(self._communicate(proc, attempt))
+
+    async def _communicate(self, proc: asyncio.subprocess.Process, attempt: int) -> None:
+        # Read incrementally so the output survives if the attempt is killed
+        stdout = self.outputs.setdefault(attempt, bytearray())
+        stderr = bytearray()
+        try:
+            await asyncio.gather(_drain(proc.stdout, stdout), _drain(proc.stderr, stderr))
+            await proc.wait()
+        except Exception as e:  # pragma: no cover - pipe errors
+            if not self.result.done():
+                self.result.set_exception(e)
+            return
+        if not self.result.done():
+            self.result.set_result((attempt, proc.returncode, bytes(stdout), bytes(stderr)))
+
+    def partial_output(self) -> bytes:
+        """The longest output any attempt has written so far."""
+        return bytes(max(self.outputs.values(), key=len, default=b""))
+
+    async def kill(self) -> None:
+        """Kill every attempt that is still running."""
+        for proc in self.procs:
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+
+
+async def _drain(stream: Optional[asyncio.StreamReader], buffer: bytearray) -> None:
+    if stream is None:
+        return
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return
+        buffer.extend(chunk)
+
+
+class SpeculationPolicy:
+    """When to launch a speculative backup attempt for a straggling job.
+
+    A backup is started once at least ``min_progress`` of the run's jobs
+    have finished and a unit has been running for more than ``multiplier``
+    times the median per-job duration of finished units with the same nmap
+    options (after ``min_samples`` of them).  At most ``slots`` backups run
+    at any time, on top of the normal concurrency.
+    """
+
+    def __init__(
+        self,
+        multiplier: float = 2.0,
+        min_progress: float = 0.9,
+        slots: int = 2,
+        min_samples: int = 3,
+        check_interval: float = 1.0,
+    ):
+        self.multiplier = multiplier
+        self.min_progress = min_progress
+        self.slots = slots
+        self.min_samples = min_samples
+        self.check_interval = check_interval
+
+
+class Speculator:
+    """Tracks running units and launches backups according to a policy.
+
+    The winning attempt is whichever finishes first (see ``execute_chunk``);
+    launching a backup increments ``Job.attempt`` for the unit's jobs.
+    """
+
+    def __init__(self, policy: SpeculationPolicy, total_jobs: int, db_session: Session):
+        self.policy = policy
+        self.total_jobs = total_jobs
+        self.db_session = db_session
+        self.running: List[_Unit] = []
+        self.durations: Dict[str, List[float]] = {}
+        self.finished_jobs = 0
+        self.active_backups = 0
+        self.backups_launched = 0
+
+    def register(self, unit: _Unit) -> None:
+        self.running.append(unit)
+
+    def finish(self, unit: _Unit, status: JobStatus) -> None:
+        if unit in self.running:
+            self.running.remove(unit)
+        if unit.backup_launched:
+            self.active_backups -= 1
+        self.finished_jobs += len(unit.job_ids)
+        if status == JobStatus.COMPLETED:
+            per_job = (time.monotonic() - unit.started) / len(unit.job_ids)
+            self.durations.setdefault(unit.options, []).append(per_job)
+
+    def stragglers(self) -> List[_Unit]:
+        """Units that qualify for a backup right now, oldest first."""
+        if self.finished_jobs < self.policy.min_progress * self.total_jobs:
+            return []
+        now = time.monotonic()
+        candidates = []
+        for unit in self.running:
+            samples = self.durations.get(unit.options, [])
+            if unit.backup_launched or len(samples) < self.policy.min_samples:
+                continue
+            limit = self.policy.multiplier * median(samples) * len(unit.job_ids)
+            if now - unit.started > limit:
+                candidates.append(unit)
+        candidates.sort(key=lambda u: u.started)
+        return candidates
+
+    async def launch_backups(self) -> None:
+        for unit in self.stragglers():
+            if self.active_backups >= self.policy.slots:
+                return
+            try:
+                proc = await asyncio.create_subprocess_exec(*unit.command, stdout=PIPE, stderr=PIPE)
+            except OSError:
+                return
+            # The unit may have finished while the backup was starting
+            if unit.result.done() or unit not in self.running:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+                continue
+            unit.backup_launched = True
+            self.active_backups += 1
+            self.backups_launched += 1
+            jobs = [job for job in (db_repo.get_job(self.db_session, job_id) for job_id in unit.job_ids) if job]
+            attempt = max((job.attempt for job in jobs), default=unit.attempt) + 1
+            for job in jobs:
+                db_repo.update_job(self.db_session, job.id, attempt=attempt)
+            unit.add_attempt(proc, attempt)
+
+    async def monitor(self) -> None:
+        """Check for stragglers every ``check_interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.policy.check_interval)
+            await self.launch_backups()
+
+
+async def execute_chunk(
+    job_ids: List[int],
     db_session: Session,
     timeout_sec: int,
     update_queue: Optional[asyncio.Queue] = None,
-):
+    speculator: Optional["Speculator"] = None,
+    timing: Optional[str] = None,
+) -> List[int]:
     """
-    Fetches a job from the database, executes nmap, saves the full result summary,
-    and sends real-time updates.
+    Executes one nmap process for all targets of ``job_ids`` and saves the
+    result of each job.  With several jobs, each one's summary holds only
+    the hosts of its own target and the raw nmap output is stored with the
+    first job's Result.  The nmap options of the first job apply to all;
+    ``timing`` (e.g. ``"-T2"``) is appended after them and so overrides any
+    timing template they set.
+
+    On timeout, the output nmap had written so far is parsed tolerantly and
+    stored as partial Results (``Result.partial``): host targets whose host
+    element is complete are completed with reason ``"salvaged"``, range
+    targets keep the hosts found so far but stay failed.  Returns the ids of
+    the jobs that timed out unfinished.
     """
-    job = db_repo.get_job(db_session, job_id)
-    if not job or not job.target:
-        return
+    jobs = [job for job in (db_repo.get_job(db_session, job_id) for job_id in job_ids) if job and job.target]
+    if not jobs:
+        return []
 
     base_command = ["nmap", "-oX", "-", "-T4"]
-    nmap_flags = job.nmap_options or (job.scan_run.options if job.scan_run else None)
+    nmap_flags = jobs[0].nmap_options or (jobs[0].scan_run.options if jobs[0].scan_run else None)
     if nmap_flags:
         base_command.extend(nmap_flags.split())
-    command = base_command + [job.target.address]
-
-    proc = None
+    if timing:
+        base_command.append(timing)
+    targets = [_nmap_target(job) for job in jobs]
+    if any(t != job.target.address for t, job in zip(targets, jobs)):
+        base_command.append("-n")
+    command = base_command + targets
+
+    unit = _Unit(job_ids, command, nmap_flags or "", attempt=jobs[0].attempt)
+    # Jobs that timed out before may have recorded the hosts found so far
+    rerun = {job.id for job in jobs if job.timeouts}
     final_status = JobStatus.FAILED
-    summary_dict = None
+    summaries: Dict[int, Optional[Dict[str, Any]]] = {}
+    statuses: Dict[int, JobStatus] = {}
+    unfinished: List[int] = []
 
     try:
         proc = await asyncio.create_subprocess_exec(*command, stdout=PIPE, stderr=PIPE)
-
-        db_repo.update_job(
-            db_session, job_id=job.id, pid=proc.pid, status=JobStatus.RUNNING, started_at=datetime.utcnow()
+        unit.add_attempt(proc, unit.attempt)
+
+        for job in jobs:
+            db_repo.update_job(
+                db_session, job_id=job.id, pid=proc.pid, status=JobStatus.RUNNING, started_at=datetime.utcnow()
+            )
+            await _send_chunk_update(update_queue, job, JobStatus.RUNNING)
+        if speculator:
+            speculator.register(unit)
+
+        # The first attempt to finish wins; a speculative backup may race the original
+        attempt, returncode, stdout, stderr = await asyncio.wait_for(
+            asyncio.shield(unit.result), timeout=timeout_sec
         )
-        await _send_chunk_update(update_queue, job, JobStatus.RUNNING)
-
-        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout_sec)
+        await unit.kill()
         stdout_str = stdout.decode(errors="ignore")
         stderr_str = stderr.decode(errors="ignore")
 
-        final_status = JobStatus.COMPLETED if proc.returncode == 0 else JobStatus.FAILED
+        final_status = JobStatus.COMPLETED if returncode == 0 else JobStatus.FAILED
+        reason = "completed" if final_status == JobStatus.COMPLETED else "nmap_error"
+        if attempt > unit.attempt:
+            reason += "_by_backup"
 
-        summary_json_str = None
+        summary_dict: Dict[str, Any] = {}
         if stdout_str and final_status == JobStatus.COMPLETED:
             summary_dict = _parse_nmap_xml_from_string(stdout_str)
-            if summary_dict:
-                summary_json_str = json.dumps(summary_dict)
-
-        db_repo.update_job(
-            db_session,
-            job_id=job.id,
-            exit_code=proc.returncode,
-            status=final_status,
-            reason="completed" if final_status == JobStatus.COMPLETED else "nmap_error",
-            completed_at=datetime.utcnow(),
-        )
-        db_repo.create_result(
-            db_session, job_id=job.id, stdout=stdout_str, stderr=stderr_str, summary_json=summary_json_str
-        )
+
+        for index, job in enumerate(jobs):
+            job_summary = summary_dict if len(jobs) == 1 else _job_summary(job, summary_dict)
+            summaries[job.id] = job_summary or None
+            db_repo.update_job(
+                db_session,
+                job_id=job.id,
+                exit_code=returncode,
+                status=final_status,
+                reason=reason,
+                completed_at=datetime.utcnow(),
+            )
+            db_repo.create_result(
+                db_session,
+                job_id=job.id,
+                stdout=stdout_str if index == 0 else None,
+                stderr=stderr_str if index == 0 else None,
+                summary_json=json.dumps(job_summary) if job_summary else None,
+            )
+            observations.record_observations(
+                db_session, job.scan_run_id, job.id, job_summary, replace=job.id in rerun
+            )
 
     except asyncio.TimeoutError:
-        if proc: proc.kill(); await proc.wait()
+        await unit.kill()
         final_status = JobStatus.FAILED
-        db_repo.update_job(db_session, job_id=job.id, status=final_status, reason="timeout", completed_at=datetime.utcnow())
+        # Nmap writes hosts as it finishes them, so keep what it had printed
+        partial_stdout = unit.partial_output().decode(errors="ignore")
+        partial = _parse_partial_nmap_xml(partial_stdout)
+        for index, job in enumerate(jobs):
+            job_summary = partial if len(jobs) == 1 else _job_summary(job, partial)
+            summaries[job.id] = job_summary or None
+            # A range is only finished when nmap is; a host once its element is written
+            if job_summary and job.target.kind != TargetKind.RANGE:
+                statuses[job.id] = JobStatus.COMPLETED
+                db_repo.update_job(
+                    db_session, job_id=job.id, status=JobStatus.COMPLETED, reason="salvaged", completed_at=datetime.utcnow()
+                )
+            else:
+                unfinished.append(job.id)
+                db_repo.update_job(
+                    db_session,
+                    job_id=job.id,
+                    status=final_status,
+                    reason="timeout",
+                    timeouts=job.timeouts + 1,
+                    completed_at=datetime.utcnow(),
+                )
+            if job_summary or (index == 0 and partial_stdout):
+                db_repo.create_result(
+                    db_session,
+                    job_id=job.id,
+                    stdout=partial_stdout if index == 0 else None,
+                    summary_json=json.dumps(job_summary) if job_summary else None,
+                    partial=True,
+                )
+                observations.record_observations(
+                    db_session, job.scan_run_id, job.id, job_summary, replace=job.id in rerun
+                )
     except Exception as e:
+        await unit.kill()
         final_status = JobStatus.FAILED
-        db_repo.update_job(db_session, job_id=job.id, status=final_status, reason=f"runner_exception: {str(e)}", completed_at=datetime.utcnow())
+        for job in jobs:
+            db_repo.update_job(db_session, job_id=job.id, status=final_status, reason=f"runner_exception: {str(e)}", completed_at=datetime.utcnow())
     finally:
-        final_job_state = db_repo.get_job(db_session, job_id)
-        if final_job_state:
-            await _send_chunk_update(update_queue, final_job_state, final_status, summary_dict)
+        if speculator:
+            speculator.finish(unit, final_status)
+        for job in jobs:
+            final_job_state = db_repo.get_job(db_session, job.id)
+            if final_job_state:
+                await _send_chunk_update(
+                    update_queue, final_job_state, statuses.get(job.id, final_status), summaries.get(job.id)
+                )
+    return unfinished
+
+
+async def execute_job(
+    job_id: int,
+    db_session: Session,
+    timeout_sec: int,
+    update_queue: Optional[asyncio.Queue] = None,
+    speculator: Optional["Speculator"] = None,
+):
+    """
+    Fetches a job from the database, executes nmap, saves the full result summary,
+    and sends real-time updates.
+    """
+    await execute_chunk([job_id], db_session, timeout_sec, update_queue, speculator)
+
+
+class SlowLane:
+    """A small, separate pool for targets that keep timing out.
+
+    Each job in the slow lane is scanned on its own with a relaxed nmap
+    ``timing`` template and a long ``timeout_sec``, at most ``concurrency``
+    at a time, so it does not hold the slots of the normal workers.
+    """
+
+    def __init__(self, concurrency: int = 1, timing: str = "-T2", timeout_sec: int = 900):
+        self.concurrency = concurrency
+        self.timing = timing
+        self.timeout_sec = timeout_sec
+
+
+async def _run_in_slow_lane(
+    job_id: int,
+    lane: SlowLane,
+    semaphore: asyncio.Semaphore,
+    db_session: Session,
+    update_queue: Optional[asyncio.Queue],
+) -> List[int]:
+    async with semaphore:
+        db_repo.update_job(db_session, job_id, timeout_sec=lane.timeout_sec)
+        return await execute_chunk([job_id], db_session, lane.timeout_sec, update_queue, timing=lane.timing)
+
+
+async def dispatch(
+    job_ids: Iterable[int], workers: int, handle: Callable[[int], Awaitable[Any]]
+) -> None:
+    """Call ``handle(job_id)`` for every id with ``workers`` long-lived workers.
+
+    ``job_ids`` is consumed lazily through a queue of ``2 * workers`` slots,
+    so memory use does not depend on the number of jobs: there is never more
+    than one coroutine per worker and a handful of queued ids.
+    """
+    workers = max(1, workers)
+    queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue(maxsize=2 * workers)
+
+    async def feed():
+        for job_id in job_ids:
+            await queue.put(job_id)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            job_id = await queue.get()
+            if job_id is None:
+                return
+            await handle(job_id)
+
+    await asyncio.gather(feed(), *(worker() for _ in range(workers)))
 
 
 async def run_jobs_concurrently(
     scan_run_id: int,
-    job_ids: List[int],
+    job_ids: Optional[Iterable[int]],
     db_session: Session,
     concurrency: int,
     timeout_sec: int,
     update_queue: Optional[asyncio.Queue] = None,
+    speculation: Optional[SpeculationPolicy] = None,
+    slow_lane: Optional[SlowLane] = None,
+    slow_job_ids: Collection[int] = (),
 ):
-    """Runs jobs with concurrency, sends updates, and a final completion message."""
-    semaphore = asyncio.Semaphore(concurrency)
+    """Runs jobs with concurrency, sends updates, and a final completion message.
+
+    ``concurrency`` workers take job ids from :func:`dispatch`.  ``job_ids``
+    may be a lazy iterable such as :func:`db.repository.iter_job_ids`; with
+    ``None`` all of the run's PLANNED jobs are read that way, so no list of
+    ids is ever built.
+
+    With a ``speculation`` policy, straggling jobs near the end of the run get
+    a backup attempt (see :class:`SpeculationPolicy`).  Jobs in
+    ``slow_job_ids`` run in ``slow_lane`` instead of taking one of the
+    ``concurrency`` slots.
+    """
     scan_run = db_repo.get_scan_run(db_session, scan_run_id)
     if not scan_run: return
 
+    if job_ids is None:
+        job_ids = db_repo.iter_job_ids(db_session, scan_run_id, JobStatus.PLANNED)
+    if isinstance(job_ids, Sized):
+        total = len(job_ids)
+    else:
+        total = db_repo.count_jobs_for_scan_run(db_session, scan_run_id, JobStatus.PLANNED)
     db_repo.update_scan_run(db_session, scan_run_id, status=JobStatus.RUNNING)
+    lane = slow_lane or SlowLane()
+    slow = set(slow_job_ids)
+    slow_semaphore = asyncio.Semaphore(lane.concurrency)
+    slow_tasks: List["asyncio.Future[List[int]]"] = []
+    speculator = Speculator(speculation, total - len(slow), db_session) if speculation else None
+
+    async def handle(job_id: int):
+        if job_id in slow:
+            # Slow jobs queue for their own pool without holding a worker
+            slow_tasks.append(
+                asyncio.ensure_future(_run_in_slow_lane(job_id, lane, slow_semaphore, db_session, update_queue))
+            )
+            return
+        await execute_job(job_id, db_session, timeout_sec, update_queue, speculator)
+
+    async with _monitoring(speculator):
+        await dispatch(job_ids, concurrency, handle)
+        await asyncio.gather(*slow_tasks)
+    await _finish_scan_run(scan_run_id, db_session, update_queue)
+
+
+@asynccontextmanager
+async def _monitoring(speculator: Optional[Speculator]):
+    """Run the speculator's monitor for the duration of the block."""
+    monitor = asyncio.ensure_future(speculator.monitor()) if speculator else None
+    try:
+        yield
+    finally:
+        if monitor:
+            monitor.cancel()
+            try:
+                await monitor
+            except asyncio.CancelledError:
+                pass
 
-    async def run_with_semaphore(job_id: int):
-        async with semaphore:
-            await execute_job(job_id, db_session, timeout_sec, update_queue)
-
-    tasks = [run_with_semaphore(job_id) for job_id in job_ids]
-    await asyncio.gather(*tasks)
 
+async def _finish_scan_run(scan_run_id: int, db_session: Session, update_queue: Optional[asyncio.Queue]):
+    """Record the final scan status and send SCAN_COMPLETE to API clients."""
     if update_queue:
-        all_jobs = db_repo.list_jobs_for_scan_run(db_session, scan_run_id)
         final_scan_status = JobStatus.COMPLETED
-        if any(j.status == JobStatus.FAILED for j in all_jobs):
+        if db_repo.count_jobs_for_scan_run(db_session, scan_run_id, JobStatus.FAILED):
             final_scan_status = JobStatus.FAILED
 
         db_repo.update_scan_run(db_session, scan_run_id, status=final_scan_status, completed_at=datetime.utcnow())
@@ -203,3 +583,244 @@ async def run_jobs_concurrently(
         }
         await update_queue.put(_create_ws_message("SCAN_COMPLETE", payload))
         await update_queue.put(None)
+
+
+def guided_chunk_size(
+    remaining: int, workers: int, min_chunk: int = 1, max_chunk: Optional[int] = None
+) -> int:
+    """Size of the next work unit under guided scheduling.
+
+    Like OpenMP's ``schedule(guided)`` each unit is the remaining work divided
+    by the number of workers, so units start large and shrink towards
+    ``min_chunk`` as the pool drains and the tail stays short.
+    """
+    size = max(min_chunk, ceil(remaining / max(workers, 1)))
+    if max_chunk:
+        size = min(size, max_chunk)
+    return max(1, min(size, remaining))
+
+
+# Hosts nmap scans in parallel (its host group); a unit of this many
+# targets takes about as long as a single one
+HOST_GROUP = 64
+
+
+def unit_timeout(timeout_sec: int, jobs: int, host_group: int = HOST_GROUP) -> int:
+    """Timeout of a work unit of ``jobs`` targets: ``timeout_sec`` per host group.
+
+    nmap scans a unit's targets ``host_group`` at a time, so the budget grows
+    with the number of groups, not of targets.  A large unit that stalls
+    therefore still times out and gets salvaged, retried or bisected.
+    """
+    return timeout_sec * max(1, ceil(jobs / max(host_group, 1)))
+
+
+# Batches the runner records while executing; they are never planned work
+UNIT_STRATEGIES = ("guided", "auto-bisect", "retry")
+
+
+class WorkUnit(NamedTuple):
+    """A set of jobs scanned by one nmap process, and where it came from."""
+
+    parent_batch_id: Optional[int]
+    job_ids: List[int]
+    strategy: str = "guided"
+    retry_of_batch_id: Optional[int] = None
+
+
+class GuidedScheduler:
+    """Hands out shrinking work units from pools of job ids.
+
+    ``pools`` pairs each planned Batch id with the ids of its jobs, as a
+    list or a ``range``.  Units
+    are sized from the total remaining work across all pools but never span
+    two pools, so every unit has a single parent Batch.  Units given to
+    :meth:`requeue` are handed out before any new ones.
+    """
+
+    def __init__(
+        self,
+        pools: Sequence[Tuple[Optional[int], Sequence[int]]],
+        workers: int,
+        min_chunk: int = 1,
+        max_chunk: Optional[int] = None,
+    ):
+        # Pools are only sliced, so ranges of ids work without being expanded
+        self._pools = [(batch_id, job_ids) for batch_id, job_ids in pools if len(job_ids)]
+        self._pool_index = 0
+        self._offset = 0
+        self._requeued: "deque[WorkUnit]" = deque()
+        self.remaining = sum(len(job_ids) for _, job_ids in self._pools)
+        self.workers = workers
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+
+    def requeue(self, unit: WorkUnit) -> None:
+        self._requeued.append(unit)
+
+    def next_unit(self) -> Optional[WorkUnit]:
+        """Return the next unit to scan, or ``None`` if there is none."""
+        if self._requeued:
+            return self._requeued.popleft()
+        while self._pool_index < len(self._pools):
+            batch_id, job_ids = self._pools[self._pool_index]
+            left = len(job_ids) - self._offset
+            if left <= 0:
+                self._pool_index += 1
+                self._offset = 0
+                continue
+            size = min(left, guided_chunk_size(self.remaining, self.workers, self.min_chunk, self.max_chunk))
+            unit = list(job_ids[self._offset : self._offset + size])
+            self._offset += size
+            self.remaining -= size
+            return WorkUnit(batch_id, unit)
+        return None
+
+
+def _record_unit(db_session: Session, scan_run_id: int, unit: WorkUnit) -> int:
+    """Store ``unit`` as a child Batch of its parent and return the Batch id."""
+    if unit.strategy == "guided":
+        name = f"run{scan_run_id}_guided_j{unit.job_ids[0]}"
+    elif unit.strategy == "retry":
+        name = f"run{scan_run_id}_retry_b{unit.retry_of_batch_id}"
+    else:
+        # A job is in one unit at a time and units only shrink, so this is unique
+        name = f"run{scan_run_id}_bisect_j{unit.job_ids[0]}_n{len(unit.job_ids)}"
+    jobs = [db_repo.get_job(db_session, job_id) for job_id in unit.job_ids]
+    batch = db_repo.create_batches(
+        db_session,
+        [
+            dict(
+                scan_run_id=scan_run_id,
+                name=name,
+                parent_batch_id=unit.parent_batch_id,
+                retry_of_batch_id=unit.retry_of_batch_id,
+                strategy=unit.strategy,
+                planned_chunk_size=len(unit.job_ids),
+            )
+        ],
+        [[job.target_id for job in jobs if job]],
+    )[0]
+    return batch.id
+
+
+async def run_jobs_guided(
+    scan_run_id: int,
+    pools: Sequence[Tuple[Optional[int], Sequence[int]]],
+    db_session: Session,
+    concurrency: int,
+    timeout_sec: int,
+    min_chunk: int = 1,
+    max_chunk: Optional[int] = None,
+    update_queue: Optional[asyncio.Queue] = None,
+    speculation: Optional[SpeculationPolicy] = None,
+    auto_bisect: bool = False,
+    slow_lane: Optional[SlowLane] = None,
+    slow_job_ids: Collection[int] = (),
+    unit_timeout_sec: Optional[int] = None,
+):
+    """Run jobs as guided work units, one nmap process per unit.
+
+    ``concurrency`` workers each take the next unit from a
+    :class:`GuidedScheduler` as soon as they are free.  Every unit is
+    recorded as a child Batch of the Batch it was cut from (strategy
+    ``"guided"``), so the split tree stays auditable.  ``speculation``
+    works as for :func:`run_jobs_concurrently`, per unit.  Each unit times
+    out after ``unit_timeout_sec`` or, by default, ``timeout_sec`` per nmap
+    host group (see :func:`unit_timeout`).
+
+    With ``auto_bisect``, the targets a unit did not finish before its
+    timeout are split in two child Batches (strategy ``"auto-bisect"``)
+    that go back to the front of the queue, down to single targets.  A
+    single target that times out is moved to ``slow_lane`` (a default
+    :class:`SlowLane` if not given) instead of failing the run.  Without
+    it, a timed-out unit that salvaged some hosts is retried for the rest
+    (strategy ``"retry"``, ``retry_of_batch_id`` set) while their jobs have
+    attempts left.  Jobs in ``slow_job_ids`` go to the slow lane from the
+    start.
+    """
+    slow = set(slow_job_ids)
+    scheduler = GuidedScheduler(pools, concurrency, min_chunk, max_chunk)
+    db_repo.update_scan_run(db_session, scan_run_id, status=JobStatus.RUNNING)
+    speculator = Speculator(speculation, scheduler.remaining - len(slow), db_session) if speculation else None
+    lane = slow_lane or SlowLane()
+    slow_semaphore = asyncio.Semaphore(lane.concurrency)
+    slow_tasks: List["asyncio.Future[List[int]]"] = []
+    in_flight = 0
+    changed = asyncio.Condition()
+
+    def run_slow(job_id: int) -> "asyncio.Future[List[int]]":
+        return asyncio.ensure_future(_run_in_slow_lane(job_id, lane, slow_semaphore, db_session, update_queue))
+
+    slow_tasks.extend(run_slow(job_id) for job_id in slow)
+
+    def bisect(batch_id: int, job_ids: List[int]) -> None:
+        if speculator:
+            # These jobs are not finished after all
+            speculator.finished_jobs -= len(job_ids)
+        for job_id in job_ids:
+            db_repo.update_job(db_session, job_id, status=JobStatus.PLANNED, reason="auto-bisect")
+        if len(job_ids) == 1:
+            slow_tasks.append(run_slow(job_ids[0]))
+            return
+        middle = len(job_ids) // 2
+        for half in (job_ids[:middle], job_ids[middle:]):
+            child = WorkUnit(batch_id, half, "auto-bisect")
+            if len(half) == 1:
+                _record_unit(db_session, scan_run_id, child)
+                slow_tasks.append(run_slow(half[0]))
+            else:
+                scheduler.requeue(child)
+
+    def retry(unit: WorkUnit, batch_id: int, job_ids: List[int]) -> None:
+        jobs = [db_repo.get_job(db_session, job_id) for job_id in job_ids]
+        retry_ids = [job.id for job in jobs if job and job.attempt < job.max_attempts]
+        if not retry_ids:
+            return
+        if speculator:
+            speculator.finished_jobs -= len(retry_ids)
+        for job in jobs:
+            if job and job.id in retry_ids:
+                db_repo.update_job(db_session, job.id, status=JobStatus.PLANNED, attempt=job.attempt + 1)
+        scheduler.requeue(WorkUnit(unit.parent_batch_id, retry_ids, "retry", retry_of_batch_id=batch_id))
+
+    async def worker():
+        nonlocal in_flight
+        while True:
+            unit = scheduler.next_unit()
+            if unit is None:
+                # A running unit may still requeue its unfinished targets
+                if not in_flight:
+                    return
+                async with changed:
+                    await changed.wait()
+                continue
+            if slow:
+                # Slow lane jobs were started up front
+                unit = unit._replace(job_ids=[job_id for job_id in unit.job_ids if job_id not in slow])
+                if not unit.job_ids:
+                    continue
+            in_flight += 1
+            try:
+                batch_id = _record_unit(db_session, scan_run_id, unit)
+                unfinished = await execute_chunk(
+                    unit.job_ids,
+                    db_session,
+                    unit_timeout_sec or unit_timeout(timeout_sec, len(unit.job_ids)),
+                    update_queue,
+                    speculator,
+                )
+                if auto_bisect and unfinished:
+                    bisect(batch_id, unfinished)
+                elif 0 < len(unfinished) < len(unit.job_ids):
+                    # Only worth retrying if the unit got somewhere before timing out
+                    retry(unit, batch_id, unfinished)
+            finally:
+                in_flight -= 1
+                async with changed:
+                    changed.notify_all()
+
+    async with _monitoring(speculator):
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        await asyncio.gather(*slow_tasks)
+    await _finish_scan_run(scan_run_id, db_session, update_queue)
@@ -4,6 +4,7 @@ import sys
 import os
 import tempfile
 import subprocess
+from datetime import datetime, timedelta
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -47,6 +48,47 @@ def client_with_db(db_session):
         yield client
     app.dependency_overrides.clear()
 
+@pytest.fixture(scope="function")
+def finished_job(db_session):
+    """Fixture to provide a helper that records a finished Job in its own ScanRun.
+
+    The Job took ``seconds``; a ``reason`` other than ``"completed"`` marks it
+    FAILED, and ``"timeout"`` also counts one timed-out attempt.
+    """
+    from src.db import repository as db_repo
+    from src.db.models import JobStatus
+
+    def create(target, seconds, options=None, reason="completed"):
+        run = db_repo.create_scan_run(db_session, status=JobStatus.COMPLETED, options=options)
+        start = datetime(2024, 1, 1)
+        return db_repo.create_job(
+            db_session,
+            scan_run_id=run.id,
+            target_id=target.id,
+            status=JobStatus.COMPLETED if reason == "completed" else JobStatus.FAILED,
+            reason=reason,
+            timeouts=1 if reason == "timeout" else 0,
+            started_at=start,
+            completed_at=start + timedelta(seconds=seconds),
+        )
+    return create
+
+@pytest.fixture(scope="session")
+def chunk_update():
+    """Fixture to provide a builder for CHUNK_UPDATE messages, with a ``seq`` once published."""
+    def build(chunk_id, status, seq=None):
+        message = {"type": "CHUNK_UPDATE", "payload": {"chunk_id": str(chunk_id), "status": status}}
+        return message if seq is None else dict(message, seq=seq)
+    return build
+
+@pytest.fixture(scope="session")
+def scan_complete():
+    """Fixture to provide a builder for the SCAN_COMPLETE message of scan 1."""
+    def build(seq=None):
+        message = {"type": "SCAN_COMPLETE", "payload": {"scan_id": "1", "status": "COMPLETED"}}
+        return message if seq is None else dict(message, seq=seq)
+    return build
+
 @pytest.fixture(scope="session")
 def cli_runner():
     """Fixture to provide a helper function for running CLI commands."""
@@ -59,3 +101,75 @@ def cli_runner():
             pytest.fail(f"CLI command {' '.join(cmd)} failed with exit code {result.returncode}")
         return result.stdout.strip()
     return run_cli
+
+FAKE_NMAP_SCRIPT = r'''
+import ipaddress
+import os
+import sys
+import time
+
+# Minimal nmap stand-in: every IP/CIDR/hostname argument is reported as an up
+# host with port 22 open.  CIDR blocks report their first FAKE_NMAP_RANGE_HOSTS
+# addresses only, addresses listed in FAKE_NMAP_DOWN are reported down and
+# FAKE_NMAP_HOST_DELAY seconds pass before each host is written.  The command
+# line is appended to FAKE_NMAP_ARGV_LOG when set.  The first invocation that
+# reaches an address in FAKE_NMAP_STALL hangs for a minute before writing it,
+# after the hosts ahead of it; later invocations do not.
+if os.environ.get("FAKE_NMAP_ARGV_LOG"):
+    with open(os.environ["FAKE_NMAP_ARGV_LOG"], "a") as log:
+        log.write(" ".join(sys.argv[1:]) + "\n")
+targets = [a for a in sys.argv[1:] if not a.startswith("-") and any(c in a for c in ".:/")]
+down = set(filter(None, os.environ.get("FAKE_NMAP_DOWN", "").split(",")))
+range_hosts = int(os.environ.get("FAKE_NMAP_RANGE_HOSTS", "2"))
+delay = float(os.environ.get("FAKE_NMAP_HOST_DELAY", "0"))
+stall = set(filter(None, os.environ.get("FAKE_NMAP_STALL", "").split(",")))
+
+addresses = []
+for t in targets:
+    if "/" in t:
+        net = ipaddress.ip_network(t, strict=False)
+        addresses.extend(str(a) for _, a in zip(range(range_hosts), net.hosts()))
+    else:
+        addresses.append(t)
+
+out = sys.stdout
+out.write('<?xml version="1.0"?>\n<nmaprun scanner="nmap" args="nmap %s" start="0" version="7.94">\n' % " ".join(sys.argv[1:]))
+out.flush()
+up = 0
+for addr in addresses:
+    time.sleep(delay)
+    if addr in stall:
+        try:
+            os.close(os.open(os.environ["FAKE_NMAP_STALL_MARKER"], os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            pass
+        else:
+            time.sleep(60)
+    state = "down" if addr in down else "up"
+    up += state == "up"
+    out.write('<host><status state="%s" reason="syn-ack"/><address addr="%s" addrtype="ipv4"/>' % (state, addr))
+    if state == "up":
+        out.write('<ports><port protocol="tcp" portid="22"><state state="open" reason="syn-ack"/>'
+                  '<service name="ssh"/></port></ports>')
+    out.write("</host>\n")
+    out.flush()
+out.write('<runstats><finished time="1" timestr="now" elapsed="0.01" exit="success"/>'
+          '<hosts up="%d" down="%d" total="%d"/></runstats></nmaprun>\n' % (up, len(addresses) - up, len(addresses)))
+'''
+
+
+@pytest.fixture
+def fake_nmap(tmp_path, monkeypatch):
+    """Put a scriptable fake ``nmap`` executable first on ``PATH``.
+
+    Behaviour is tuned through the ``FAKE_NMAP_*`` environment variables
+    documented in the script; use ``monkeypatch.setenv`` to set them.
+    """
+    bin_dir = tmp_path / "fake_bin"
+    bin_dir.mkdir()
+    script = bin_dir / "nmap"
+    script.write_text(f"#!{sys.executable}\n{FAKE_NMAP_SCRIPT}")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+    monkeypatch.setenv("FAKE_NMAP_STALL_MARKER", str(tmp_path / "stalled"))
+    return script
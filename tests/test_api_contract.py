@@ -100,7 +100,7 @@ async def test_websocket_rejects_nonexistent_scan(test_db_session):
 
 
 @pytest.mark.anyio
-@patch("web_api.app.scan_manager.get_scan_queue", return_value=None)
+@patch("web_api.app.scan_manager.get_scan_channel", return_value=None)
 async def test_websocket_rejects_completed_scan(mock_get_queue, test_db_session):
     async with AsyncTestClient(app) as client:
         with pytest.raises(Exception) as excinfo:
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from src.chunking import get_strategy, split_targets, subnet_of
+from src.ip_handler import IPV6_KEY_BASE, address_key
+
+ADDRESSES = [
+    "10.0.1.5",
+    "10.0.0.1",
+    "host.example",
+    "10.0.1.6",
+    "10.0.0.2",
+    "10.0.2.1",
+    "10.0.0.3",
+    "2001:db8::1",
+]
+KEYS = [address_key(a) for a in ADDRESSES]
+
+
+def _addresses(groups):
+    return [[ADDRESSES[i] for i in group] for group in groups]
+
+
+def test_address_keys_order_ipv4_before_ipv6():
+    assert address_key("10.0.0.1") == 0x0A000001
+    assert address_key("10.0.0.0/24") == 0x0A000000
+    assert address_key("2001:db8::1") > IPV6_KEY_BASE
+    assert address_key("host.example") is None
+    assert subnet_of(address_key("10.0.0.1")) == subnet_of(address_key("10.0.0.255"))
+    assert subnet_of(address_key("10.0.0.1")) != subnet_of(address_key("10.0.1.1"))
+
+
+def test_sequential_keeps_input_order():
+    groups = split_targets(KEYS, 3, "initial")
+    assert _addresses(groups) == [ADDRESSES[0:3], ADDRESSES[3:6], ADDRESSES[6:8]]
+
+
+def test_subnet_groups_whole_subnets():
+    groups = split_targets(KEYS, 3, "subnet")
+    assert _addresses(groups) == [
+        ["10.0.0.1", "10.0.0.2", "10.0.0.3"],
+        ["10.0.1.5", "10.0.1.6", "10.0.2.1"],
+        ["2001:db8::1"],
+        ["host.example"],
+    ]
+    # A subnet larger than the chunk size is cut
+    assert _addresses(split_targets(KEYS, 2, "subnet"))[:2] == [
+        ["10.0.0.1", "10.0.0.2"],
+        ["10.0.0.3"],
+    ]
+
+
+def test_interleave_spreads_subnets():
+    groups = split_targets(KEYS, 4, "interleave")
+    assert _addresses(groups) == [
+        ["10.0.0.1", "10.0.1.5", "10.0.2.1", "2001:db8::1"],
+        ["host.example", "10.0.0.2", "10.0.1.6", "10.0.0.3"],
+    ]
+
+
+def test_balanced_evens_out_batch_sizes():
+    groups = split_targets(KEYS, 3, "balanced")
+    assert [len(g) for g in groups] == [3, 3, 2]
+    assert sorted(i for g in groups for i in g) == list(range(len(KEYS)))
+    assert [len(g) for g in split_targets([1] * 10, 4, "balanced")] == [4, 3, 3]
+
+
+def test_unknown_strategy_and_bad_chunk_size():
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        get_strategy("nope")
+    with pytest.raises(ValueError):
+        split_targets(KEYS, 0)
+
+
+def test_split_cli_subnet_strategy(temp_db_path, cli_runner, tmp_path):
+    targets = tmp_path / "targets.txt"
+    targets.write_text("10.0.1.1\n10.0.0.1\n10.0.1.2\n10.0.0.2\n")
+    cli_runner("ingest", targets, db_path=temp_db_path)
+    run_id = int(cli_runner("plan", db_path=temp_db_path).split()[-1])
+
+    output = cli_runner("split", run_id, "--chunk-size", 2, "--strategy", "subnet", db_path=temp_db_path)
+    assert output == "Created 2 batches"
+
+    conn = sqlite3.connect(temp_db_path)
+    try:
+        rows = conn.execute(
+            "SELECT b.name, b.strategy, b.planned_chunk_size, t.address FROM batches b "
+            "JOIN batch_target_association a ON a.batch_id = b.id "
+            "JOIN targets t ON t.id = a.target_id ORDER BY b.id, t.id"
+        ).fetchall()
+    finally:
+        conn.close()
+    assert rows == [
+        (f"run{run_id}_batch1", "subnet", 2, "10.0.0.1"),
+        (f"run{run_id}_batch1", "subnet", 2, "10.0.0.2"),
+        (f"run{run_id}_batch2", "subnet", 2, "10.0.1.1"),
+        (f"run{run_id}_batch2", "subnet", 2, "10.0.1.2"),
+    ]
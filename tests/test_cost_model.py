@@ -0,0 +1,65 @@
+import pytest
+
+from src.chunking import split_targets
+from src.cost_model import estimate_costs, makespan, option_prior
+from src.db import repository as db_repo
+
+
+def test_option_prior_scales_with_expensive_options():
+    base = option_prior(None)
+    assert option_prior("-sV") == pytest.approx(base * 3)
+    assert option_prior("-sU -p-") > option_prior("-p-") > option_prior("-sV") > base
+    assert option_prior("-p 22,80") == option_prior("-p22,80") == pytest.approx(base * 0.1)
+    assert option_prior("-p 1-2000") == pytest.approx(base * 2)
+
+
+def test_estimate_costs_blends_history_with_prior(db_session, finished_job):
+    slow = db_repo.create_target(db_session, address="192.0.2.1")
+    fresh = db_repo.create_target(db_session, address="192.0.2.2")
+    block = db_repo.create_target(db_session, address="192.0.2.0/30")
+    prior = option_prior("-sV")
+    # Two runs without -sV, each 4x slower than the plain prior
+    finished_job(slow, option_prior(None) * 4)
+    finished_job(slow, option_prior(None) * 4)
+
+    # History of targets that are not being split is not read
+    finished_job(db_repo.create_target(db_session, address="192.0.2.9"), 1000)
+    assert [row[0] for row in db_repo.sum_job_durations(db_session, [slow.id, fresh.id])] == [slow.id]
+
+    costs = estimate_costs(
+        db_session, [(slow.id, slow.address), (fresh.id, fresh.address), (block.id, block.address)], "-sV"
+    )
+
+    # (4 + 4 + 1) / 3 = 3x the -sV prior; no history means the prior itself
+    assert costs[0] == pytest.approx(prior * 3)
+    assert costs[1] == pytest.approx(prior)
+    # A /30 range target covers two hosts
+    assert costs[2] == pytest.approx(prior * 2)
+
+
+def test_balanced_cost_lowers_makespan():
+    costs = [100.0, 90.0, 5.0, 5.0, 5.0, 5.0, 80.0, 5.0, 5.0, 5.0, 5.0, 5.0]
+    keys = list(range(len(costs)))
+
+    sequential = split_targets(keys, 4, "sequential")
+    packed = split_targets(keys, 4, "balanced-cost", costs=costs)
+
+    assert makespan(sequential, costs) == 200.0
+    # Each slow target gets its own batch, padded with the fast ones
+    assert makespan(packed, costs) == 115.0
+    assert all(len(group) <= 4 for group in packed)
+    assert sorted(i for group in packed for i in group) == keys
+
+
+def test_split_cli_balanced_cost(temp_db_path, cli_runner, tmp_path):
+    targets = tmp_path / "targets.txt"
+    targets.write_text("".join(f"192.0.2.{i}\n" for i in range(1, 7)))
+    cli_runner("ingest", targets, db_path=temp_db_path)
+    run_id = int(cli_runner("plan", "--options", "-sV", db_path=temp_db_path).split()[-1])
+
+    output = cli_runner(
+        "split", run_id, "--chunk-size", 4, "--strategy", "balanced-cost", db_path=temp_db_path
+    )
+
+    assert "Estimated slowest batch: 45s" in output
+    assert output.endswith("Created 2 batches")
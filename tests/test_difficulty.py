@@ -0,0 +1,77 @@
+import pytest
+
+from src.db import repository as db_repo
+from src.difficulty import difficult_targets, percentile
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 90) == 0.0
+    assert percentile([5.0], 50) == 5.0
+    values = [float(v) for v in range(1, 11)]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 100) == 10.0
+
+
+def test_difficult_targets_by_timeouts_and_duration(db_session, finished_job):
+    firewalled = db_repo.create_target(db_session, address="192.0.2.1")
+    slow = db_repo.create_target(db_session, address="192.0.2.2")
+    fine = db_repo.create_target(db_session, address="192.0.2.3")
+    for _ in range(2):
+        finished_job(firewalled, 60, reason="timeout")
+    finished_job(firewalled, 10)
+    for seconds in (100, 120, 200):
+        finished_job(slow, seconds)
+    finished_job(fine, 5)
+
+    found = difficult_targets(db_session)
+    assert [(d.address, d.jobs, d.timeouts) for d in found] == [("192.0.2.1", 3, 2)]
+    assert found[0].p50 == pytest.approx(60)
+    assert found[0].max_seconds == pytest.approx(60)
+
+    by_duration = difficult_targets(db_session, min_timeouts=None, min_p90=150)
+    assert [d.address for d in by_duration] == ["192.0.2.2"]
+    # Without criteria every target is listed, most timeouts then slowest first
+    assert [d.address for d in difficult_targets(db_session, min_timeouts=None)] == [
+        "192.0.2.1",
+        "192.0.2.2",
+        "192.0.2.3",
+    ]
+
+
+def test_difficult_targets_endpoint(client_with_db, db_session, finished_job):
+    target = db_repo.create_target(db_session, address="192.0.2.9")
+    for _ in range(3):
+        finished_job(target, 30, reason="timeout")
+
+    response = client_with_db.get("/api/targets/difficult", params={"min_timeouts": 3})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["total"] == 1
+    assert data["targets"][0]["address"] == "192.0.2.9"
+    assert data["targets"][0]["timeouts"] == 3
+    assert data["targets"][0]["p90_seconds"] == pytest.approx(30)
+
+    assert client_with_db.get("/api/targets/difficult", params={"min_timeouts": 4}).json()["data"]["total"] == 0
+    assert client_with_db.get("/api/targets/difficult", params={"limit": 0}).status_code == 400
+
+
+def test_run_routes_difficult_targets_to_slow_lane(
+    db_session, temp_db_path, cli_runner, fake_nmap, tmp_path, monkeypatch, finished_job
+):
+    argv_log = tmp_path / "argv.log"
+    monkeypatch.setenv("FAKE_NMAP_ARGV_LOG", str(argv_log))
+    targets = tmp_path / "targets.txt"
+    targets.write_text("192.0.2.1\n192.0.2.2\n")
+    cli_runner("ingest", targets, db_path=temp_db_path)
+    for _ in range(2):
+        finished_job(db_repo.get_target_by_address(db_session, "192.0.2.2"), 60, reason="timeout")
+    run_id = int(cli_runner("plan", db_path=temp_db_path).split()[-1])
+    cli_runner("split", run_id, "--chunk-size", 10, db_path=temp_db_path)
+
+    output = cli_runner("run", run_id, "--slow-timing", "-T1", db_path=temp_db_path)
+
+    assert "Routing 1 difficult targets to the slow lane." in output
+    invocations = {line.split()[-1]: line.split() for line in argv_log.read_text().splitlines()}
+    assert "-T1" in invocations["192.0.2.2"]
+    assert "-T1" not in invocations["192.0.2.1"]
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from src.db import repository as db_repo
+from src.db.models import JobStatus, TargetKind
+from src.dispatcher import Dispatcher, plan_scan_run
+from web_api.scan_manager import scan_manager
+
+
+def _events(session, run_id):
+    session.expire_all()
+    return [(e.type, json.loads(e.payload_json)["status"]) for e in db_repo.list_scan_events(session, run_id)]
+
+
+def test_api_queues_and_dispatcher_executes(client_with_db, db_session, fake_nmap, monkeypatch):
+    monkeypatch.setattr("web_api.app.USE_DISPATCHER", True)
+    monkeypatch.setattr("web_api.scan_manager.FOLLOW_INTERVAL", 0.05)
+
+    response = client_with_db.post("/api/scans", json={"targets": ["192.0.2.1", "192.0.2.2"], "nmap_options": "-F"})
+    run_id = response.json()["scan_id"]
+    assert response.status_code == 202 and not scan_manager.is_scan_active(run_id)
+    assert client_with_db.get(f"/api/scans/{run_id}/progress").json()["data"]["status"] == "QUEUED"
+    # A run planned by the CLI is never claimed, but is not queued either
+    planned = db_repo.create_scan_run(db_session, status=JobStatus.PLANNED)
+    assert client_with_db.get(f"/api/scans/{planned.id}/progress").json()["data"]["status"] == "PLANNING"
+
+    dispatcher = Dispatcher(db_session.get_bind(), poll_interval=0.05)
+    thread = threading.Thread(target=asyncio.run, args=(dispatcher.serve(once=True),))
+    with client_with_db.websocket_connect(f"/ws/scans/{run_id}") as websocket:
+        # The API worker follows the run's stored events
+        for _ in range(200):
+            if scan_manager.is_scan_active(run_id):
+                break
+            time.sleep(0.01)
+        assert scan_manager.is_scan_active(run_id)
+        thread.start()
+        messages = []
+        while not messages or messages[-1]["type"] != "SCAN_COMPLETE":
+            messages.append(websocket.receive_json())
+    thread.join(20)
+    assert not thread.is_alive()
+
+    seqs = [m["seq"] for m in messages]
+    assert seqs == sorted(set(seqs))
+    finals = {m["payload"]["chunk_id"]: m["payload"]["status"] for m in messages[:-1]}
+    assert list(finals.values()) == ["COMPLETED", "COMPLETED"]
+    assert messages[-1]["payload"]["status"] == "COMPLETED"
+    assert not scan_manager.is_scan_active(run_id)
+
+    db_session.expire_all()
+    assert db_repo.get_scan_run(db_session, int(run_id)).claimed_by == dispatcher.owner
+    data = client_with_db.get(f"/api/scans/{run_id}").json()["data"]
+    assert data["status"] == "COMPLETED"
+    assert set(data["results"]["hosts"]) == {"192.0.2.1", "192.0.2.2"}
+
+
+def test_dispatcher_fails_abandoned_and_unplannable_runs(db_session):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    abandoned = db_repo.create_scan_run(
+        db_session, status=JobStatus.RUNNING, claimed_by=f"{socket.gethostname()}:{exited.pid}"
+    )
+    elsewhere = db_repo.create_scan_run(db_session, status=JobStatus.RUNNING, claimed_by="elsewhere:1")
+    unplannable = db_repo.create_scan_run(
+        db_session, status=JobStatus.PLANNED, request_json=json.dumps({"targets": ["10.0.0.5-10.0.0.1"]})
+    )
+    # Run by a CLI `netscan plan`, not submitted through the API
+    planned = db_repo.create_scan_run(db_session, status=JobStatus.PLANNED)
+
+    dispatcher = Dispatcher(db_session.get_bind())
+    asyncio.run(dispatcher.serve(once=True))
+
+    db_session.expire_all()
+    assert db_repo.get_scan_run(db_session, abandoned.id).status == JobStatus.FAILED
+    assert db_repo.get_scan_run(db_session, abandoned.id).notes.startswith("Abandoned")
+    assert _events(db_session, abandoned.id) == [("SCAN_COMPLETE", "FAILED")]
+    assert db_repo.get_scan_run(db_session, elsewhere.id).status == JobStatus.RUNNING
+
+    run = db_repo.get_scan_run(db_session, unplannable.id)
+    assert (run.status, run.claimed_by) == (JobStatus.FAILED, dispatcher.owner)
+    assert run.notes.startswith("Planning failed")
+    assert _events(db_session, unplannable.id) == [("SCAN_COMPLETE", "FAILED")]
+
+    assert db_repo.get_scan_run(db_session, planned.id).claimed_by is None
+    assert not db_repo.claim_scan_run(db_session, unplannable.id, "other:1")
+
+
+def test_planned_target_kinds(db_session):
+    request = {"targets": ["192.0.2.0/30", "192.0.2.9", "files/host.example"], "range_targets": True}
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PLANNED, request_json=json.dumps(request))
+
+    plan_scan_run(db_session, run.id)
+
+    kinds = {t.address: t.kind for t in db_repo.list_targets_for_scan_run(db_session, run.id)}
+    assert kinds == {
+        "192.0.2.0/30": TargetKind.RANGE,
+        "192.0.2.9": TargetKind.HOST,
+        "files/host.example": TargetKind.HOST,
+    }
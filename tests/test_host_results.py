@@ -0,0 +1,136 @@
+import json
+
+from src import observations
+from src.db import repository as db_repo
+from src.db.models import JobStatus, TargetKind
+
+
+def _host(state="up", open_ports=()):
+    host = {"status": {"state": state, "reason": "syn-ack"}}
+    if open_ports:
+        host["tcp"] = {str(p): {"state": "open", "name": "svc"} for p in open_ports}
+    return host
+
+
+def _seed(session):
+    """A run with four host jobs, one range job and one job still pending."""
+    run = db_repo.create_scan_run(session, status=JobStatus.RUNNING)
+    hosts = {
+        "192.0.2.1": _host(open_ports=(22,)),
+        "192.0.2.2": _host(open_ports=(80, 443)),
+        "192.0.2.3": _host("down"),
+        "198.51.100.1": _host(open_ports=(22, 80)),
+    }
+    for address, host in hosts.items():
+        target = db_repo.create_target(session, address=address)
+        job = db_repo.create_job(session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+        db_repo.create_result(session, job_id=job.id, summary_json=json.dumps({address: host}))
+        observations.record_observations(session, run.id, job.id, {address: host})
+
+    target = db_repo.create_target(session, address="203.0.113.0/30", kind=TargetKind.RANGE)
+    job = db_repo.create_job(session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+    summary = {"203.0.113.1": _host(open_ports=(22,)), "203.0.113.2": _host()}
+    db_repo.create_result(session, job_id=job.id, summary_json=json.dumps(summary))
+    observations.record_observations(session, run.id, job.id, summary)
+
+    target = db_repo.create_target(session, address="192.0.2.9")
+    db_repo.create_job(session, scan_run_id=run.id, target_id=target.id, status=JobStatus.PENDING)
+    return run.id
+
+
+def _pages(client, run_id, **params):
+    pages, cursor = [], "0"
+    while cursor is not None:
+        data = client.get(f"/api/scans/{run_id}/hosts", params={**params, "cursor": cursor}).json()["data"]
+        pages.append([h["address"] for h in data["hosts"]])
+        cursor = data["next_cursor"]
+    return pages
+
+
+def test_host_pages_follow_the_cursor(client_with_db, db_session):
+    run_id = _seed(db_session)
+
+    pages = _pages(client_with_db, run_id, limit=2)
+    assert pages == [
+        ["192.0.2.1", "192.0.2.2"],
+        ["192.0.2.3", "198.51.100.1"],
+        ["203.0.113.1", "203.0.113.2"],
+        ["192.0.2.9"],
+    ]
+
+    # Same hosts, same entries as the full status document
+    full = client_with_db.get(f"/api/scans/{run_id}").json()["data"]["results"]["hosts"]
+    data = client_with_db.get(f"/api/scans/{run_id}/hosts", params={"limit": 100}).json()["data"]
+    assert data["next_cursor"] is None
+    assert {h["address"]: {f: h[f] for f in ("status", "ports", "reason")} for h in data["hosts"]} == full
+    assert full["192.0.2.9"] == {"status": "down", "ports": [], "reason": "pending"}
+
+
+def test_host_pages_split_a_range_job(client_with_db, db_session):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.COMPLETED)
+    target = db_repo.create_target(db_session, address="203.0.113.0/29", kind=TargetKind.RANGE)
+    job = db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+    # nmap's report order is not address order
+    summary = {f"203.0.113.{i}": _host() for i in (5, 1, 3, 2, 4)}
+    db_repo.create_result(db_session, job_id=job.id, summary_json=json.dumps(summary))
+    target = db_repo.create_target(db_session, address="192.0.2.1")
+    job = db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+    db_repo.create_result(db_session, job_id=job.id, summary_json=json.dumps({"192.0.2.1": _host()}))
+
+    assert _pages(client_with_db, run.id, limit=2) == [
+        ["203.0.113.1", "203.0.113.2"],
+        ["203.0.113.3", "203.0.113.4"],
+        ["203.0.113.5", "192.0.2.1"],
+    ]
+
+    data = client_with_db.get(f"/api/scans/{run.id}/hosts", params={"limit": 2}).json()["data"]
+    assert data["next_cursor"] == "1:203.0.113.2"
+    lines = client_with_db.get(
+        f"/api/scans/{run.id}/hosts.ndjson", params={"cursor": data["next_cursor"]}
+    ).text.splitlines()
+    assert [json.loads(line)["address"] for line in lines] == ["203.0.113.3", "203.0.113.4", "203.0.113.5", "192.0.2.1"]
+
+    for cursor in ("x", "-1", "1:"):
+        assert client_with_db.get(f"/api/scans/{run.id}/hosts", params={"cursor": cursor}).status_code == 400
+
+
+def test_host_filters_and_fields(client_with_db, db_session):
+    run_id = _seed(db_session)
+
+    def addresses(**params):
+        return [a for page in _pages(client_with_db, run_id, limit=1, **params) for a in page]
+
+    assert addresses(status="up", open_ports="true", port=22) == ["192.0.2.1", "198.51.100.1", "203.0.113.1"]
+    assert addresses(status="down") == ["192.0.2.3", "192.0.2.9"]
+    assert addresses(open_ports="false", subnet="203.0.113.0/24") == ["203.0.113.2"]
+    assert addresses(port=443) == ["192.0.2.2"]
+
+    data = client_with_db.get(
+        f"/api/scans/{run_id}/hosts", params={"port": 80, "fields": "ports"}
+    ).json()["data"]
+    assert data["hosts"] == [
+        {"address": "192.0.2.2", "job_id": 2, "ports": [80, 443]},
+        {"address": "198.51.100.1", "job_id": 4, "ports": [22, 80]},
+    ]
+
+    for params in ({"fields": "ports,bogus"}, {"subnet": "300.0.0.0/8"}, {"limit": 0}):
+        assert client_with_db.get(f"/api/scans/{run_id}/hosts", params=params).status_code == 400
+    assert client_with_db.get("/api/scans/999/hosts").status_code == 404
+
+
+def test_hosts_ndjson_and_progress(client_with_db, db_session):
+    run_id = _seed(db_session)
+
+    response = client_with_db.get(f"/api/scans/{run_id}/hosts.ndjson", params={"status": "up", "fields": "status"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["address"] for line in lines] == [
+        "192.0.2.1", "192.0.2.2", "198.51.100.1", "203.0.113.1", "203.0.113.2",
+    ]
+    assert {tuple(line) for line in lines} == {("address", "job_id", "status")}
+
+    data = client_with_db.get(f"/api/scans/{run_id}/progress").json()["data"]
+    assert "results" not in data
+    assert data["status"] == "RUNNING"
+    assert data["progress"]["total_chunks"] == 6
+    assert (data["progress"]["completed_chunks"], data["progress"]["hosts_up"]) == (5, 5)
@@ -0,0 +1,96 @@
+import gzip
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+class TestIngestCLI(unittest.TestCase):
+    def setUp(self):
+        tmp_db = tempfile.NamedTemporaryFile(delete=False)
+        tmp_db.close()
+        self.db_path = tmp_db.name
+        self.files = [self.db_path]
+
+    def tearDown(self):
+        for path in self.files:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def write_file(self, content):
+        tmp = tempfile.NamedTemporaryFile(delete=False, mode="w", suffix=".txt")
+        tmp.write(content)
+        tmp.close()
+        self.files.append(tmp.name)
+        return tmp.name
+
+    def run_cli(self, *args, stdin=None):
+        cmd = [sys.executable, "-m", "src.cli.main", "--db-path", self.db_path, *map(str, args)]
+        result = subprocess.run(cmd, capture_output=True, input=stdin)
+        self.assertEqual(result.returncode, 0, msg=f"Command {' '.join(cmd)} failed with {result.stderr}")
+        return result.stdout.decode().strip()
+
+    def test_gzip_and_stdin_input_with_duplicates(self):
+        lines = "".join(f"10.0.{i // 256}.{i % 256}\n" for i in range(1000))
+        gz_path = self.write_file("") + ".gz"
+        self.files.append(gz_path)
+        with gzip.open(gz_path, "wt") as f:
+            f.write(lines)
+
+        output = self.run_cli("ingest", gz_path, "--batch-size", 300)
+        self.assertIn("Ingested 1000 new targets. Skipped 0 duplicates.", output)
+
+        # Existing addresses are skipped by the unique index, new ones inserted
+        output = self.run_cli("ingest", "-", stdin=(lines + "10.1.0.1\n10.1.0.1\n").encode())
+        self.assertIn("Ingested 1 new targets. Skipped 1001 duplicates.", output)
+        addresses = self.addresses()
+        self.assertEqual(len(addresses), 1001)
+        self.assertEqual(addresses[:2], ["10.0.0.0", "10.0.0.1"])
+
+    def addresses(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return [row[0] for row in conn.execute("SELECT address FROM targets ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_overlapping_ranges_without_exclusions_are_streamed(self):
+        input_file = self.write_file("192.0.2.8-192.0.2.10\n192.0.2.0/29\n192.0.2.9\nhost.example\n")
+
+        output = self.run_cli("ingest", input_file)
+
+        # Written in input order; the unique index drops the repeated address
+        self.assertIn("Ingested 10 new targets. Skipped 1 duplicates.", output)
+        self.assertEqual(
+            self.addresses(),
+            ["192.0.2.8", "192.0.2.9", "192.0.2.10"] + [f"192.0.2.{i}" for i in range(1, 7)] + ["host.example"],
+        )
+
+    def test_overlapping_ranges_and_exclusions(self):
+        input_file = self.write_file("192.0.2.0/29\n192.0.2.4-192.0.2.6\nkeep.example\ndrop.example\n")
+        exclude_file = self.write_file("# out of scope\ndrop.example\n192.0.2.0/30\n")
+
+        output = self.run_cli("ingest", input_file, "--exclude", "192.0.2.5", "--exclude-file", exclude_file)
+
+        # /29 hosts .1-.6 merged with .4-.6, minus the whole /30 and .5
+        self.assertIn("Ingested 3 new targets", output)
+        self.assertEqual(self.addresses(), ["192.0.2.4", "192.0.2.6", "keep.example"])
+
+    def test_range_targets_are_not_expanded(self):
+        input_file = self.write_file("10.0.0.0/23\n10.0.1.0/24\nhost.example\n")
+
+        output = self.run_cli("ingest", input_file, "--range-targets", "--exclude", "10.0.1.0/25")
+
+        self.assertIn("Ingested 3 new targets", output)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("SELECT address, kind FROM targets ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(rows, [("10.0.0.0/24", "RANGE"), ("10.0.1.128/25", "RANGE"), ("host.example", "HOST")])
+
+
+if __name__ == "__main__":
+    unittest.main()
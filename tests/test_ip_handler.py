@@ -1,12 +1,23 @@
 import os
 import sys
 import unittest
+from ipaddress import ip_address
 
 # Allow importing from the project root
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, PROJECT_ROOT)
 
-from src.ip_handler import expand_targets, chunk_ips
+from src.ip_handler import (
+    AddressRange,
+    IntervalSet,
+    chunk_ips,
+    expand_targets,
+    is_range_spec,
+    iter_range_specs,
+    iter_targets,
+    parse_targets,
+    plan_targets,
+)
 
 
 class TestExpandTargets(unittest.TestCase):
@@ -35,6 +46,133 @@ class TestExpandTargets(unittest.TestCase):
             expand_targets(lines, max_expand=100)
 
 
+class TestParseTargets(unittest.TestCase):
+    def test_matches_expand_targets(self):
+        lines = ["# c", "192.0.2.0/30", "host.example", "192.0.2.9-192.0.2.11", "2001:db8::/126"]
+        targets = parse_targets(lines)
+        self.assertEqual(list(targets), expand_targets(lines, max_expand=10))
+        self.assertEqual(len(targets), 2 + 1 + 3 + 3)
+
+    def test_slash8_is_counted_and_indexed_without_expansion(self):
+        targets = parse_targets(["10.0.0.0/8"])
+        self.assertEqual(targets.size, 2**24 - 2)
+        self.assertEqual(len(targets.items), 1)
+        self.assertEqual(targets[0], "10.0.0.1")
+        self.assertEqual(targets[-1], "10.255.255.254")
+        self.assertEqual(targets[65535], "10.1.0.0")
+
+    def test_slicing_spans_items(self):
+        targets = parse_targets(["192.0.2.0/30", "host.example", "198.51.100.1-198.51.100.4"])
+        self.assertEqual(list(targets[1:5]), ["192.0.2.2", "host.example", "198.51.100.1", "198.51.100.2"])
+        self.assertEqual(list(targets.iter_from(4)), ["198.51.100.2", "198.51.100.3", "198.51.100.4"])
+        self.assertEqual(targets[10:].size, 0)
+
+    def test_chunks_cover_all_targets(self):
+        targets = parse_targets(["10.0.0.0/16"])
+        chunks = list(targets.chunks(1000))
+        self.assertEqual(len(chunks), 66)
+        self.assertEqual(sum(c.size for c in chunks), targets.size)
+        self.assertEqual(chunks[1][0], "10.0.3.233")
+
+    def test_huge_ipv6_range_size(self):
+        targets = parse_targets(["2001:db8::/64"])
+        self.assertEqual(targets.size, 2**64 - 1)
+        self.assertEqual(targets[0], "2001:db8::1")
+
+    def test_max_expand_none_disables_guard(self):
+        self.assertEqual(parse_targets(["10.0.0.0/24"]).size, 254)
+        with self.assertRaises(ValueError):
+            parse_targets(["10.0.0.0/24"], max_expand=100)
+
+    def test_iter_targets_is_lazy(self):
+        gen = iter_targets(["10.0.0.0/8"])
+        self.assertEqual(next(gen), "10.0.0.1")
+        self.assertEqual(next(gen), "10.0.0.2")
+
+    def test_iter_targets_normalises_ipv6_literals(self):
+        self.assertEqual(list(iter_targets(["2001:DB8:0::1", "host.example"])), ["2001:db8::1", "host.example"])
+
+
+def _set(*specs):
+    return IntervalSet(item for item in parse_targets(specs).items if isinstance(item, AddressRange))
+
+
+class TestIntervalSet(unittest.TestCase):
+    def test_coalesces_overlapping_and_adjacent_ranges(self):
+        s = _set("10.0.0.0-10.0.0.10", "10.0.0.5-10.0.0.20", "10.0.0.21-10.0.0.30", "10.0.1.0-10.0.1.0")
+        self.assertEqual(
+            [(r.first, r.last) for r in s.ranges()],
+            [(int(ip_address("10.0.0.0")), int(ip_address("10.0.0.30"))), (int(ip_address("10.0.1.0")),) * 2],
+        )
+        self.assertEqual(s.size, 32)
+
+    def test_union_intersection_difference(self):
+        a = _set("10.0.0.0-10.0.0.99")
+        b = _set("10.0.0.50-10.0.0.149", "2001:db8::1-2001:db8::4")
+        self.assertEqual((a | b).size, 150 + 4)
+        self.assertEqual(list(a & b)[:2], ["10.0.0.50", "10.0.0.51"])
+        self.assertEqual((a & b).size, 50)
+        diff = a - _set("10.0.0.10-10.0.0.19", "10.0.0.0-10.0.0.0", "10.0.0.99-10.0.0.200")
+        self.assertEqual(diff.size, 100 - 10 - 1 - 1)
+        self.assertNotIn("10.0.0.15", diff)
+        self.assertIn("10.0.0.20", diff)
+        self.assertEqual((b - b).size, 0)
+        self.assertFalse(b - b)
+
+    def test_versions_are_kept_apart(self):
+        s = _set("0.0.0.1-0.0.0.5", "::1-::5")
+        self.assertEqual(s.size, 10)
+        self.assertIn("::3", s)
+        self.assertIn("0.0.0.3", s)
+        self.assertEqual((s - _set("::1-::5")).size, 5)
+
+
+class TestPlanTargets(unittest.TestCase):
+    def test_overlapping_inputs_are_deduplicated(self):
+        targets = plan_targets(["10.0.0.0/16", "10.0.5.0/24", "10.0.5.7", "Host.example", "host.example"])
+        self.assertEqual(targets.size, 65534 + 1)
+        self.assertEqual(targets[-1], "Host.example")
+
+    def test_exclusions_apply_before_expansion(self):
+        targets = plan_targets(
+            ["10.0.0.0/8", "keep.example", "drop.example"],
+            exclude=["10.0.0.0/9", "10.200.0.1", "DROP.example", "# comment"],
+        )
+        # Upper half of the /8 minus its broadcast address and one excluded host
+        self.assertEqual(targets.size, 2**23 - 2 + 1)
+        self.assertEqual(targets[0], "10.128.0.0")
+        self.assertEqual(list(targets[targets.size - 2 :]), ["10.255.255.254", "keep.example"])
+
+    def test_max_expand_applies_to_targets_only(self):
+        self.assertEqual(plan_targets(["192.0.2.0/30"], exclude=["0.0.0.0/0"], max_expand=4).size, 0)
+        with self.assertRaises(ValueError):
+            plan_targets(["10.0.0.0/24"], max_expand=100)
+
+
+class TestIterRangeSpecs(unittest.TestCase):
+    def test_ranges_become_cidr_blocks(self):
+        targets = plan_targets(
+            ["10.0.0.0/23", "10.0.5.3", "192.0.2.1-192.0.2.6", "host.example"], hosts_only=False
+        )
+        self.assertEqual(
+            list(iter_range_specs(targets)),
+            ["10.0.0.0/24", "10.0.1.0/24", "10.0.5.3", "192.0.2.1", "192.0.2.2/31", "192.0.2.4/31",
+             "192.0.2.6", "host.example"],
+        )
+
+    def test_block_prefix_caps_block_size(self):
+        targets = plan_targets(["10.0.0.0/24", "2001:db8::/119"], hosts_only=False)
+        specs = list(iter_range_specs(targets, block_prefix=25))
+        self.assertEqual(specs, ["10.0.0.0/25", "10.0.0.128/25", "2001:db8::/121", "2001:db8::80/121",
+                                 "2001:db8::100/121", "2001:db8::180/121"])
+
+    def test_is_range_spec(self):
+        for spec in ("10.0.0.0/24", "10.0.0.1-10.0.0.20", "2001:db8::1-2001:db8::9"):
+            self.assertTrue(is_range_spec(spec), spec)
+        for spec in ("10.0.0.1", "2001:db8::1", "host.example", "my-host.example", "not/a-network"):
+            self.assertFalse(is_range_spec(spec), spec)
+
+
 class TestChunkIPs(unittest.TestCase):
     def test_chunk_ips_basic_even_division(self):
         ips = ["1.1.1.1", "2.2.2.2", "3.3.3.3", "4.4.4.4"]
@@ -69,6 +207,13 @@ class TestChunkIPs(unittest.TestCase):
 
     def test_chunk_ips_empty_ip_list(self):
         self.assertEqual(chunk_ips([], chunk_size=2), [])
+        self.assertEqual(chunk_ips(iter([])), [])
+        self.assertEqual(chunk_ips([], custom_ranges=[["192.0.2.1"]]), [])
+        self.assertEqual(chunk_ips(["192.0.2.9"], custom_ranges=[["192.0.2.1"]]), [["192.0.2.1"]])
+
+    def test_chunk_ips_consumes_iterators(self):
+        chunks = chunk_ips(iter_targets(["192.0.2.0/29"]), chunk_size=4)
+        self.assertEqual(chunks, [["192.0.2.1", "192.0.2.2", "192.0.2.3", "192.0.2.4"], ["192.0.2.5", "192.0.2.6"]])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from src import reporting
+from src.db import repository as db_repo
+from src.db import session as db_session_module
+from src.db.migrations import INDEXES, MIGRATIONS, migrate
+from src.db.models import JobStatus, TargetKind
+
+# Schema written by the first release, before any migration existed
+OLD_SCHEMA = """
+CREATE TABLE targets (
+    id INTEGER NOT NULL, address VARCHAR NOT NULL, description VARCHAR,
+    created_at DATETIME NOT NULL, tags VARCHAR, per_target_options VARCHAR,
+    PRIMARY KEY (id), UNIQUE (address)
+);
+CREATE TABLE scan_runs (
+    id INTEGER NOT NULL, started_at DATETIME NOT NULL, completed_at DATETIME,
+    status VARCHAR(9) NOT NULL, options VARCHAR, notes TEXT, PRIMARY KEY (id)
+);
+CREATE TABLE batches (
+    id INTEGER NOT NULL, scan_run_id INTEGER NOT NULL, name VARCHAR NOT NULL,
+    created_at DATETIME NOT NULL, parent_batch_id INTEGER, strategy VARCHAR,
+    priority INTEGER NOT NULL, retry_of_batch_id INTEGER, planned_chunk_size INTEGER,
+    PRIMARY KEY (id), UNIQUE (name)
+);
+CREATE TABLE jobs (
+    id INTEGER NOT NULL, scan_run_id INTEGER NOT NULL, target_id INTEGER NOT NULL,
+    status VARCHAR(9) NOT NULL, started_at DATETIME, completed_at DATETIME, pid INTEGER,
+    exit_code INTEGER, timeout_sec INTEGER, nmap_options VARCHAR, attempt INTEGER NOT NULL,
+    max_attempts INTEGER NOT NULL, reason VARCHAR, PRIMARY KEY (id)
+);
+CREATE TABLE batch_target_association (
+    batch_id INTEGER NOT NULL, target_id INTEGER NOT NULL, PRIMARY KEY (batch_id, target_id)
+);
+CREATE TABLE results (
+    id INTEGER NOT NULL, job_id INTEGER NOT NULL, stdout TEXT, stderr TEXT,
+    summary_json TEXT, created_at DATETIME NOT NULL, PRIMARY KEY (id)
+);
+INSERT INTO targets (id, address, created_at) VALUES (1, '192.0.2.1', '2024-01-01 00:00:00');
+INSERT INTO scan_runs (id, started_at, status) VALUES (1, '2024-01-01 00:00:00', 'COMPLETED');
+INSERT INTO jobs (id, scan_run_id, target_id, status, attempt, max_attempts)
+    VALUES (1, 1, 1, 'COMPLETED', 1, 3);
+INSERT INTO jobs (id, scan_run_id, target_id, status, attempt, max_attempts, reason)
+    VALUES (2, 1, 1, 'FAILED', 1, 3, 'timeout');
+INSERT INTO results (id, job_id, stdout, created_at) VALUES (1, 1, '<nmaprun/>', '2024-01-01 00:00:00');
+"""
+
+
+@pytest.fixture
+def old_db_session(temp_db_path):
+    conn = sqlite3.connect(temp_db_path)
+    conn.executescript(OLD_SCHEMA)
+    conn.close()
+    db_session_module._engine = None
+    db_session_module.init_engine(temp_db_path)
+    session = db_session_module.get_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _indexes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+    finally:
+        conn.close()
+
+
+def test_old_database_is_migrated(old_db_session, temp_db_path):
+    conn = sqlite3.connect(temp_db_path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'dns_cache'").fetchone()
+    finally:
+        conn.close()
+    assert _indexes(temp_db_path) == set(INDEXES)
+
+    target = db_repo.get_target(old_db_session, 1)
+    assert (target.kind, target.resolved_address) == (TargetKind.HOST, None)
+    assert db_repo.get_latest_result_for_job(old_db_session, 1).partial is False
+    assert db_repo.get_scan_run(old_db_session, 1).request_json is None
+    assert [db_repo.get_job(old_db_session, i).timeouts for i in (1, 2)] == [0, 1]
+
+    # Writing through the current models works against the migrated schema
+    db_repo.create_result(old_db_session, job_id=1, stdout="<nmaprun/>", partial=True)
+    assert db_repo.get_latest_result_for_job(old_db_session, 1).partial is True
+    assert migrate(db_session_module._engine) == MIGRATIONS[-1][0]
+
+
+def test_new_database_matches_model_indexes(db_session, temp_db_path):
+    assert _indexes(temp_db_path) == set(INDEXES)
+
+
+def _query_plans(session, func):
+    """Run ``func`` and return the EXPLAIN QUERY PLAN of each SELECT it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    connection = session.connection()
+    return [
+        " / ".join(row[3] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+        for statement, parameters in statements
+    ]
+
+
+@pytest.mark.parametrize(
+    "call, index",
+    [
+        (lambda s, run, job: db_repo.count_jobs_for_scan_run(s, run.id, JobStatus.FAILED), "ix_jobs_scan_run_status"),
+        (lambda s, run, job: db_repo.count_jobs_for_scan_run(s, run.id), "ix_jobs_scan_run_id"),
+        (lambda s, run, job: list(db_repo.iter_job_ids(s, run.id)), "ix_jobs_scan_run_status"),
+        (lambda s, run, job: db_repo.list_jobs_for_scan_run(s, run.id), "ix_jobs_scan_run_id"),
+        (lambda s, run, job: list(db_repo.iter_job_summaries(s, run.id, after=1)), "ix_jobs_scan_run_id (scan_run_id=? AND rowid>?)"),
+        (
+            lambda s, run, job: list(db_repo.iter_job_summaries(s, run.id, host_state="up", open_port=22)),
+            "ix_port_observations_job_state_port",
+        ),
+        (lambda s, run, job: db_repo.get_latest_result_for_job(s, job.id), "ix_results_job_id"),
+        (lambda s, run, job: db_repo.list_scan_events(s, run.id, since=10), "ix_scan_events_run_seq"),
+        (lambda s, run, job: db_repo.list_batches_for_run(s, run.id), "ix_batches_scan_run_id"),
+        (lambda s, run, job: db_repo.list_job_ids_for_targets(s, run.id, [job.target_id]), "ix_jobs_target_id"),
+        (lambda s, run, job: db_repo.sum_job_durations(s, [job.target_id]), "ix_jobs_target_id"),
+        (lambda s, run, job: db_repo.get_target(s, job.target_id).batches, "ix_batch_target_association_target_id"),
+        (lambda s, run, job: reporting.summarise_runs(s), "scan_run_stats USING INTEGER PRIMARY KEY"),
+        (lambda s, run, job: reporting.get_slowest_jobs(s), "ix_jobs_elapsed"),
+    ],
+)
+def test_hot_queries_use_indexes(db_session, call, index):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.RUNNING)
+    target = db_repo.create_target(db_session, address="192.0.2.1")
+    job = db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, status=JobStatus.PLANNED)
+    db_repo.create_result(db_session, job_id=job.id)
+    db_session.expire_all()
+
+    plans = _query_plans(db_session, lambda: call(db_session, run, job))
+    assert any(index in plan for plan in plans), plans
+    steps = [step for plan in plans for step in plan.split(" / ")]
+    assert not {"SCAN jobs", "SCAN results"} & set(steps), plans
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+# Allow importing from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import nmap_xml
+from src.runner import _parse_nmap_xml_from_string
+
+SAMPLE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<nmaprun scanner="nmap" args="nmap -oX - -sS -sU -O -sV 192.0.2.0/30" start="1700000000" version="7.94">
+<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>
+<scaninfo type="udp" protocol="udp" numservices="100" services="7,53"/>
+<host starttime="1700000001" endtime="1700000009">
+<status state="up" reason="arp-response" reason_ttl="0"/>
+<address addr="00:11:22:33:44:55" addrtype="mac" vendor="Acme"/>
+<address addr="192.0.2.1" addrtype="ipv4"/>
+<address addr="2001:db8::1" addrtype="ipv6"/>
+<hostnames>
+<hostname name="gw.example" type="PTR"/>
+<hostname name="gateway" type="user"/>
+</hostnames>
+<ports>
+<extraports state="closed" count="995"><extrareasons reason="resets" count="995"/></extraports>
+<port protocol="tcp" portid="22"><state state="open" reason="syn-ack" reason_ttl="64"/><service name="ssh" product="OpenSSH" version="7.4" extrainfo="protocol 2.0" method="probed" conf="10"><cpe>cpe:/a:openbsd:openssh:7.4</cpe></service><script id="ssh-hostkey" output="2048 aa:bb"/></port>
+<port protocol="tcp" portid="25"><state state="closed" reason="reset" reason_ttl="64"/><service name="smtp" method="table" conf="3"/></port>
+<port protocol="tcp" portid="443"><state state="filtered" reason="no-response" reason_ttl="0"/></port>
+<port protocol="udp" portid="53"><state state="open" reason="udp-response" reason_ttl="64"/><service name="domain" product="dnsmasq" version="2.80" method="probed" conf="10"/></port>
+<port protocol="sctp" portid="2905"><state state="open" reason="init-ack" reason_ttl="64"/></port>
+</ports>
+<os>
+<portused state="open" proto="tcp" portid="22"/>
+<osmatch name="Linux 4.15 - 5.8" accuracy="96" line="67">
+<osclass type="general purpose" vendor="Linux" osfamily="Linux" osgen="4.X" accuracy="96"><cpe>cpe:/o:linux:linux_kernel:4</cpe></osclass>
+</osmatch>
+</os>
+<uptime seconds="3600" lastboot="Tue Nov 14 20:00:00 2023"/>
+<hostscript><script id="nbstat" output="NetBIOS name: GW"/></hostscript>
+</host>
+<host starttime="1700000001" endtime="1700000009">
+<status state="down" reason="no-response" reason_ttl="0"/>
+<address addr="192.0.2.2" addrtype="ipv4"/>
+</host>
+<runstats>
+<finished time="1700000010" timestr="Tue Nov 14 22:13:30 2023" summary="Nmap done" elapsed="10.05" exit="success"/>
+<hosts up="1" down="1" total="2"/>
+</runstats>
+</nmaprun>
+"""
+
+
+def test_parse_keeps_all_host_details():
+    result = nmap_xml.parse(SAMPLE_XML)
+
+    assert result.args.startswith("nmap -oX -")
+    assert [si.protocol for si in result.scaninfo] == ["tcp", "udp"]
+    assert result.runstats.hosts_up == 1
+    assert result.runstats.hosts_total == 2
+    assert result.runstats.elapsed == "10.05"
+
+    host, down = result.hosts
+    assert host.address == "192.0.2.1"
+    assert [a.addrtype for a in host.addresses] == ["mac", "ipv4", "ipv6"]
+    assert host.addresses[0].vendor == "Acme"
+    assert [h.name for h in host.hostnames] == ["gw.example", "gateway"]
+    assert {(p.protocol, p.portid) for p in host.ports} == {
+        ("tcp", 22), ("tcp", 25), ("tcp", 443), ("udp", 53), ("sctp", 2905)
+    }
+    assert [p.portid for p in host.open_ports("tcp")] == [22]
+    ssh = host.ports[0]
+    assert ssh.service.product == "OpenSSH"
+    assert ssh.service.cpe == ("cpe:/a:openbsd:openssh:7.4",)
+    assert ssh.scripts[0].id == "ssh-hostkey"
+    assert host.extraports[0].count == 995
+    assert host.host_scripts[0].output == "NetBIOS name: GW"
+    assert host.os_matches[0].classes[0].osfamily == "Linux"
+    assert host.uptime == ("3600", "Tue Nov 14 20:00:00 2023")
+
+    assert down.state == "down"
+    assert down.ports == ()
+
+
+def test_iter_hosts_streams_from_small_chunks():
+    data = SAMPLE_XML.encode()
+    chunks = [data[i : i + 7] for i in range(0, len(data), 7)]
+    streamed = list(nmap_xml.iter_hosts(chunks))
+    assert [h.address for h in streamed] == ["192.0.2.1", "192.0.2.2"]
+
+    from_file = list(nmap_xml.iter_hosts(io.BytesIO(data)))
+    assert [h.to_dict() for h in from_file] == [h.to_dict() for h in streamed]
+
+
+def test_malformed_xml_raises_parse_error():
+    with pytest.raises(ET.ParseError):
+        nmap_xml.parse("<nmaprun><host>")
+
+
+def test_parse_partial_keeps_complete_hosts():
+    # Cut inside the second host, as when nmap is killed mid-scan
+    cut = SAMPLE_XML.index("192.0.2.2")
+    partial = nmap_xml.parse_partial(SAMPLE_XML[:cut])
+    assert partial.truncated
+    assert [h.address for h in partial.hosts] == ["192.0.2.1"]
+    assert partial.runstats is None
+
+    # Trailing garbage after a complete host in the same chunk
+    garbage = SAMPLE_XML[: SAMPLE_XML.index("</host>") + 7] + "<<<"
+    assert [h.address for h in nmap_xml.parse_partial(garbage).hosts] == ["192.0.2.1"]
+    assert nmap_xml.parse_partial(b"").hosts == []
+
+    complete = nmap_xml.parse_partial(SAMPLE_XML)
+    assert not complete.truncated
+    assert len(complete.hosts) == 2
+
+
+def test_runner_summary_includes_all_protocols():
+    summary = json.loads(json.dumps(_parse_nmap_xml_from_string(SAMPLE_XML)))
+    host = summary["192.0.2.1"]
+    assert host["status"] == {"state": "up", "reason": "arp-response"}
+    assert host["tcp"]["22"]["product"] == "OpenSSH"
+    assert host["tcp"]["25"]["state"] == "closed"
+    assert host["udp"]["53"]["name"] == "domain"
+    assert host["hostnames"][0]["name"] == "gw.example"
+    assert summary["192.0.2.2"]["status"]["state"] == "down"
+    assert _parse_nmap_xml_from_string("not xml") == {}
+
+
+def test_python_nmap_layout_matches_python_nmap():
+    nmap = pytest.importorskip("nmap")
+    # PortScanner() looks for the nmap binary; the parser itself does not need it.
+    scanner = object.__new__(nmap.PortScanner)
+    expected = scanner.analyse_nmap_xml_scan(SAMPLE_XML)
+
+    actual = nmap_xml.parse(SAMPLE_XML).to_python_nmap()
+    assert json.loads(json.dumps(actual)) == json.loads(json.dumps(expected))
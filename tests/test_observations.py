@@ -0,0 +1,94 @@
+import json
+
+from src import observations
+from src.db import repository as db_repo
+from src.db.models import JobStatus
+
+SUMMARY = {
+    "192.0.2.1": {
+        "status": {"state": "up", "reason": "syn-ack"},
+        "tcp": {
+            "22": {"state": "open", "name": "ssh", "product": "OpenSSH", "version": "7.4"},
+            "3389": {"state": "filtered", "name": "ms-wbt-server", "product": "", "version": ""},
+        },
+        "udp": {"53": {"state": "open", "name": "domain", "product": "dnsmasq", "version": "2.80"}},
+    },
+    "192.0.2.2": {"status": {"state": "down", "reason": "no-response"}},
+}
+
+
+def _job(session, address="192.0.2.1"):
+    run = db_repo.create_scan_run(session, status=JobStatus.COMPLETED)
+    target = db_repo.get_target_by_address(session, address) or db_repo.create_target(session, address=address)
+    return db_repo.create_job(session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+
+
+def test_observation_rows_normalise_a_summary():
+    hosts, ports = observations.observation_rows(4, 9, json.loads(json.dumps(SUMMARY)))
+
+    assert [(h["address"], h["state"], h["reason"]) for h in hosts] == [
+        ("192.0.2.1", "up", "syn-ack"),
+        ("192.0.2.2", "down", "no-response"),
+    ]
+    assert [(p["proto"], p["port"], p["state"], p["service"], p["product"], p["version"]) for p in ports] == [
+        ("tcp", 22, "open", "ssh", "OpenSSH", "7.4"),
+        ("tcp", 3389, "filtered", "ms-wbt-server", None, None),
+        ("udp", 53, "open", "domain", "dnsmasq", "2.80"),
+    ]
+    assert {(p["scan_run_id"], p["job_id"]) for p in ports} == {(4, 9)}
+
+
+def test_query_port_observations_filters(db_session):
+    old = _job(db_session)
+    observations.record_observations(db_session, old.scan_run_id, old.id, SUMMARY)
+    new = _job(db_session)
+    newer = {"192.0.2.1": {"status": {"state": "up"}, "tcp": {22: {"state": "open", "name": "ssh", "product": "OpenSSH", "version": "8.9p1"}}}}
+    observations.record_observations(db_session, new.scan_run_id, new.id, newer)
+
+    def query(**kwargs):
+        return [(r.scan_run_id, r.address, r.port) for r in db_repo.query_port_observations(db_session, **kwargs)]
+
+    assert query(port=22, state="open") == [(old.scan_run_id, "192.0.2.1", 22), (new.scan_run_id, "192.0.2.1", 22)]
+    assert query(port=22, state="open", scan_run_id=db_repo.get_latest_observed_scan_run_id(db_session)) == [
+        (new.scan_run_id, "192.0.2.1", 22)
+    ]
+    assert query(product="OpenSSH", version="7.") == [(old.scan_run_id, "192.0.2.1", 22)]
+    assert query(state="open", proto="udp") == [(old.scan_run_id, "192.0.2.1", 53)]
+    assert query(port=3389, state="open") == []
+    assert len(query(limit=2)) == 2
+
+    plan = " ".join(
+        row[3]
+        for row in db_session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM port_observations WHERE port = 22 AND state = 'open' AND scan_run_id = 1"
+        )
+    )
+    assert "ix_port_observations_port_state_run" in plan
+
+
+def test_backfill_records_stored_results_once(db_session):
+    job = _job(db_session)
+    db_repo.create_result(db_session, job_id=job.id, summary_json=json.dumps(SUMMARY))
+    db_repo.create_result(db_session, job_id=job.id, summary_json=json.dumps(SUMMARY))
+
+    assert observations.backfill_observations(db_session) == 1
+    assert observations.backfill_observations(db_session) == 0
+    assert len(db_repo.query_port_observations(db_session)) == 3
+
+
+def test_run_records_observations_for_query(temp_db_path, cli_runner, fake_nmap, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_DOWN", "192.0.2.3")
+    targets = tmp_path / "targets.txt"
+    targets.write_text("192.0.2.1\n192.0.2.2\n192.0.2.3\n")
+    cli_runner("ingest", targets, db_path=temp_db_path)
+    run_id = int(cli_runner("plan", db_path=temp_db_path).split()[-1])
+    cli_runner("split", run_id, "--chunk-size", 10, db_path=temp_db_path)
+    cli_runner("run", run_id, db_path=temp_db_path)
+
+    output = cli_runner("query", "--port", 22, "--state", "open", "--run", "latest", db_path=temp_db_path)
+    lines = output.splitlines()
+    assert lines[0].split()[:4] == ["Run", "Address", "Port", "State"]
+    assert sorted(line.split()[1] for line in lines[1:]) == ["192.0.2.1", "192.0.2.2"]
+    assert all(line.split()[2:5] == ["22/tcp", "open", "ssh"] for line in lines[1:])
+
+    assert cli_runner("query", "--port", 3389, db_path=temp_db_path) == "No matching observations"
@@ -58,3 +58,51 @@ def test_summary_queries_and_exports(db_session):
     finally:
         os.unlink(tmp_json_path)
         os.unlink(tmp_csv_path)
+
+
+def test_reports_match_per_job_semantics(db_session):
+    empty_run = db_repo.create_scan_run(db_session, status="pending")
+    run = db_repo.create_scan_run(db_session, status="completed")
+    target = db_repo.create_target(db_session, address="192.0.2.1")
+    start = datetime(2024, 1, 1)
+
+    def job(status, seconds=None, **kwargs):
+        return db_repo.create_job(
+            db_session,
+            scan_run_id=run.id,
+            target_id=target.id,
+            status=status,
+            started_at=start if seconds is not None else None,
+            completed_at=start + timedelta(seconds=seconds) if seconds is not None else None,
+            **kwargs,
+        )
+
+    quick = job("completed", 1.5)
+    tie_a = job("completed", 7.25)
+    tie_b = job("failed", 7.25)
+    pending = job("pending")
+    noisy = job("completed", 2)
+    db_repo.create_result(db_session, job_id=noisy.id, stderr="")
+    db_repo.create_result(db_session, job_id=noisy.id, stderr="warning: first")
+    db_repo.create_result(db_session, job_id=noisy.id, stderr="warning: second")
+    db_repo.create_result(db_session, job_id=quick.id, stderr="")
+
+    assert reporting.summarise_runs(db_session) == [
+        {"scan_run_id": empty_run.id, "total_jobs": 0, "completed_jobs": 0, "failed_jobs": 0},
+        {"scan_run_id": run.id, "total_jobs": 5, "completed_jobs": 3, "failed_jobs": 2},
+    ]
+
+    slowest = reporting.get_slowest_jobs(db_session, limit=3)
+    assert [(row["job_id"], row["duration"]) for row in slowest] == [
+        (tie_a.id, 7.25),
+        (tie_b.id, 7.25),
+        (noisy.id, 2.0),
+    ]
+    assert slowest[1]["status"] == "failed" and slowest[1]["target"] == "192.0.2.1"
+
+    failed = reporting.get_failed_jobs(db_session)
+    assert [(row["job_id"], row["status"], row["error"]) for row in failed] == [
+        (tie_b.id, "failed", None),
+        (pending.id, "pending", None),
+        (noisy.id, "completed", "warning: first"),
+    ]
@@ -0,0 +1,115 @@
+import sqlite3
+import time
+from datetime import datetime
+
+from src.db import repository as db_repo
+from src.db.models import JobStatus, TargetKind
+
+
+def test_add_batch_targets_creates_missing_and_keeps_order(db_session):
+    db_repo.bulk_insert_targets(db_session, [(f"192.0.2.{i}", TargetKind.HOST) for i in range(1, 6)])
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    batch = db_repo.create_batches(db_session, [dict(scan_run_id=run.id, name="b")], [[]])[0]
+
+    addresses = ["192.0.2.4", "192.0.2.1", "192.0.2.4", "198.51.100.0/30", "192.0.2.2"]
+    created, added = db_repo.add_batch_targets(
+        db_session,
+        batch.id,
+        [(a, TargetKind.RANGE if "/" in a else TargetKind.HOST) for a in addresses],
+    )
+    db_session.commit()
+
+    assert (created, added) == (1, 4)
+    assert db_repo.get_target_by_address(db_session, "198.51.100.0/30").kind == TargetKind.RANGE
+    job_ids = db_repo.materialize_jobs(db_session, run.id, batch.id, timeout_sec=30, nmap_options="-F")
+    db_session.commit()
+    jobs = [db_repo.get_job(db_session, job_id) for job_id in job_ids]
+    assert [job.target.address for job in jobs] == ["192.0.2.4", "192.0.2.1", "198.51.100.0/30", "192.0.2.2"]
+    assert {(job.status, job.timeout_sec, job.nmap_options, job.attempt, job.max_attempts) for job in jobs} == {
+        (JobStatus.PLANNED, 30, "-F", 1, 3)
+    }
+    assert list(db_repo.iter_job_ids(db_session, run.id)) == list(job_ids)
+
+
+def test_materialize_jobs_of_empty_batch(db_session):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    batch = db_repo.create_batches(db_session, [dict(scan_run_id=run.id, name="empty")], [[]])[0]
+    assert db_repo.materialize_jobs(db_session, run.id, batch.id) == range(0)
+
+
+def test_api_scan_is_planned_with_one_batch(client_with_db, db_session, fake_nmap, temp_db_path):
+    db_repo.create_target(db_session, address="192.0.2.1")
+    response = client_with_db.post(
+        "/api/scans", json={"targets": ["192.0.2.0/30", "192.0.2.1"], "nmap_options": "-F"}
+    )
+    assert response.status_code == 202
+    run_id = int(response.json()["scan_id"])
+    deadline = time.monotonic() + 20
+    while client_with_db.get(f"/api/scans/{run_id}").json()["data"]["status"] not in ("COMPLETED", "FAILED"):
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+    conn = sqlite3.connect(temp_db_path)
+    try:
+        rows = conn.execute(
+            "SELECT b.name, t.address FROM batches b "
+            "JOIN batch_target_association a ON a.batch_id = b.id "
+            "JOIN targets t ON t.id = a.target_id WHERE b.scan_run_id = ? ORDER BY a.rowid",
+            (run_id,),
+        ).fetchall()
+        jobs = conn.execute("SELECT count(*), count(DISTINCT target_id) FROM jobs WHERE scan_run_id = ?", (run_id,)).fetchone()
+    finally:
+        conn.close()
+    assert rows == [(f"run{run_id}_batch1", f"192.0.2.{i}") for i in (1, 2)]
+    assert jobs == (2, 2)
+
+
+def test_scan_run_stats_follow_every_write_path(db_session):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    other = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    batch = db_repo.create_batches(db_session, [dict(scan_run_id=run.id, name="b")], [[]])[0]
+    db_repo.add_batch_targets(db_session, batch.id, [(f"192.0.2.{i}", TargetKind.HOST) for i in range(1, 5)])
+    job_ids = db_repo.materialize_jobs(db_session, run.id, batch.id)
+    db_session.commit()
+
+    db_repo.update_job(db_session, job_ids[0], status=JobStatus.RUNNING)
+    db_repo.update_job(db_session, job_ids[1], status=JobStatus.COMPLETED)
+    db_repo.update_job(db_session, job_ids[1], status=JobStatus.COMPLETED, reason="again")
+    db_repo.update_job(db_session, job_ids[2], status=JobStatus.FAILED, scan_run_id=other.id)
+    db_repo.delete_job(db_session, job_ids[3])
+    db_repo.add_observations(
+        db_session,
+        [
+            dict(scan_run_id=run.id, job_id=job_ids[1], address="192.0.2.2", state="up", observed_at=datetime.utcnow()),
+            dict(scan_run_id=run.id, job_id=job_ids[1], address="192.0.2.9", state="down", observed_at=datetime.utcnow()),
+        ],
+        [],
+    )
+
+    stats = db_repo.get_scan_run_stats(db_session, run.id)
+    db_session.refresh(stats)
+    assert (stats.total, stats.planned, stats.running, stats.completed, stats.failed) == (2, 0, 1, 1, 0)
+    assert (stats.hosts_up, stats.hosts_down) == (1, 1)
+    assert db_repo.get_scan_run_stats(db_session, other.id).failed == 1
+    assert db_repo.check_scan_run_stats(db_session) == []
+
+
+def test_check_scan_run_stats_repairs_drift(db_session):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    target = db_repo.create_target(db_session, address="192.0.2.1")
+    db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, status=JobStatus.COMPLETED)
+    connection = db_session.connection()
+    connection.exec_driver_sql("UPDATE scan_run_stats SET completed = 7, failed = 2")
+    connection.exec_driver_sql(
+        "INSERT INTO scan_run_stats (scan_run_id, pending, planned, running, completed, failed, paused, hosts_up, hosts_down) "
+        "VALUES (99, 1, 0, 0, 0, 0, 0, 0, 0)"
+    )
+    db_session.commit()
+
+    assert db_repo.check_scan_run_stats(db_session, repair=False) == [run.id, 99]
+    assert db_repo.check_scan_run_stats(db_session) == [run.id, 99]
+    stats = db_repo.get_scan_run_stats(db_session, run.id)
+    db_session.refresh(stats)
+    assert (stats.total, stats.completed, stats.failed) == (1, 1, 0)
+    assert db_repo.get_scan_run_stats(db_session, 99) is None
+    assert db_repo.check_scan_run_stats(db_session) == []
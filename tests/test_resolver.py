@@ -0,0 +1,198 @@
+import asyncio
+import socket
+import struct
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.db import repository as db_repo
+from src.db.models import TargetKind
+from src.resolver import (
+    DnsResolver,
+    ResolutionError,
+    SystemResolver,
+    build_query,
+    parse_response,
+    resolve_names,
+    resolve_targets,
+)
+
+ZONE = {
+    "a.example": [("192.0.2.10", 60)],
+    "b.example": [("192.0.2.20", 30), ("192.0.2.21", 10)],
+    "slow.example": [("192.0.2.30", 60)],
+}
+
+
+class StubDnsServer:
+    """Answer A queries for ``ZONE`` on a local UDP port and count queries."""
+
+    def __init__(self, zone, delay=0.0):
+        self.zone = zone
+        self.delay = delay
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            threading.Thread(target=self._answer, args=(data, addr), daemon=True).start()
+
+    def _answer(self, data, addr):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            query_id = struct.unpack("!H", data[:2])[0]
+            offset, labels = 12, []
+            while data[offset]:
+                labels.append(data[offset + 1 : offset + 1 + data[offset]].decode())
+                offset += data[offset] + 1
+            question = data[12 : offset + 5]
+            qtype = struct.unpack("!H", data[offset + 1 : offset + 3])[0]
+            name = ".".join(labels)
+            self.queries.append((name, qtype))
+            if self.delay:
+                threading.Event().wait(self.delay)
+
+            records = self.zone.get(name)
+            answers = records if qtype == 1 and records else []
+            rcode = 0 if records is not None else 3
+            header = struct.pack("!HHHHHH", query_id, 0x8180 | rcode, 1, len(answers), 0, 0)
+            body = b"".join(
+                struct.pack("!HHHIH", 0xC00C, 1, 1, ttl, 4) + socket.inet_aton(ip) for ip, ttl in answers
+            )
+            self.sock.sendto(header + question + body, addr)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def dns_server():
+    server = StubDnsServer(ZONE)
+    yield server
+    server.close()
+
+
+def _targets(session, *addresses):
+    return [(db_repo.create_target(session, address=a, kind=TargetKind.HOST).id, a) for a in addresses]
+
+
+def test_build_and_parse_round_trip():
+    query = build_query(7, "a.example", 1)
+    assert query[12:] == b"\x01a\x07example\x00\x00\x01\x00\x01"
+    response = query[:2] + b"\x81\x80\x00\x01\x00\x01\x00\x00\x00\x00" + query[12:]
+    response += struct.pack("!HHHIH", 0xC00C, 1, 1, 42, 4) + bytes([192, 0, 2, 1])
+    assert parse_response(response, 7) == (0, [(1, "192.0.2.1", 42)])
+
+
+def test_malformed_names_are_left_unresolved(db_session, dns_server):
+    with pytest.raises(ResolutionError):
+        build_query(7, "bad..name", 1)
+    with pytest.raises(ResolutionError):
+        asyncio.run(SystemResolver().resolve("bad..name"))
+
+    targets = _targets(db_session, "a.example", "bad..name", "x" * 64 + ".example")
+    resolver = DnsResolver("127.0.0.1", dns_server.port, timeout=1, retries=0)
+    resolved = asyncio.run(resolve_targets(db_session, targets, resolver=resolver))
+
+    assert resolved == {"a.example": "192.0.2.10"}
+    assert [name for name, _ in dns_server.queries] == ["a.example"]
+    assert db_repo.get_target_by_address(db_session, "bad..name").resolved_address is None
+
+
+def test_only_hostname_targets_of_the_run_are_loaded(db_session):
+    run = db_repo.create_scan_run(db_session)
+    other = db_repo.create_scan_run(db_session)
+    for address, kind, scan_run in [
+        ("a.example", TargetKind.HOST, run),
+        ("192.0.2.1", TargetKind.HOST, run),
+        ("2001:db8::1", TargetKind.HOST, run),
+        ("192.0.2.0/30", TargetKind.RANGE, run),
+        ("b.example", TargetKind.HOST, other),
+    ]:
+        target = db_repo.create_target(db_session, address=address, kind=kind)
+        db_repo.create_job(db_session, scan_run_id=scan_run.id, target_id=target.id)
+    db_repo.create_job(db_session, scan_run_id=run.id, target_id=db_repo.get_target_by_address(db_session, "a.example").id)
+
+    assert [address for _, address in db_repo.iter_hostname_targets_for_scan_run(db_session, run.id)] == ["a.example"]
+
+
+def test_resolve_targets_records_address_and_caches(db_session, dns_server):
+    targets = _targets(db_session, "a.example", "b.example", "missing.example", "192.0.2.99")
+    resolver = DnsResolver("127.0.0.1", dns_server.port, timeout=1, retries=0)
+    now = datetime(2024, 1, 1)
+
+    resolved = asyncio.run(resolve_targets(db_session, targets, resolver=resolver, now=now))
+
+    assert resolved == {"a.example": "192.0.2.10", "b.example": "192.0.2.20"}
+    db_session.expire_all()
+    by_address = {t.address: t for t in db_repo.list_targets(db_session)}
+    assert by_address["a.example"].resolved_address == "192.0.2.10"
+    assert by_address["missing.example"].resolved_address is None
+    # IP literals are never looked up
+    assert by_address["192.0.2.99"].resolved_address is None
+    assert {name for name, _ in dns_server.queries} == {"a.example", "b.example", "missing.example"}
+
+    entries = {e.hostname: e for e in db_repo.get_dns_cache_entries(db_session, ["a.example", "b.example"])}
+    assert entries["b.example"].addresses == "192.0.2.20,192.0.2.21"
+    # The cache honours the smallest record TTL
+    assert entries["b.example"].expires_at == now + timedelta(seconds=10)
+
+
+def test_cache_is_used_until_ttl_expires(db_session, dns_server):
+    targets = _targets(db_session, "a.example", "b.example")
+    resolver = DnsResolver("127.0.0.1", dns_server.port, timeout=1, retries=0)
+    now = datetime(2024, 1, 1)
+    asyncio.run(resolve_targets(db_session, targets, resolver=resolver, now=now))
+    dns_server.queries.clear()
+
+    asyncio.run(resolve_targets(db_session, targets, resolver=resolver, now=now + timedelta(seconds=5)))
+    assert dns_server.queries == []
+
+    # b.example's 10s TTL has expired, a.example's 60s has not
+    asyncio.run(resolve_targets(db_session, targets, resolver=resolver, now=now + timedelta(seconds=20)))
+    assert [name for name, _ in dns_server.queries] == ["b.example"]
+
+
+def test_resolution_concurrency_is_bounded():
+    zone = {f"h{i}.example": [(f"192.0.2.{i}", 60)] for i in range(12)}
+    server = StubDnsServer(zone, delay=0.05)
+    try:
+        resolver = DnsResolver("127.0.0.1", server.port, timeout=2, retries=0)
+        results = asyncio.run(resolve_names(list(zone), resolver, concurrency=3))
+    finally:
+        server.close()
+
+    assert len(results) == 12
+    assert 1 < server.max_active <= 3
+
+
+def test_runner_passes_resolved_address_with_no_dns(db_session, fake_nmap, tmp_path, monkeypatch):
+    from src.runner import execute_job
+
+    argv_log = tmp_path / "argv.log"
+    monkeypatch.setenv("FAKE_NMAP_ARGV_LOG", str(argv_log))
+    run = db_repo.create_scan_run(db_session)
+    target = db_repo.create_target(db_session, address="a.example", resolved_address="192.0.2.10")
+    job = db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id)
+
+    asyncio.run(execute_job(job.id, db_session, timeout_sec=30))
+
+    argv = argv_log.read_text().split()
+    assert argv[-2:] == ["-n", "192.0.2.10"]
+    assert "a.example" not in argv
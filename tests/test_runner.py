@@ -0,0 +1,306 @@
+import asyncio
+import json
+import time
+
+from src.db import repository as db_repo
+from src.db.models import JobStatus, TargetKind
+from src.difficulty import difficult_targets
+from src.runner import (
+    GuidedScheduler,
+    SlowLane,
+    SpeculationPolicy,
+    dispatch,
+    execute_job,
+    guided_chunk_size,
+    run_jobs_concurrently,
+    run_jobs_guided,
+    unit_timeout,
+)
+
+
+def _create_job(session, address, kind=TargetKind.HOST, options=None):
+    run = db_repo.create_scan_run(session, status=JobStatus.PENDING, options=options)
+    target = db_repo.get_target_by_address(session, address) or db_repo.create_target(
+        session, address=address, kind=kind
+    )
+    job = db_repo.create_job(
+        session, scan_run_id=run.id, target_id=target.id, status=JobStatus.PLANNED
+    )
+    return run, job
+
+
+def test_range_target_is_passed_to_nmap_unexpanded(db_session, client_with_db, fake_nmap, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_RANGE_HOSTS", "3")
+    run, job = _create_job(db_session, "192.0.2.0/24", kind=TargetKind.RANGE)
+
+    asyncio.run(execute_job(job.id, db_session, timeout_sec=30))
+
+    db_session.expire_all()
+    job = db_repo.get_job(db_session, job.id)
+    assert job.status == JobStatus.COMPLETED
+    summary = json.loads(job.results[-1].summary_json)
+    assert sorted(summary) == ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+    # No per-address Target rows are created for the block
+    assert [t.address for t in db_repo.list_targets(db_session)] == ["192.0.2.0/24"]
+
+    data = client_with_db.get(f"/api/scans/{run.id}").json()["data"]
+    assert sorted(data["results"]["hosts"]) == ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+    assert data["results"]["hosts"]["192.0.2.1"]["ports"] == [22]
+
+
+def test_guided_chunk_sizes_shrink_towards_min_chunk():
+    scheduler = GuidedScheduler([(1, list(range(60))), (2, list(range(60, 100)))], workers=4, min_chunk=2)
+    units = []
+    while (unit := scheduler.next_unit()) is not None:
+        units.append(unit)
+
+    sizes = [len(unit.job_ids) for unit in units]
+    assert sizes[:4] == [25, 19, 14, 2]  # pool 1 ends after 60 jobs
+    assert sizes[4:] == [10, 8, 6, 4, 3, 3, 2, 2, 2]
+    assert [job for unit in units for job in unit.job_ids] == list(range(100))
+    # A unit never spans two planned batches
+    assert {unit.parent_batch_id for unit in units if unit.job_ids[0] >= 60} == {2}
+    assert guided_chunk_size(1000, 10, max_chunk=50) == 50
+
+
+def test_guided_run_scans_units_with_one_nmap_each(db_session, fake_nmap, tmp_path, monkeypatch):
+    argv_log = tmp_path / "argv.log"
+    monkeypatch.setenv("FAKE_NMAP_ARGV_LOG", str(argv_log))
+    monkeypatch.setenv("FAKE_NMAP_DOWN", "192.0.2.3")
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    targets = [db_repo.create_target(db_session, address=f"192.0.2.{i}") for i in range(1, 9)]
+    parent = db_repo.create_batch(db_session, scan_run_id=run.id, name="parent", targets=targets)
+    job_ids = [
+        db_repo.create_job(db_session, scan_run_id=run.id, target_id=t.id, status=JobStatus.PLANNED).id
+        for t in targets
+    ]
+
+    asyncio.run(run_jobs_guided(run.id, [(parent.id, job_ids)], db_session, concurrency=2, timeout_sec=30))
+
+    invocations = argv_log.read_text().splitlines()
+    assert [len(line.split()) - 3 for line in invocations] == [4, 2, 1, 1]  # -oX - -T4 + targets
+    db_session.expire_all()
+    children = [b for b in db_repo.list_batches_for_run(db_session, run.id) if b.parent_batch_id == parent.id]
+    assert [(b.strategy, b.planned_chunk_size) for b in children] == [("guided", n) for n in (4, 2, 1, 1)]
+    assert sorted(t.address for b in children for t in b.targets) == sorted(t.address for t in targets)
+
+    jobs = {db_repo.get_job(db_session, job_id).target.address: db_repo.get_job(db_session, job_id) for job_id in job_ids}
+    assert all(job.status == JobStatus.COMPLETED for job in jobs.values())
+    # Each job keeps only its own host; the raw output is stored once per unit
+    summary = json.loads(jobs["192.0.2.1"].results[-1].summary_json)
+    assert list(summary) == ["192.0.2.1"]
+    assert json.loads(jobs["192.0.2.3"].results[-1].summary_json)["192.0.2.3"]["status"]["state"] == "down"
+    assert sum(1 for job in jobs.values() if job.results[-1].stdout) == 4
+
+
+def test_straggler_gets_a_speculative_backup(db_session, fake_nmap, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.5")
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    job_ids = []
+    for i in range(1, 6):
+        target = db_repo.create_target(db_session, address=f"192.0.2.{i}")
+        # The straggler is already on its second attempt, e.g. a retry
+        job = db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, attempt=2 if i == 5 else 1)
+        job_ids.append(job.id)
+    policy = SpeculationPolicy(multiplier=2.0, min_progress=0.5, slots=1, min_samples=3, check_interval=0.05)
+
+    start = time.monotonic()
+    asyncio.run(
+        run_jobs_concurrently(run.id, job_ids, db_session, concurrency=5, timeout_sec=30, speculation=policy)
+    )
+
+    # The stalled first attempt was killed instead of running for a minute
+    assert time.monotonic() - start < 20
+    db_session.expire_all()
+    straggler = db_repo.get_job(db_session, job_ids[-1])
+    assert straggler.status == JobStatus.COMPLETED
+    assert straggler.reason == "completed_by_backup"
+    assert straggler.attempt == 3
+    assert "192.0.2.5" in json.loads(straggler.results[-1].summary_json)
+    others = [db_repo.get_job(db_session, job_id) for job_id in job_ids[:-1]]
+    assert {(job.reason, job.attempt) for job in others} == {("completed", 1)}
+
+
+def test_timed_out_unit_is_salvaged_and_bisected(db_session, fake_nmap, tmp_path, monkeypatch):
+    argv_log = tmp_path / "argv.log"
+    monkeypatch.setenv("FAKE_NMAP_ARGV_LOG", str(argv_log))
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.2")
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    targets = [db_repo.create_target(db_session, address=f"192.0.2.{i}") for i in range(1, 5)]
+    parent = db_repo.create_batch(db_session, scan_run_id=run.id, name="parent", targets=targets)
+    job_ids = [db_repo.create_job(db_session, scan_run_id=run.id, target_id=t.id).id for t in targets]
+
+    start = time.monotonic()
+    asyncio.run(
+        run_jobs_guided(
+            run.id,
+            [(parent.id, job_ids)],
+            db_session,
+            concurrency=1,
+            timeout_sec=1,
+            auto_bisect=True,
+            slow_lane=SlowLane(timing="-T2", timeout_sec=30),
+        )
+    )
+
+    assert time.monotonic() - start < 20
+    # The stalled unit, then its halves: .2 alone in the slow lane, .3 and .4 together
+    invocations = [line.split() for line in argv_log.read_text().splitlines()]
+    scanned = [[a for a in argv if a.startswith("192.")] for argv in invocations]
+    assert scanned[0] == ["192.0.2.1", "192.0.2.2", "192.0.2.3", "192.0.2.4"]
+    assert sorted(scanned[1:]) == [["192.0.2.2"], ["192.0.2.3", "192.0.2.4"]]
+    assert next(argv for argv in invocations if argv[-1:] == ["192.0.2.2"])[-2] == "-T2"
+
+    db_session.expire_all()
+    jobs = [db_repo.get_job(db_session, job_id) for job_id in job_ids]
+    assert [job.status for job in jobs] == [JobStatus.COMPLETED] * 4
+    assert jobs[0].reason == "salvaged"
+    assert "192.0.2.1" in json.loads(jobs[0].results[-1].summary_json)
+    # The bisected jobs completed, but their timeouts still count as history
+    assert [job.timeouts for job in jobs] == [0, 1, 1, 1]
+    assert {d.address for d in difficult_targets(db_session, min_timeouts=1)} == {"192.0.2.2", "192.0.2.3", "192.0.2.4"}
+    guided = next(b for b in db_repo.list_batches_for_run(db_session, run.id) if b.strategy == "guided")
+    children = [b for b in db_repo.list_batches_for_run(db_session, run.id) if b.parent_batch_id == guided.id]
+    assert sorted((b.strategy, sorted(t.address for t in b.targets)) for b in children) == [
+        ("auto-bisect", ["192.0.2.2"]),
+        ("auto-bisect", ["192.0.2.3", "192.0.2.4"]),
+    ]
+
+
+def test_large_unit_gets_a_budget_per_host_group(db_session, fake_nmap, monkeypatch):
+    assert unit_timeout(600, 1) == unit_timeout(600, 64) == 600
+    assert unit_timeout(600, 12_500) == 600 * 196
+
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.3")
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    targets = [db_repo.create_target(db_session, address=f"192.0.2.{i}") for i in range(1, 7)]
+    parent = db_repo.create_batch(db_session, scan_run_id=run.id, name="parent", targets=targets)
+    job_ids = [db_repo.create_job(db_session, scan_run_id=run.id, target_id=t.id).id for t in targets]
+
+    # A per-target budget would give the stalled unit an hour
+    start = time.monotonic()
+    asyncio.run(
+        run_jobs_guided(
+            run.id,
+            [(parent.id, job_ids)],
+            db_session,
+            concurrency=1,
+            timeout_sec=600,
+            auto_bisect=True,
+            unit_timeout_sec=1,
+        )
+    )
+
+    assert time.monotonic() - start < 20
+    db_session.expire_all()
+    assert [db_repo.get_job(db_session, job_id).status for job_id in job_ids] == [JobStatus.COMPLETED] * 6
+    strategies = [b.strategy for b in db_repo.list_batches_for_run(db_session, run.id)]
+    assert strategies.count("auto-bisect") == 2
+
+
+def test_timed_out_range_keeps_partial_result(db_session, fake_nmap, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_RANGE_HOSTS", "3")
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.2")
+    _, job = _create_job(db_session, "192.0.2.0/24", kind=TargetKind.RANGE)
+
+    asyncio.run(execute_job(job.id, db_session, timeout_sec=1))
+
+    db_session.expire_all()
+    job = db_repo.get_job(db_session, job.id)
+    assert (job.status, job.reason) == (JobStatus.FAILED, "timeout")
+    result = job.results[-1]
+    assert result.partial
+    assert list(json.loads(result.summary_json)) == ["192.0.2.1"]
+    assert "192.0.2.1" in result.stdout
+
+
+def test_rerun_of_timed_out_range_replaces_its_partial_hosts(db_session, fake_nmap, monkeypatch):
+    monkeypatch.setenv("FAKE_NMAP_RANGE_HOSTS", "3")
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.2")
+    run, job = _create_job(db_session, "192.0.2.0/24", kind=TargetKind.RANGE)
+    asyncio.run(execute_job(job.id, db_session, timeout_sec=1))
+    assert db_repo.get_scan_run_stats(db_session, run.id).hosts_up == 1
+
+    # A retry or bisect runs the same Job again and finds every host
+    monkeypatch.delenv("FAKE_NMAP_STALL")
+    db_repo.update_job(db_session, job.id, status=JobStatus.PLANNED, attempt=2)
+    asyncio.run(execute_job(job.id, db_session, timeout_sec=30))
+
+    db_session.expire_all()
+    assert db_repo.get_job(db_session, job.id).status == JobStatus.COMPLETED
+    assert db_repo.get_scan_run_stats(db_session, run.id).hosts_up == 3
+
+
+def test_timed_out_unit_retries_only_unfinished_targets(db_session, fake_nmap, tmp_path, monkeypatch):
+    argv_log = tmp_path / "argv.log"
+    monkeypatch.setenv("FAKE_NMAP_ARGV_LOG", str(argv_log))
+    monkeypatch.setenv("FAKE_NMAP_STALL", "192.0.2.3")
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    targets = [db_repo.create_target(db_session, address=f"192.0.2.{i}") for i in range(1, 5)]
+    parent = db_repo.create_batch(db_session, scan_run_id=run.id, name="parent", targets=targets)
+    job_ids = [db_repo.create_job(db_session, scan_run_id=run.id, target_id=t.id).id for t in targets]
+
+    asyncio.run(run_jobs_guided(run.id, [(parent.id, job_ids)], db_session, concurrency=1, timeout_sec=1))
+
+    scanned = [[a for a in line.split() if a.startswith("192.")] for line in argv_log.read_text().splitlines()]
+    assert scanned == [["192.0.2.1", "192.0.2.2", "192.0.2.3", "192.0.2.4"], ["192.0.2.3", "192.0.2.4"]]
+    db_session.expire_all()
+    jobs = [db_repo.get_job(db_session, job_id) for job_id in job_ids]
+    assert [job.status for job in jobs] == [JobStatus.COMPLETED] * 4
+    assert [(job.reason, job.attempt) for job in jobs] == [
+        ("salvaged", 1),
+        ("salvaged", 1),
+        ("completed", 2),
+        ("completed", 2),
+    ]
+    assert jobs[0].results[-1].partial and "192.0.2.2" in jobs[0].results[-1].stdout
+    assert not jobs[2].results[-1].partial
+    batches = {b.strategy: b for b in db_repo.list_batches_for_run(db_session, run.id)}
+    assert batches["retry"].retry_of_batch_id == batches["guided"].id
+    assert sorted(t.address for t in batches["retry"].targets) == ["192.0.2.3", "192.0.2.4"]
+
+
+def test_dispatch_pulls_ids_lazily_with_bounded_workers():
+    produced = []
+    running = 0
+    peak = 0
+
+    def ids():
+        for job_id in range(100):
+            produced.append(job_id)
+            yield job_id
+
+    handled = []
+
+    async def handle(job_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Never more than the workers plus the queue ahead of the consumer
+        assert len(produced) - len(handled) <= 3 + 2 * 3 + 1
+        await asyncio.sleep(0)
+        handled.append(job_id)
+        running -= 1
+
+    asyncio.run(dispatch(ids(), 3, handle))
+
+    assert sorted(handled) == list(range(100))
+    assert peak == 3
+
+
+def test_iter_job_ids_pages_over_planned_jobs(db_session):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.PENDING)
+    target = db_repo.create_target(db_session, address="192.0.2.1")
+    job_ids = [
+        db_repo.create_job(db_session, scan_run_id=run.id, target_id=target.id, status=JobStatus.PLANNED).id
+        for _ in range(7)
+    ]
+    db_repo.update_job(db_session, job_ids[2], status=JobStatus.COMPLETED)
+
+    pages = db_repo.iter_job_ids(db_session, run.id, page_size=2)
+    assert next(pages) == job_ids[0]
+    # A job finished while the iterator is paused is skipped, none is repeated
+    db_repo.update_job(db_session, job_ids[3], status=JobStatus.RUNNING)
+    assert list(pages) == [job_ids[1]] + job_ids[4:]
+    assert list(db_repo.iter_job_ids(db_session, run.id, after=job_ids[4])) == job_ids[5:]
+    assert db_repo.count_jobs_for_scan_run(db_session, run.id, JobStatus.PLANNED) == 5
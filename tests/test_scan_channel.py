@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from web_api.scan_manager import ScanChannel, scan_manager
+
+
+async def _drain(subscription):
+    messages = []
+    while (message := await subscription.get()) is not None:
+        messages.append(message)
+    return messages
+
+
+def test_every_subscriber_gets_every_message(chunk_update, scan_complete):
+    async def scenario():
+        channel = ScanChannel("1")
+        first, second = await channel.subscribe(), await channel.subscribe()
+        for i in range(3):
+            await channel.put(chunk_update(i, "RUNNING"))
+        channel.put_nowait(scan_complete())
+        channel.put_nowait(None)
+        late = await channel.subscribe()
+        return await _drain(first), await _drain(second), await _drain(late), channel.stats()
+
+    first, second, late, stats = asyncio.run(scenario())
+    assert first == second == [
+        chunk_update(0, "RUNNING", 1), chunk_update(1, "RUNNING", 2), chunk_update(2, "RUNNING", 3), scan_complete(4),
+    ]
+    assert late == []
+    assert stats["published"] == 4 and stats["delivered"] == 8 and stats["dropped"] == 0
+
+
+def test_slow_subscriber_gets_coalesced_state(chunk_update, scan_complete):
+    async def scenario():
+        channel = ScanChannel("1", buffer_size=4)
+        slow = await channel.subscribe()
+        # Two states for each of chunks 0-2: the buffer fills and coalesces
+        for status in ("RUNNING", "COMPLETED"):
+            for i in range(3):
+                channel.put_nowait(chunk_update(i, status))
+        # More distinct chunks than fit: the oldest states go
+        for i in range(3, 6):
+            channel.put_nowait(chunk_update(i, "COMPLETED"))
+        channel.put_nowait(scan_complete())
+        channel.put_nowait(None)
+        return await _drain(slow), slow
+
+    messages, slow = asyncio.run(scenario())
+    assert messages == [
+        chunk_update(3, "COMPLETED", 7), chunk_update(4, "COMPLETED", 8), chunk_update(5, "COMPLETED", 9), scan_complete(10),
+    ]
+    assert slow.coalesced == 3
+    assert slow.dropped == 3
+    assert slow.max_lag == 4
+
+
+def test_buffer_is_bounded_without_subscribers(chunk_update):
+    channel = ScanChannel("1", buffer_size=2)
+    for i in range(10_000):
+        channel.put_nowait(chunk_update(i, "COMPLETED"))
+    assert channel.stats()["published"] == 10_000
+    assert channel.stats()["subscribers"] == 0
+
+
+def test_two_websocket_clients_watch_one_scan(client_with_db, chunk_update, scan_complete):
+    channel = ScanChannel("77")
+    scan_manager.register_scan("77", None, channel)
+    try:
+        with client_with_db.websocket_connect("/ws/scans/77") as first, client_with_db.websocket_connect(
+            "/ws/scans/77"
+        ) as second:
+            # Wait until both have subscribed, then publish on the app's loop
+            for _ in range(200):
+                if len(channel.subscribers) == 2:
+                    break
+                time.sleep(0.01)
+            for message in (chunk_update(5, "RUNNING"), scan_complete(), None):
+                client_with_db.portal.call(channel.put_nowait, message)
+            for websocket in (first, second):
+                assert websocket.receive_json() == chunk_update(5, "RUNNING", 1)
+                assert websocket.receive_json() == scan_complete(2)
+                with pytest.raises(WebSocketDisconnect):
+                    websocket.receive_json()
+    finally:
+        scan_manager.deregister_scan("77")
+    assert channel.stats()["delivered"] == 4
+
+
+def test_batches_keep_the_latest_update_per_chunk(chunk_update, scan_complete):
+    async def scenario():
+        channel = ScanChannel("1")
+        subscription = await channel.subscribe()
+        for i in range(3):
+            channel.put_nowait(chunk_update(i, "RUNNING"))
+        channel.put_nowait(chunk_update(0, "COMPLETED"))
+
+        async def late_update():
+            await asyncio.sleep(0.01)
+            channel.put_nowait(chunk_update(2, "FAILED"))
+            channel.put_nowait(scan_complete())
+            channel.put_nowait(chunk_update(3, "RUNNING"))
+            channel.put_nowait(None)
+
+        task = asyncio.create_task(late_update())
+        frames = []
+        while (frame := await subscription.get_batch(1.0)) is not None:
+            frames.append(frame)
+        await task
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert frames == [
+        {
+            "type": "CHUNK_UPDATES",
+            "payload": {"updates": [chunk_update(1, "RUNNING")["payload"], chunk_update(0, "COMPLETED")["payload"], chunk_update(2, "FAILED")["payload"]]},
+            "seq": 5,
+        },
+        scan_complete(6),
+        {"type": "CHUNK_UPDATES", "payload": {"updates": [chunk_update(3, "RUNNING")["payload"]]}, "seq": 7},
+    ]
+
+
+def test_websocket_batches_and_negotiates_encoding(client_with_db, monkeypatch, chunk_update):
+    channel = ScanChannel("78")
+    scan_manager.register_scan("78", None, channel)
+    try:
+        with client_with_db.websocket_connect("/ws/scans/78?batch_ms=50") as websocket:
+            for _ in range(200):
+                if channel.subscribers:
+                    break
+                time.sleep(0.01)
+            for message in (chunk_update(1, "RUNNING"), chunk_update(2, "RUNNING"), chunk_update(1, "COMPLETED"), None):
+                client_with_db.portal.call(channel.put_nowait, message)
+            frame = websocket.receive_json()
+            assert frame["type"] == "CHUNK_UPDATES"
+            assert [u["chunk_id"] for u in frame["payload"]["updates"]] == ["2", "1"]
+
+        monkeypatch.setattr("web_api.app.msgpack", None)
+        for query in ("encoding=msgpack", "encoding=xml", "batch_ms=-1"):
+            with client_with_db.websocket_connect(f"/ws/scans/78?{query}") as websocket:
+                with pytest.raises(WebSocketDisconnect) as excinfo:
+                    websocket.receive_json()
+                assert excinfo.value.code == 1008
+    finally:
+        scan_manager.deregister_scan("78")
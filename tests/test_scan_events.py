@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from src.db import repository as db_repo
+from src.db.models import JobStatus
+from web_api import scan_manager as scan_manager_module
+from web_api.scan_manager import EventStore, ScanChannel, event_store, scan_manager
+
+
+async def _seqs(subscription):
+    seqs = []
+    while subscription._pending:
+        seqs.append((await subscription.get())["seq"])
+    return seqs
+
+
+def test_resume_from_memory_store_or_snapshot(db_session, monkeypatch, chunk_update, scan_complete):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.RUNNING)
+
+    async def scenario():
+        channel = ScanChannel(str(run.id), store=EventStore(), log_size=3)
+        for i in range(10):
+            channel.put_nowait(chunk_update(i % 4, "RUNNING"))
+
+        # The last three are in memory, older ones come from the store
+        assert await _seqs(await channel.subscribe(since=7)) == [8, 9, 10]
+        assert await _seqs(await channel.subscribe(since=2)) == [3, 4, 5, 6, 7, 8, 9, 10]
+        assert await _seqs(await channel.subscribe(since=10)) == []
+
+        monkeypatch.setattr(scan_manager_module, "REPLAY_LIMIT", 5)
+        for since in (2, 11):
+            subscription = await channel.subscribe(since=since)
+            assert subscription.needs_snapshot and subscription.start_seq == 10
+            assert await _seqs(subscription) == []
+        monkeypatch.undo()
+
+        # Messages published while the store is read follow the replay
+        subscribing = asyncio.ensure_future(channel.subscribe(since=1))
+        await asyncio.sleep(0)
+        channel.put_nowait(chunk_update(0, "COMPLETED"))
+        assert await _seqs(await subscribing) == list(range(2, 12))
+
+        # Once the scan ends the stored log keeps the latest message per chunk
+        channel.put_nowait(scan_complete())
+        channel.put_nowait(None)
+        await channel.drain()
+        assert [e.seq for e in db_repo.list_scan_events(db_session, run.id)] == [7, 8, 10, 11, 12]
+
+        # A channel for the finished scan carries on from the stored log
+        restored = await ScanChannel.restore(str(run.id), EventStore(), closed=True)
+        assert restored.seq == 12
+        assert await _seqs(await restored.subscribe(since=9)) == [10, 11, 12]
+
+    asyncio.run(scenario())
+
+
+def test_websocket_and_sse_resume(client_with_db, db_session, chunk_update, scan_complete):
+    run = db_repo.create_scan_run(db_session, status=JobStatus.RUNNING)
+    scan_id = str(run.id)
+    channel = ScanChannel(scan_id, store=event_store)
+    scan_manager.register_scan(scan_id, None, channel)
+    try:
+        for i in range(3):
+            client_with_db.portal.call(channel.put_nowait, chunk_update(i, "RUNNING"))
+
+        with client_with_db.websocket_connect(f"/ws/scans/{scan_id}?since=1") as websocket:
+            assert [websocket.receive_json()["seq"] for _ in range(2)] == [2, 3]
+
+        # Too far ahead: the client gets the scan's state instead
+        with client_with_db.websocket_connect(f"/ws/scans/{scan_id}?since=99") as websocket:
+            snapshot = websocket.receive_json()
+        assert snapshot["type"] == "SNAPSHOT" and snapshot["seq"] == 3
+        assert snapshot["payload"]["status"] == "RUNNING"
+        assert "results" not in snapshot["payload"]
+
+        client_with_db.portal.call(channel.put_nowait, chunk_update(0, "COMPLETED"))
+        client_with_db.portal.call(channel.put_nowait, scan_complete())
+        client_with_db.portal.call(channel.put_nowait, None)
+        client_with_db.portal.call(channel.drain)
+    finally:
+        scan_manager.deregister_scan(scan_id)
+
+    # The scan is over, but a resuming client still gets what it missed
+    response = client_with_db.get(f"/api/scans/{scan_id}/events", headers={"Last-Event-ID": "2"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.splitlines() for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["id: 3", "id: 4", "id: 5"]
+    assert [json.loads(lines[1][len("data: "):])["payload"]["status"] for lines in events] == [
+        "RUNNING", "COMPLETED", "COMPLETED",
+    ]
+
+    assert client_with_db.get(f"/api/scans/{scan_id}/events").status_code == 404
+    assert client_with_db.get("/api/scans/999/events?since=0").status_code == 404
@@ -0,0 +1,118 @@
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+from src.db import repository as db_repo
+from src.db.models import JobStatus
+
+
+def _wait_for(client, run_id, predicate, session=None, timeout=20):
+    deadline = time.monotonic() + timeout
+    while True:
+        if session is not None:
+            # The app shares the test's session; drop what it has cached
+            session.expire_all()
+        data = client.get(f"/api/scans/{run_id}").json()["data"]
+        if predicate(data):
+            return data
+        assert time.monotonic() < deadline, data
+        time.sleep(0.05)
+
+
+def test_submission_only_stores_request_and_reports_planning(client_with_db, db_session, fake_nmap, monkeypatch):
+    release = threading.Event()
+    materialize_jobs = db_repo.materialize_jobs
+
+    def held_materialize_jobs(*args, **kwargs):
+        assert release.wait(20)
+        return materialize_jobs(*args, **kwargs)
+
+    monkeypatch.setattr("src.dispatcher.PLAN_CHUNK_SIZE", 2)
+    monkeypatch.setattr("src.dispatcher.db_repo.materialize_jobs", held_materialize_jobs)
+
+    response = client_with_db.post(
+        "/api/scans",
+        json={"targets": ["192.0.2.0/29"], "exclude": ["192.0.2.6"], "nmap_options": "-F", "scan_type": "TCP"},
+    )
+    assert response.status_code == 202
+    run_id = int(response.json()["scan_id"])
+
+    try:
+        # The run is read before its batch targets are counted, so wait for both
+        data = _wait_for(
+            client_with_db,
+            run_id,
+            lambda d: d["planning"] == {"targets_total": 5, "targets_planned": 5},
+            db_session,
+        )
+        assert data["status"] == "PLANNING"
+        assert data["planning"] == {"targets_total": 5, "targets_planned": 5}
+        assert data["progress"]["total_chunks"] == 0
+    finally:
+        release.set()
+
+    data = _wait_for(client_with_db, run_id, lambda d: d["status"] in ("COMPLETED", "FAILED"), db_session)
+    assert data["status"] == "COMPLETED"
+    assert data["planning"] is None
+    assert data["progress"]["total_chunks"] == 5
+    progress = client_with_db.get(f"/api/scans/{run_id}", params={"include_results": "false"}).json()["data"]
+    assert progress["results"] == {"hosts": {}}
+    assert progress["progress"] == {
+        "total_chunks": 5,
+        "completed_chunks": 5,
+        "failed_chunks": 0,
+        "running_chunks": 0,
+        "hosts_up": 5,
+        "hosts_down": 0,
+    }
+    db_session.expire_all()
+    run = db_repo.get_scan_run(db_session, run_id)
+    assert run.options == "-sT -F"
+    assert '"exclude":["192.0.2.6"]' in run.request_json
+
+
+@patch("web_api.app.scan_task_wrapper", new_callable=AsyncMock)
+def test_large_request_is_planned_without_expansion_limit(mock_scan_wrapper, client_with_db, db_session):
+    response = client_with_db.post("/api/scans", json={"targets": ["10.1.0.0/18"], "nmap_options": "-F"})
+    assert response.status_code == 202
+    run_id = int(response.json()["scan_id"])
+
+    deadline = time.monotonic() + 20
+    while not mock_scan_wrapper.await_count:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    job_ids = mock_scan_wrapper.await_args.args[1]
+    assert len(job_ids) == 2**14 - 2
+    assert db_repo.count_jobs_for_scan_run(db_session, run_id, JobStatus.PENDING) == 2**14 - 2
+    assert db_repo.get_scan_run(db_session, run_id).status == JobStatus.PENDING
+
+
+def test_invalid_targets_are_rejected_before_planning(client_with_db, db_session):
+    response = client_with_db.post("/api/scans", json={"targets": ["10.0.0.5-10.0.0.1"], "nmap_options": "-F"})
+    assert response.status_code == 400
+    assert db_repo.list_scan_runs(db_session) == []
+
+
+def test_oversized_requests_are_rejected(client_with_db, db_session, monkeypatch):
+    for targets in (["0.0.0.0/0"], ["2001:db8::/64"]):
+        response = client_with_db.post("/api/scans", json={"targets": targets, "nmap_options": "-F"})
+        assert response.status_code == 400
+        assert "more than the limit" in response.json()["detail"]
+
+    monkeypatch.setattr("src.dispatcher.MAX_TARGETS", 4)
+    response = client_with_db.post("/api/scans", json={"targets": ["192.0.2.1-192.0.2.5"], "nmap_options": "-F"})
+    assert response.status_code == 400
+    assert db_repo.list_scan_runs(db_session) == []
+
+
+def test_planning_failure_fails_the_scan(client_with_db, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr("src.dispatcher.db_repo.add_batch_targets", broken)
+    response = client_with_db.post("/api/scans", json={"targets": ["192.0.2.1"], "nmap_options": "-F"})
+    run_id = int(response.json()["scan_id"])
+
+    data = _wait_for(client_with_db, run_id, lambda d: d["status"] != "PLANNING")
+    assert data["status"] == "FAILED"
+    assert data["progress"]["total_chunks"] == 0
@@ -1,22 +1,29 @@
 """Main FastAPI application for the NetScanOrchestrator."""
 
 import asyncio
+import ipaddress
 import json
 import os
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from fastapi import (
     APIRouter,
     Depends,
     FastAPI,
     HTTPException,
+    Request,
     WebSocket,
     WebSocketDisconnect,
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
+
+try:
+    import msgpack
+except ImportError:  # Optional; only needed for ?encoding=msgpack on the WebSocket
+    msgpack = None
 
 # Adjust path to import from parent directories
 import sys
@@ -24,11 +31,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from src.db import models as db_models
 from src.db import repository as db_repo
-from src.db.session import get_session, init_engine
-from src.ip_handler import expand_targets
-from src.runner import run_jobs_concurrently
+from src.db.session import get_session, init_engine, new_session
+from src.difficulty import DEFAULT_MIN_TIMEOUTS, difficult_targets
+from src.dispatcher import check_target_count, execute_scan_run, owner_id, run_submitted_scan
+from src.ip_handler import address_key, plan_targets
 from web_api import deps, models
-from web_api.scan_manager import scan_manager
+from web_api.scan_manager import ScanChannel, event_store, scan_manager
 
 # --- FastAPI App Initialization ---
 
@@ -53,24 +61,37 @@ app.add_middleware(
 
 # --- Background Task Management ---
 
-async def scan_task_wrapper(scan_run_id: int, job_ids: List[int], update_queue: asyncio.Queue):
+# Leave submitted scans in the queue for ``netscan dispatcher`` instead of
+# running them in this process
+USE_DISPATCHER = os.environ.get("NETSCAN_DISPATCHER", "").lower() in ("1", "true", "yes")
+
+
+async def scan_task_wrapper(scan_run_id: int, job_ids: Sequence[int], update_queue: ScanChannel):
     """A wrapper to manage the DB session for the background scan task."""
     db = get_session()
     try:
-        concurrency = os.cpu_count() or 4
-        timeout_sec = 600
-        await run_jobs_concurrently(
-            scan_run_id=scan_run_id,
-            job_ids=job_ids,
-            db_session=db,
-            concurrency=concurrency,
-            timeout_sec=timeout_sec,
-            update_queue=update_queue,
-        )
+        await execute_scan_run(db, scan_run_id, job_ids, update_queue)
     finally:
         db.close()
         scan_manager.deregister_scan(str(scan_run_id))
 
+
+def _parse_request_targets(scan_request: models.ScanRequest):
+    """Parse, deduplicate and apply exclusions to a request's targets."""
+    return plan_targets(
+        scan_request.targets,
+        exclude=scan_request.exclude,
+        hosts_only=not scan_request.range_targets,
+    )
+
+
+async def plan_scan_task(scan_run_id: int, update_queue: ScanChannel):
+    """Plan a submitted scan off the event loop, then run it."""
+    try:
+        await run_submitted_scan(scan_run_id, update_queue, get_session, scan_task_wrapper)
+    finally:
+        scan_manager.deregister_scan(str(scan_run_id))
+
 # --- API Router Definition ---
 
 router = APIRouter()
@@ -95,54 +116,166 @@ async def start_scan(
         if scan_type_flag and scan_type_flag not in nmap_options:
             nmap_options = f"{scan_type_flag} {nmap_options}"
 
+    # Only the syntax and the total size are checked here; ranges stay
+    # unexpanded until the planning stage
     try:
-        validated_targets = expand_targets(scan_request.targets, max_expand=4096)
+        targets = _parse_request_targets(scan_request)
+        if not targets:
+            raise HTTPException(status_code=400, detail="No valid targets provided.")
+        check_target_count(targets)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid target specification: {e}")
 
-    if not validated_targets:
-        raise HTTPException(status_code=400, detail="No valid targets provided.")
-
     try:
         scan_run = db_repo.create_scan_run(
-            db, status=db_models.JobStatus.PENDING, options=nmap_options
+            db,
+            status=db_models.JobStatus.PLANNED,
+            options=nmap_options,
+            request_json=scan_request.model_dump_json(),
+            claimed_by=None if USE_DISPATCHER else owner_id(),
         )
-        db.commit()
-
-        job_ids = []
-        for target_address in validated_targets:
-            target = db_repo.get_target_by_address(db, address=target_address)
-            if not target:
-                target = db_repo.create_target(db, address=target_address)
-                db.commit()
-
-            job = db_repo.create_job(
-                db,
-                scan_run_id=scan_run.id,
-                target_id=target.id,
-                status=db_models.JobStatus.PENDING,
-                nmap_options=nmap_options,
-            )
-            job_ids.append(job.id)
-        db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error during scan setup: {e}")
 
-    update_queue = asyncio.Queue()
-    task = asyncio.create_task(scan_task_wrapper(scan_run.id, job_ids, update_queue))
-    scan_manager.register_scan(str(scan_run.id), task, update_queue)
+    if USE_DISPATCHER:
+        return models.ScanResponse(scan_id=str(scan_run.id))
+    channel = ScanChannel(str(scan_run.id), store=event_store)
+    task = asyncio.create_task(plan_scan_task(scan_run.id, channel))
+    scan_manager.register_scan(str(scan_run.id), task, channel)
 
     return models.ScanResponse(scan_id=str(scan_run.id))
 
 
-@router.get(
-    "/api/scans/{scan_id}",
-    response_model=models.ApiResponse,
-    tags=["Scans"],
-)
-async def get_scan_status(scan_id: str, db: Session = Depends(deps.get_db)):
-    """Retrieves the status, progress, and results of a scan."""
+def _host_entry(ip_data, default_reason: str) -> Dict[str, Any]:
+    """Return the HostResult fields for one host entry of a job's summary."""
+    # Default to a down/unknown state
+    host = {"status": "down", "ports": [], "reason": default_reason}
+    if isinstance(ip_data, dict):
+        host["status"] = ip_data.get("status", {}).get("state", "unknown")
+        host["reason"] = ip_data.get("status", {}).get("reason", "N/A")
+
+        # Extract open TCP ports
+        tcp_ports = ip_data.get("tcp", {})
+        host["ports"] = [int(p) for p, d in tcp_ports.items() if d.get("state") == "open"]
+    return host
+
+
+def _job_hosts(address: str, kind, job_status, summary_json: Optional[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(address, host)`` for one row of ``db_repo.iter_job_summaries``."""
+    summary = None
+    if summary_json:
+        try:
+            summary = json.loads(summary_json)
+        except json.JSONDecodeError:
+            # If parsing fails, we stick with the default "down" status
+            pass
+
+    if kind == db_models.TargetKind.RANGE:
+        # Range targets only contribute the hosts nmap actually reported, in
+        # address order so that a host page can resume after any of them.
+        reported = [(a, d) for a, d in (summary or {}).items() if isinstance(d, dict)]
+        reported.sort(key=lambda item: (address_key(item[0]) is None, address_key(item[0]) or 0))
+        for host_address, ip_data in reported:
+            yield host_address, _host_entry(ip_data, job_status.name.lower())
+        return
+
+    # The summary is a dict where keys are IPs
+    ip_data = next(iter(summary.values()), None) if isinstance(summary, dict) else None
+
+    # Use the job's target address as the key.
+    # This assumes one job per target address in a scan run.
+    yield address, _host_entry(ip_data, job_status.name.lower())
+
+
+class HostFilter:
+    """The host filters of ``GET /api/scans/{scan_id}/hosts``.
+
+    The repository narrows the jobs through their observations; each host is
+    then checked again because a range job reports many hosts.
+    """
+
+    def __init__(
+        self,
+        status: Optional[str] = None,
+        open_ports: Optional[bool] = None,
+        port: Optional[int] = None,
+        subnet: Optional[str] = None,
+    ):
+        try:
+            self.network = ipaddress.ip_network(subnet, strict=False) if subnet else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid subnet: {e}")
+        self.status = status
+        self.open_ports = open_ports
+        self.port = port
+
+    def iter_jobs(self, db: Session, run_id: int, after: int, page_size: int):
+        return db_repo.iter_job_summaries(
+            db,
+            run_id,
+            after=after,
+            host_state="up" if self.status == "up" else None,
+            with_open_ports=bool(self.open_ports),
+            open_port=self.port,
+            page_size=page_size,
+        )
+
+    def matches(self, address: str, host: Dict[str, Any]) -> bool:
+        if self.status is not None and host["status"] != self.status:
+            return False
+        if self.open_ports is not None and bool(host["ports"]) != self.open_ports:
+            return False
+        if self.port is not None and self.port not in host["ports"]:
+            return False
+        if self.network is not None:
+            try:
+                return ipaddress.ip_address(address) in self.network
+            except ValueError:  # a hostname target
+                return False
+        return True
+
+
+def _parse_cursor(cursor: str) -> Tuple[int, Optional[str]]:
+    """Split a host page cursor, ``<job_id>`` or ``<job_id>:<address>``."""
+    job, sep, address = cursor.partition(":")
+    try:
+        job_id = int(job)
+    except ValueError:
+        job_id = -1
+    if job_id < 0 or (sep and not address):
+        raise HTTPException(status_code=400, detail="cursor must be <job_id> or <job_id>:<address>.")
+    return job_id, address or None
+
+
+def _iter_hosts(
+    db: Session,
+    run_id: int,
+    host_filter: HostFilter,
+    cursor: Tuple[int, Optional[str]] = (0, None),
+    page_size: int = 1000,
+) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """Yield ``(job_id, address, host)`` of a run's matching hosts in job order.
+
+    ``cursor`` is a parsed :func:`_parse_cursor`: hosts start after that job,
+    or after that address within the job.
+    """
+    after_job, after_address = cursor
+    if after_address is None:
+        start, after_key = after_job, None
+    else:
+        start, after_key = after_job - 1, address_key(after_address)
+    for job_id, address, kind, job_status, summary_json in host_filter.iter_jobs(db, run_id, start, page_size):
+        for host_address, host in _job_hosts(address, kind, job_status, summary_json):
+            if job_id == after_job and after_address is not None:
+                key = address_key(host_address)
+                if key is None or after_key is None or key <= after_key:
+                    continue
+            if host_filter.matches(host_address, host):
+                yield job_id, host_address, host
+
+
+def _get_run(db: Session, scan_id: str) -> db_models.ScanRun:
     try:
         run_id = int(scan_id)
     except ValueError:
@@ -151,73 +284,353 @@ async def get_scan_status(scan_id: str, db: Session = Depends(deps.get_db)):
     scan_run = db_repo.get_scan_run(db, run_id)
     if not scan_run:
         raise HTTPException(status_code=404, detail="Scan not found.")
+    return scan_run
+
+
+def _scan_progress(db: Session, scan_run: db_models.ScanRun) -> Dict[str, Any]:
+    """Return the ScanProgressResponse fields of a run, read from its counters."""
+    stats = db_repo.get_scan_run_stats(db, scan_run.id)
+    if stats:
+        progress = models.ScanProgress(
+            total_chunks=stats.total,
+            completed_chunks=stats.completed,
+            failed_chunks=stats.failed,
+            running_chunks=stats.running,
+            hosts_up=stats.hosts_up,
+            hosts_down=stats.hosts_down,
+        )
+    else:
+        progress = models.ScanProgress(total_chunks=0, completed_chunks=0, failed_chunks=0)
+
+    planning = None
+    # Runs planned by the CLI have no stored request and are never claimed
+    if (
+        scan_run.status == db_models.JobStatus.PLANNED
+        and scan_run.claimed_by is None
+        and scan_run.request_json is not None
+    ):
+        scan_status = models.ScanStatus.QUEUED
+    elif scan_run.status == db_models.JobStatus.PLANNED:
+        scan_status = models.ScanStatus.PLANNING
+        planning = models.PlanningProgress(
+            targets_total=scan_run.target_count,
+            targets_planned=db_repo.count_batch_targets_for_scan_run(db, scan_run.id),
+        )
+    else:
+        scan_status = scan_run.status.name.upper()
+    return dict(scan_id=str(scan_run.id), status=scan_status, progress=progress, planning=planning)
 
-    jobs = db_repo.list_jobs_for_scan_run(db, run_id)
 
-    progress = models.ScanProgress(
-        total_chunks=len(jobs),
-        completed_chunks=sum(1 for j in jobs if j.status == db_models.JobStatus.COMPLETED),
-        failed_chunks=sum(1 for j in jobs if j.status == db_models.JobStatus.FAILED),
-    )
+@router.get(
+    "/api/scans/{scan_id}",
+    response_model=models.ApiResponse,
+    tags=["Scans"],
+)
+async def get_scan_status(
+    scan_id: str, include_results: bool = True, db: Session = Depends(deps.get_db)
+):
+    """Retrieves the status, progress, and results of a scan.
+
+    Progress comes from the run's counters and costs the same for any run
+    size; pollers that only need progress can skip the per-host results
+    with ``include_results=false`` or use the ``/progress`` endpoint.
+    Large runs are better read through the paged ``/hosts`` endpoint.
+    """
+    scan_run = _get_run(db, scan_id)
 
     hosts_results = {}
-    for job in jobs:
-        target_address = job.target.address if job.target else f"unknown_target_{job.target_id}"
+    if include_results:
+        for _job_id, address, host in _iter_hosts(db, scan_run.id, HostFilter()):
+            hosts_results[address] = models.HostResult(**host)
 
-        # Default to a down/unknown state
-        host_result = models.HostResult(status="down", ports=[], reason=job.status.name.lower())
+    scan_status_data = models.ScanStatusResponse(
+        **_scan_progress(db, scan_run), results=models.ScanResults(hosts=hosts_results)
+    )
+    return models.ApiResponse(data=scan_status_data)
 
-        if job.results and job.results[-1].summary_json:
-            try:
-                summary = json.loads(job.results[-1].summary_json)
-                # The summary is now a dict where keys are IPs
-                ip_data = next(iter(summary.values()), None)
 
-                if isinstance(ip_data, dict):
-                    host_result.status = ip_data.get("status", {}).get("state", "unknown")
-                    host_result.reason = ip_data.get("status", {}).get("reason", "N/A")
+@router.get(
+    "/api/scans/{scan_id}/progress",
+    response_model=models.ApiResponse,
+    tags=["Scans"],
+)
+async def get_scan_progress(scan_id: str, db: Session = Depends(deps.get_db)):
+    """Retrieves only the status and progress of a scan, for cheap polling."""
+    scan_run = _get_run(db, scan_id)
+    return models.ApiResponse(data=models.ScanProgressResponse(**_scan_progress(db, scan_run)))
+
+
+# Fields a client may select from each host; address and job_id are always sent
+HOST_FIELDS = tuple(models.HostResult.model_fields)
+MAX_HOSTS_PAGE = 5000
+
+
+def _host_fields(fields: Optional[str]) -> Sequence[str]:
+    if not fields:
+        return HOST_FIELDS
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(selected) - set(HOST_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(HOST_FIELDS)}.",
+        )
+    return selected
 
-                    # Extract TCP ports
-                    tcp_ports = ip_data.get("tcp", {})
-                    host_result.ports = [int(p) for p in tcp_ports.keys()]
-            except (json.JSONDecodeError, KeyError, StopIteration):
-                # If parsing fails, we stick with the default "down" status
-                pass
 
-        # Use the job's target address as the key.
-        # This assumes one job per target address in a scan run.
-        hosts_results[target_address] = host_result
+def _host_record(job_id: int, address: str, host: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    return {"address": address, "job_id": job_id, **{f: host[f] for f in fields}}
 
-    scan_status_data = models.ScanStatusResponse(
-        scan_id=scan_id,
-        status=scan_run.status.name.upper(),
-        progress=progress,
-        results=models.ScanResults(hosts=hosts_results),
-    )
-    return models.ApiResponse(data=scan_status_data)
+
+@router.get(
+    "/api/scans/{scan_id}/hosts",
+    response_model=models.ApiResponse,
+    tags=["Scans"],
+)
+async def list_scan_hosts(
+    scan_id: str,
+    cursor: str = "0",
+    limit: int = 500,
+    fields: Optional[str] = None,
+    host_filter: HostFilter = Depends(),
+    db: Session = Depends(deps.get_db),
+):
+    """Retrieves one page of a scan's hosts, in job order.
+
+    Pages are keyed on the job id and address of their last host: pass the
+    returned ``next_cursor`` as ``cursor`` to get the next one.  A page holds
+    ``limit`` hosts unless it is the last; the hosts of a range job carry on
+    over as many pages as they need.
+    """
+    if not 1 <= limit <= MAX_HOSTS_PAGE:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{MAX_HOSTS_PAGE}.")
+    after = _parse_cursor(cursor)
+    selected = _host_fields(fields)
+    scan_run = _get_run(db, scan_id)
+
+    hosts: List[Dict[str, Any]] = []
+    next_cursor = None
+    for job_id, address, host in _iter_hosts(db, scan_run.id, host_filter, cursor=after, page_size=limit):
+        if len(hosts) == limit:
+            next_cursor = f"{hosts[-1]['job_id']}:{hosts[-1]['address']}"
+            break
+        hosts.append(_host_record(job_id, address, host, selected))
+    return models.ApiResponse(data=models.HostPage(scan_id=scan_id, hosts=hosts, next_cursor=next_cursor))
+
+
+@router.get(
+    "/api/scans/{scan_id}/hosts.ndjson",
+    tags=["Scans"],
+)
+def stream_scan_hosts(
+    scan_id: str,
+    cursor: str = "0",
+    fields: Optional[str] = None,
+    host_filter: HostFilter = Depends(),
+    db: Session = Depends(deps.get_db),
+):
+    """Streams a scan's hosts as newline-delimited JSON, one host per line.
+
+    Takes the same filters as ``/hosts`` and writes each host as soon as its
+    page of jobs has been read, so memory use does not grow with the run.
+    """
+    after = _parse_cursor(cursor)
+    selected = _host_fields(fields)
+    scan_run = _get_run(db, scan_id)
+
+    def lines():
+        for job_id, address, host in _iter_hosts(db, scan_run.id, host_filter, cursor=after):
+            yield json.dumps(_host_record(job_id, address, host, selected)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/api/targets/difficult",
+    response_model=models.ApiResponse,
+    tags=["Targets"],
+)
+async def list_difficult_targets(
+    min_timeouts: int = DEFAULT_MIN_TIMEOUTS,
+    min_p90: Optional[float] = None,
+    limit: int = 100,
+    db: Session = Depends(deps.get_db),
+):
+    """Lists targets that time out or scan slowly across runs, worst first."""
+    if min_timeouts < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="min_timeouts must be >= 0 and limit >= 1.")
+    found = difficult_targets(db, min_timeouts=min_timeouts or None, min_p90=min_p90)
+    targets = [
+        models.DifficultTarget(
+            target_id=d.target_id,
+            address=d.address,
+            jobs=d.jobs,
+            timeouts=d.timeouts,
+            p50_seconds=round(d.p50, 3),
+            p90_seconds=round(d.p90, 3),
+            max_seconds=round(d.max_seconds, 3),
+        )
+        for d in found[:limit]
+    ]
+    return models.ApiResponse(data=models.DifficultTargetsResponse(total=len(found), targets=targets))
+
+
+# Seconds a single frame may take to reach a client before it is disconnected
+WS_SEND_TIMEOUT = 10.0
+# Longest CHUNK_UPDATES batching window a client may ask for
+WS_MAX_BATCH_MS = 5000
+WS_ENCODINGS = ("json", "msgpack")
+# Seconds between comments that keep an idle event stream open
+SSE_KEEPALIVE = 15.0
+
+
+def _run_unfinished(scan_id: str) -> bool:
+    # A session of its own: the thread's shared one may be running a scan
+    db = new_session()
+    try:
+        scan_run = db_repo.get_scan_run(db, int(scan_id))
+        return scan_run is not None and scan_run.status not in (
+            db_models.JobStatus.COMPLETED,
+            db_models.JobStatus.FAILED,
+        )
+    finally:
+        db.close()
+
+
+async def _open_channel(scan_id: str, since: Optional[int]) -> Optional[ScanChannel]:
+    """Return an active scan's channel.
+
+    Scans that ``netscan dispatcher`` executes are followed through the
+    event store.  A client resuming with ``since`` may have missed the end
+    of the scan, so for a scan that is no longer active but has stored
+    events a closed channel replaying them is returned.  The caller has to
+    subscribe before it next awaits.
+    """
+    channel = scan_manager.get_scan_channel(scan_id)
+    if channel is None and scan_id.isdigit():
+        if USE_DISPATCHER and await asyncio.to_thread(_run_unfinished, scan_id):
+            channel = await scan_manager.follow_scan(scan_id, event_store)
+        elif since is not None:
+            channel = await ScanChannel.restore(scan_id, event_store, closed=True)
+            if not channel.seq:
+                channel = None
+    return channel
+
+
+def _snapshot_message(scan_id: str, seq: int) -> Dict[str, Any]:
+    """A SNAPSHOT message with the scan's current status and progress."""
+    db = new_session()
+    try:
+        progress = models.ScanProgressResponse(**_scan_progress(db, db_repo.get_scan_run(db, int(scan_id))))
+    finally:
+        db.close()
+    return {"type": models.WebSocketMessageType.SNAPSHOT.value, "payload": progress.model_dump(mode="json"), "seq": seq}
 
 
 @router.websocket("/ws/scans/{scan_id}")
-async def websocket_endpoint(websocket: WebSocket, scan_id: str):
-    """Provides real-time scan updates over a WebSocket connection."""
+async def websocket_endpoint(
+    websocket: WebSocket,
+    scan_id: str,
+    batch_ms: int = 0,
+    encoding: str = "json",
+    since: Optional[int] = None,
+):
+    """Provides real-time scan updates over a WebSocket connection.
+
+    Every client gets its own subscription to the scan's channel, so any
+    number of them can watch the same scan.  With ``batch_ms`` the chunk
+    updates of each window are sent as one CHUNK_UPDATES frame holding the
+    latest update per chunk; ``encoding=msgpack`` sends binary MessagePack
+    frames instead of JSON text.  A client that reconnects passes the last
+    ``seq`` it received as ``since`` and first gets the messages it missed,
+    or a SNAPSHOT if they are no longer kept.  A client that cannot take a
+    frame within ``WS_SEND_TIMEOUT`` is disconnected with code 1013.
+    """
     await websocket.accept()
-    queue = scan_manager.get_scan_queue(scan_id)
+    channel = await _open_channel(scan_id, since)
 
-    if not queue:
+    if not channel:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Scan not found or not active")
         return
+    if not 0 <= batch_ms <= WS_MAX_BATCH_MS or encoding not in WS_ENCODINGS:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason=f"batch_ms must be 0-{WS_MAX_BATCH_MS} and encoding one of {', '.join(WS_ENCODINGS)}",
+        )
+        return
+    if encoding == "msgpack" and msgpack is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="msgpack encoding is not available")
+        return
 
+    async def send(message):
+        if encoding == "msgpack":
+            await websocket.send_bytes(msgpack.packb(message))
+        else:
+            await websocket.send_json(message)
+
+    subscription = await channel.subscribe(since)
     try:
+        if subscription.needs_snapshot:
+            await send(await asyncio.to_thread(_snapshot_message, scan_id, subscription.start_seq))
         while True:
-            message = await queue.get()
+            if batch_ms:
+                message = await subscription.get_batch(batch_ms / 1000)
+            else:
+                message = await subscription.get()
             if message is None:
+                await websocket.close()
+                break
+            try:
+                await asyncio.wait_for(send(message), WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                subscription.send_timeouts += 1
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Client too slow")
                 break
-            await websocket.send_json(message)
-            queue.task_done()
     except WebSocketDisconnect:
         print(f"Client disconnected from scan {scan_id}")
     except Exception:
         await websocket.close(code=status.WS_1011_INTERNAL_ERROR, reason="Server error")
+    finally:
+        channel.unsubscribe(subscription)
+
+
+def _sse(message: Dict[str, Any]) -> str:
+    return f"id: {message['seq']}\ndata: {json.dumps(message)}\n\n"
+
+
+@router.get("/api/scans/{scan_id}/events", tags=["Scans"])
+async def stream_scan_events(scan_id: str, request: Request, since: Optional[int] = None):
+    """Streams a scan's update messages as server-sent events.
+
+    Each event's ``data`` is a message as sent over the WebSocket and its
+    ``id`` the message's ``seq``.  A reconnecting EventSource resumes through
+    the ``Last-Event-ID`` header; ``since`` does the same explicitly.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+    channel = await _open_channel(scan_id, since)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Scan not found or not active.")
+    subscription = await channel.subscribe(since)
+
+    async def events():
+        try:
+            if subscription.needs_snapshot:
+                yield _sse(await asyncio.to_thread(_snapshot_message, scan_id, subscription.start_seq))
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield _sse(message)
+        finally:
+            channel.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # --- App Configuration ---
 
@@ -15,6 +15,9 @@ class ScanRequest(BaseModel):
     targets: List[str]
     nmap_options: str
     scan_type: Optional[ScanType] = None
+    exclude: List[str] = []
+    # Hand CIDR blocks to nmap instead of creating one job per address
+    range_targets: bool = False
 
 
 class ScanResponse(BaseModel):
@@ -23,6 +26,8 @@ class ScanResponse(BaseModel):
 
 # Status Enum for overall scan status
 class ScanStatus(str, Enum):
+    QUEUED = "QUEUED"  # waiting for netscan dispatcher
+    PLANNING = "PLANNING"
     PENDING = "PENDING"
     RUNNING = "RUNNING"
     COMPLETED = "COMPLETED"
@@ -34,6 +39,9 @@ class ScanProgress(BaseModel):
     total_chunks: int
     completed_chunks: int
     failed_chunks: int
+    running_chunks: int = 0
+    hosts_up: int = 0
+    hosts_down: int = 0
 
 
 class HostResult(BaseModel):
@@ -46,13 +54,47 @@ class ScanResults(BaseModel):
     hosts: Dict[str, HostResult]
 
 
-class ScanStatusResponse(BaseModel):
+class PlanningProgress(BaseModel):
+    targets_total: Optional[int] = None  # None until expansion has finished
+    targets_planned: int
+
+
+# Model for GET /api/scans/{scan_id}/progress
+class ScanProgressResponse(BaseModel):
     scan_id: str
     status: ScanStatus
     progress: ScanProgress
+    planning: Optional[PlanningProgress] = None  # Only while PLANNING
+
+
+class ScanStatusResponse(ScanProgressResponse):
     results: ScanResults
 
 
+# Model for GET /api/scans/{scan_id}/hosts
+class HostPage(BaseModel):
+    scan_id: str
+    # {"address", "job_id"} plus the requested HostResult fields
+    hosts: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None  # "<job_id>:<address>"; None on the last page
+
+
+# Models for GET /api/targets/difficult
+class DifficultTarget(BaseModel):
+    target_id: int
+    address: str
+    jobs: int
+    timeouts: int
+    p50_seconds: float
+    p90_seconds: float
+    max_seconds: float
+
+
+class DifficultTargetsResponse(BaseModel):
+    total: int
+    targets: List[DifficultTarget]
+
+
 class ApiResponse(BaseModel):
     status: str = "success"
     data: Any
@@ -62,6 +104,8 @@ class ApiResponse(BaseModel):
 
 class WebSocketMessageType(str, Enum):
     CHUNK_UPDATE = "CHUNK_UPDATE"
+    CHUNK_UPDATES = "CHUNK_UPDATES"  # Batches of CHUNK_UPDATE payloads, see ?batch_ms=
+    SNAPSHOT = "SNAPSHOT"  # Current state, when the events after ?since= are gone
     SCAN_COMPLETE = "SCAN_COMPLETE"
 
 
@@ -81,6 +125,10 @@ class ChunkUpdatePayload(BaseModel):
     result: Optional[Any] = None  # Minimal result for the host
 
 
+class ChunkUpdatesPayload(BaseModel):
+    updates: List[ChunkUpdatePayload]  # The latest update of each chunk, oldest first
+
+
 class ScanCompletePayload(BaseModel):
     scan_id: str
     status: ScanStatus  # Should be COMPLETED or FAILED
@@ -89,4 +137,5 @@ class ScanCompletePayload(BaseModel):
 
 class WebSocketMessage(BaseModel):
     type: WebSocketMessageType
-    payload: Union[ChunkUpdatePayload, ScanCompletePayload]
+    payload: Union[ChunkUpdatePayload, ChunkUpdatesPayload, ScanCompletePayload, ScanProgressResponse]
+    seq: Optional[int] = None  # Increases by one per message of a scan
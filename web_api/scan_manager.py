@@ -1,19 +1,423 @@
-"""Manages active scan tasks and their communication queues."""
+"""Manages active scan tasks and fans their updates out to subscribers."""
 
 import asyncio
-from typing import Dict, Any, Optional
+import json
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set
+
+from src.db import repository as db_repo
+from src.db.session import new_session
+
+# Messages a subscriber may have waiting before its CHUNK_UPDATEs are coalesced
+SUBSCRIBER_BUFFER = 1024
+
+SUBSCRIBER_COUNTERS = ("delivered", "coalesced", "dropped", "send_timeouts")
+
+# Messages of each scan kept in memory for clients that reconnect
+EVENT_LOG_SIZE = 4096
+# Messages written to the event store at a time
+SAVE_EVERY = 256
+# Most stored messages replayed to one client; further behind gets a snapshot
+REPLAY_LIMIT = 10_000
+# Seconds between reads of the event store by a channel following the dispatcher
+FOLLOW_INTERVAL = 0.5
+# Stored messages read per poll
+FOLLOW_BATCH = 1000
+
+
+def _chunk_key(message: Dict[str, Any]) -> Optional[str]:
+    """The chunk a CHUNK_UPDATE is about; None for any other message."""
+    if isinstance(message, dict) and message.get("type") == "CHUNK_UPDATE":
+        return (message.get("payload") or {}).get("chunk_id")
+    return None
+
+
+class Subscription:
+    """One client's bounded view of a scan's updates.
+
+    Messages wait in a buffer of at most ``maxlen`` entries.  A client that
+    keeps up receives every message in order.  Once the buffer fills, the
+    waiting CHUNK_UPDATEs are coalesced to the latest state of each chunk
+    and, until the client has caught up, a newer update replaces the one
+    still waiting for its chunk instead of queueing behind it.  If the
+    buffer is still full, the oldest chunk states are dropped.  Other
+    messages, such as SCAN_COMPLETE, are never coalesced or dropped.
+    """
+
+    def __init__(self, maxlen: int = SUBSCRIBER_BUFFER):
+        self.maxlen = maxlen
+        self._pending: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._sequence = 0
+        self._coalescing = False
+        self._closed = False
+        self._ready = asyncio.Event()
+        self._held: Optional[List[Optional[Dict[str, Any]]]] = None
+        self.delivered = 0
+        self.coalesced = 0  # updates replaced by a newer state of their chunk
+        self.dropped = 0  # chunk states discarded with the buffer full
+        self.send_timeouts = 0
+        self.max_lag = 0  # most messages ever waiting
+        # Set by ScanChannel.subscribe: the seq when subscribing, and whether
+        # the messages the client asked to replay were no longer kept
+        self.start_seq = 0
+        self.needs_snapshot = False
+
+    def hold(self) -> None:
+        """Keep offered messages back until :meth:`release`."""
+        self._held = []
+
+    def release(self, replay: Iterable[Dict[str, Any]]) -> None:
+        """Offer ``replay``, then the messages held back since :meth:`hold`."""
+        held, self._held = self._held or [], None
+        for message in (*replay, *held):
+            self.offer(message)
+
+    def offer(self, message: Optional[Dict[str, Any]]) -> None:
+        """Add a message without waiting; ``None`` marks the end of the scan."""
+        if self._held is not None:
+            self._held.append(message)
+            return
+        self._ready.set()
+        if message is None:
+            self._closed = True
+            return
+        chunk = _chunk_key(message)
+        if self._coalescing and chunk is not None:
+            if self._pending.pop(("chunk", chunk), None) is not None:
+                self.coalesced += 1
+            key: Hashable = ("chunk", chunk)
+        else:
+            self._sequence += 1
+            key = ("seq", self._sequence)
+        if key not in self._pending and len(self._pending) >= self.maxlen:
+            if not self._coalescing:
+                self._coalesce()
+                if chunk is not None:
+                    key = ("chunk", chunk)
+                    if self._pending.pop(key, None) is not None:
+                        self.coalesced += 1
+            self._make_room()
+        self._pending[key] = message
+        self.max_lag = max(self.max_lag, len(self._pending))
+
+    def _coalesce(self) -> None:
+        """Keep only the latest waiting update of each chunk."""
+        pending: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        for key, message in self._pending.items():
+            chunk = _chunk_key(message)
+            if chunk is not None:
+                key = ("chunk", chunk)
+                if pending.pop(key, None) is not None:
+                    self.coalesced += 1
+            pending[key] = message
+        self._pending = pending
+        self._coalescing = True
+
+    def _make_room(self) -> None:
+        """Drop the oldest chunk states until another message fits."""
+        excess = len(self._pending) - self.maxlen + 1
+        oldest = []
+        for key in self._pending:
+            if len(oldest) >= excess:
+                break
+            if key[0] == "chunk":
+                oldest.append(key)
+        for key in oldest:
+            del self._pending[key]
+        self.dropped += len(oldest)
+
+    def _pop(self) -> Dict[str, Any]:
+        _, message = self._pending.popitem(last=False)
+        if not self._pending:
+            self._coalescing = False
+        self.delivered += 1
+        return message
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """Return the next message, or ``None`` once the scan has ended."""
+        while not self._pending:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._pop()
+
+    async def get_batch(self, window: float) -> Optional[Dict[str, Any]]:
+        """Like :meth:`get`, but merge CHUNK_UPDATEs into one CHUNK_UPDATES message.
+
+        After a CHUNK_UPDATE arrives, further ones are collected for up to
+        ``window`` seconds, keeping the latest state of each chunk.  Any
+        other message ends the batch and is returned by the next call.
+        """
+        message = await self.get()
+        if _chunk_key(message) is None:
+            return message
+        updates = {_chunk_key(message): message["payload"]}
+        seq = message.get("seq")
+        deadline = asyncio.get_running_loop().time() + window
+        while True:
+            if self._pending:
+                following = next(iter(self._pending.values()))
+                chunk = _chunk_key(following)
+                if chunk is None:
+                    break
+                self._pop()
+                updates.pop(chunk, None)
+                updates[chunk] = following["payload"]
+                seq = following.get("seq", seq)
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if self._closed or remaining <= 0:
+                break
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = {"type": "CHUNK_UPDATES", "payload": {"updates": list(updates.values())}}
+        if seq is not None:
+            batch["seq"] = seq  # That of the last update merged
+        return batch
+
+
+class EventStore:
+    """Keeps each scan's event log in the state database (``scan_events``)."""
+
+    def save(self, scan_id: str, messages: List[Dict[str, Any]]) -> None:
+        with _session() as db:
+            db_repo.add_scan_events(db, int(scan_id), messages)
+
+    def load(self, scan_id: str, since: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with _session() as db:
+            return [
+                {"type": event.type, "payload": json.loads(event.payload_json), "seq": event.seq}
+                for event in db_repo.list_scan_events(db, int(scan_id), since, limit)
+            ]
+
+    def last_seq(self, scan_id: str) -> int:
+        with _session() as db:
+            return db_repo.get_last_scan_event_seq(db, int(scan_id))
+
+    def compact(self, scan_id: str) -> int:
+        with _session() as db:
+            return db_repo.compact_scan_events(db, int(scan_id))
+
+
+@contextmanager
+def _session():
+    # Not the thread's shared session, which a scan in this process may be using
+    db = new_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ScanChannel:
+    """Publishes one scan's update messages to all of its subscribers.
+
+    Producers use ``put``/``put_nowait`` like the ``asyncio.Queue`` a scan
+    used to have; neither ever waits for a subscriber, and with nobody
+    subscribed messages are simply discarded.  ``None`` ends the scan: every
+    subscriber receives it after its remaining messages, as do subscribers
+    that arrive later.
+
+    Each message is published with a ``seq`` one above the previous one, so
+    a client that reconnects can pass the last ``seq`` it saw to
+    :meth:`subscribe` and receive what it missed.  The latest ``log_size``
+    messages are kept in memory.  With a ``store`` every message is also
+    written to it, ``SAVE_EVERY`` at a time by a worker thread, and once
+    the scan ends the stored log is compacted to the latest message of each
+    chunk.
+    """
+
+    def __init__(
+        self,
+        scan_id: str,
+        buffer_size: int = SUBSCRIBER_BUFFER,
+        store: Optional[EventStore] = None,
+        log_size: int = EVENT_LOG_SIZE,
+        closed: bool = False,
+        seq: int = 0,
+    ):
+        self.scan_id = scan_id
+        self.buffer_size = buffer_size
+        self.store = store
+        self.closed = closed
+        self.subscribers: Set[Subscription] = set()
+        self.seq = seq
+        self._log: Deque[Dict[str, Any]] = deque(maxlen=log_size)
+        self._unsaved: List[Dict[str, Any]] = []
+        # Store calls run one at a time, in the order they were made
+        self._store_lock = asyncio.Lock()
+        self._writes: Set["asyncio.Task[Any]"] = set()
+        # Counters of subscribers that have left
+        self._totals: Dict[str, int] = dict.fromkeys(("published", *SUBSCRIBER_COUNTERS, "max_lag"), 0)
+
+    @classmethod
+    async def restore(cls, scan_id: str, store: EventStore, **kwargs: Any) -> "ScanChannel":
+        """Return a channel that carries on from the messages already in ``store``."""
+        seq = await asyncio.to_thread(store.last_seq, scan_id)
+        return cls(scan_id, store=store, seq=seq, **kwargs)
+
+    def put_nowait(self, message: Optional[Dict[str, Any]]) -> None:
+        if self.closed:
+            return
+        if message is None:
+            self._save_unsaved()
+            if self.store:
+                self._write(self.store.compact, self.scan_id)
+            self._close()
+            return
+        self.seq += 1
+        message = dict(message, seq=self.seq)
+        self._unsaved.append(message)
+        if len(self._unsaved) >= SAVE_EVERY:
+            self._save_unsaved()
+        self._publish(message)
+
+    async def put(self, message: Optional[Dict[str, Any]]) -> None:
+        self.put_nowait(message)
+
+    def _publish(self, message: Dict[str, Any]) -> None:
+        self._log.append(message)
+        self._totals["published"] += 1
+        for subscription in self.subscribers:
+            subscription.offer(message)
+
+    def _close(self) -> None:
+        self.closed = True
+        for subscription in self.subscribers:
+            subscription.offer(None)
+
+    def receive(self, messages: List[Dict[str, Any]]) -> None:
+        """Publish messages that are already in the store, keeping their ``seq``.
+
+        A SCAN_COMPLETE ends the scan, as ``None`` does for :meth:`put_nowait`.
+        """
+        for message in messages:
+            if self.closed:
+                return
+            self.seq = message["seq"]
+            self._publish(message)
+            if message["type"] == "SCAN_COMPLETE":
+                self._close()
+
+    async def follow(self, interval: Optional[float] = None) -> None:
+        """Publish what another process writes to the store, until the scan ends.
+
+        This is how the API serves scans that ``netscan dispatcher``
+        executes.  Following also stops once the last subscriber has left.
+        """
+        while not self.closed and self.subscribers:
+            messages = await asyncio.to_thread(self.store.load, self.scan_id, self.seq, FOLLOW_BATCH)
+            self.receive(messages)
+            if len(messages) < FOLLOW_BATCH and not self.closed:
+                await asyncio.sleep(FOLLOW_INTERVAL if interval is None else interval)
+
+    def _store_call(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Task[Any]":
+        """Run a blocking store call in a worker thread, after those made before it."""
+
+        async def call():
+            async with self._store_lock:
+                return await asyncio.to_thread(fn, *args)
+
+        # Tasks start in the order they are created, so they take the lock in order
+        return asyncio.ensure_future(call())
+
+    def _write(self, fn: Callable[..., Any], *args: Any) -> None:
+        task = self._store_call(fn, *args)
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def _save_unsaved(self) -> None:
+        if self.store and self._unsaved:
+            self._write(self.store.save, self.scan_id, self._unsaved)
+        self._unsaved = []
+
+    async def drain(self) -> None:
+        """Wait until everything published so far has been written to the store."""
+        self._save_unsaved()
+        while self._writes:
+            await asyncio.gather(*self._writes)
+
+    async def events_since(self, since: int, upto: int) -> Optional[List[Dict[str, Any]]]:
+        """Return the messages with ``since < seq <= upto``, or None if they are not all kept.
+
+        Recent messages come from memory, older ones from the store as long
+        as there are at most ``REPLAY_LIMIT`` of them.  A ``since`` above the
+        current ``seq`` is from a different log and also gives None.
+        """
+        if since > upto or since < 0:
+            return None
+        if since == upto:
+            return []
+        if self._log and self._log[0]["seq"] <= since + 1:
+            return [message for message in self._log if since < message["seq"] <= upto]
+        if self.store:
+            self._save_unsaved()
+            events = await self._store_call(self.store.load, self.scan_id, since, REPLAY_LIMIT + 1)
+            events = [message for message in events if message["seq"] <= upto]
+            if len(events) <= REPLAY_LIMIT:
+                return events
+        return None
+
+    async def subscribe(self, since: Optional[int] = None) -> Subscription:
+        """Return a new subscription, first replaying what came after ``since``.
+
+        If the messages after ``since`` are no longer kept, the subscription's
+        ``needs_snapshot`` is set and the client has to be sent the scan's
+        current state instead.  The subscription is added before anything is
+        read from the store, so messages published meanwhile are held back
+        and follow the replay.
+        """
+        subscription = Subscription(self.buffer_size)
+        subscription.start_seq = self.seq
+        subscription.hold()
+        if self.closed:
+            subscription.offer(None)
+        self.subscribers.add(subscription)
+        events: Optional[List[Dict[str, Any]]] = []
+        if since is not None:
+            events = await self.events_since(since, subscription.start_seq)
+            if events is None:
+                subscription.needs_snapshot = True
+        subscription.release(events or ())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+        for name in SUBSCRIBER_COUNTERS:
+            self._totals[name] += getattr(subscription, name)
+        self._totals["max_lag"] = max(self._totals["max_lag"], subscription.max_lag)
+        if subscription.dropped or subscription.send_timeouts:
+            logging.warning(
+                f"Subscriber of scan {self.scan_id} fell behind: {subscription.coalesced} updates coalesced, "
+                f"{subscription.dropped} dropped, {subscription.send_timeouts} send timeouts"
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Delivery counters over current and past subscribers."""
+        totals = dict(self._totals, subscribers=len(self.subscribers))
+        for subscription in self.subscribers:
+            for name in SUBSCRIBER_COUNTERS:
+                totals[name] += getattr(subscription, name)
+            totals["max_lag"] = max(totals["max_lag"], subscription.max_lag)
+        return totals
 
 
 class ScanManager:
     """A singleton-like class to manage scan tasks in memory."""
 
     def __init__(self):
-        # {scan_id: {"task": asyncio.Task, "queue": asyncio.Queue}}
+        # {scan_id: {"task": asyncio.Task, "channel": ScanChannel}}
         self.active_scans: Dict[str, Dict[str, Any]] = {}
 
-    def register_scan(self, scan_id: str, task: asyncio.Task, queue: asyncio.Queue):
-        """Stores a new scan task and its queue."""
-        self.active_scans[scan_id] = {"task": task, "queue": queue}
+    def register_scan(self, scan_id: str, task: asyncio.Task, channel: ScanChannel):
+        """Stores a new scan task and its channel."""
+        self.active_scans[scan_id] = {"task": task, "channel": channel}
 
     def deregister_scan(self, scan_id: str):
         """Removes a scan from the registry, typically upon completion."""
@@ -24,15 +428,39 @@ class ScanManager:
             #     task.cancel()
             del self.active_scans[scan_id]
 
-    def get_scan_queue(self, scan_id: str) -> Optional[asyncio.Queue]:
-        """Retrieves the queue for a given scan ID."""
+    def get_scan_channel(self, scan_id: str) -> Optional[ScanChannel]:
+        """Retrieves the channel for a given scan ID."""
         scan_info = self.active_scans.get(scan_id)
-        return scan_info.get("queue") if scan_info else None
+        return scan_info.get("channel") if scan_info else None
+
+    async def follow_scan(self, scan_id: str, store: EventStore) -> ScanChannel:
+        """Return the channel of a scan executed by another process.
+
+        The first call starts a task that feeds the channel from ``store``
+        (see :meth:`ScanChannel.follow`); the caller has to subscribe before
+        it next awaits, or the task finds no subscriber and ends.
+        """
+        channel = self.get_scan_channel(scan_id)
+        if channel is None:
+            restored = await ScanChannel.restore(scan_id, store)
+            # Another client may have started following while the store was read
+            channel = self.get_scan_channel(scan_id)
+            if channel is None:
+                channel = restored
+                self.register_scan(scan_id, asyncio.create_task(self._follow(channel)), channel)
+        return channel
+
+    async def _follow(self, channel: ScanChannel) -> None:
+        try:
+            await channel.follow()
+        finally:
+            self.deregister_scan(channel.scan_id)
 
     def is_scan_active(self, scan_id: str) -> bool:
         """Checks if a scan is currently in the registry."""
         return scan_id in self.active_scans
 
 
-# Create a single, globally-accessible instance of the manager.
+# Create single, globally-accessible instances of the manager and the store.
 scan_manager = ScanManager()
+event_store = EventStore()
@@ -51,9 +51,17 @@ const DashboardPage: React.FC = () => {
         <p>Socket Status: <strong>{socketStatus}</strong></p>
       </div>
       <p>Status: <strong>{scan.status}</strong></p>
-      <p>
-        Progress: {scan.progress.completed_chunks} / {scan.progress.total_chunks} chunks completed
-      </p>
+      {scan.status === 'QUEUED' ? (
+        <p>Waiting for a dispatcher to start the scan...</p>
+      ) : scan.status === 'PLANNING' ? (
+        <p>
+          Planning: {scan.planning?.targets_planned ?? 0} / {scan.planning?.targets_total ?? '?'} targets written
+        </p>
+      ) : (
+        <p>
+          Progress: {scan.progress.completed_chunks} / {scan.progress.total_chunks} chunks completed
+        </p>
+      )}
 
       <hr style={{ margin: '20px 0' }} />
 
@@ -3,13 +3,16 @@
 export interface StartScanRequest {
   targets: string[];
   nmap_options: string;
+  exclude?: string[];
+  range_targets?: boolean;
 }
 
 export interface StartScanResponse {
   scan_id: string;
 }
 
-export type ScanStatus = 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
+// QUEUED: waiting for a dispatcher; PLANNING: targets and jobs are being written
+export type ScanStatus = 'QUEUED' | 'PLANNING' | 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
 
 export interface ScanProgress {
   total_chunks: number;
@@ -17,6 +20,11 @@ export interface ScanProgress {
   failed_chunks: number;
 }
 
+export interface PlanningProgress {
+  targets_total: number | null; // null until expansion has finished
+  targets_planned: number;
+}
+
 export interface HostResult {
   status: 'up' | 'down';
   ports?: any[]; // Replace with more specific types if available
@@ -36,6 +44,7 @@ export interface Scan {
   scan_id: string;
   status: ScanStatus;
   progress: ScanProgress;
+  planning?: PlanningProgress | null; // set while status is PLANNING
   results: ScanResults;
   chunks: ScanChunk[];
 }